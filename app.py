@@ -15,10 +15,31 @@ import urllib.parse
 import bcrypt
 import uuid
 import shutil
+import base64
+import gc
 import glob
+import hashlib
+import threading
+import time
 import requests
 from dotenv import load_dotenv
 
+import banco_compilado
+from armazem_backups import ArmazemBackups
+from arquivos_perguntas import FORMATO_NDJSON, formato_arquivo, gravar_perguntas, ler_perguntas, linha_ndjson
+from banco_sqlite import BANCO_PRINCIPAL, BANCO_RECUPERACAO, BancoSQLite, ler_principal_json, ler_recuperacao_json
+from busca_perguntas import IndiceBusca
+from diario_edicoes import CompactadorDiarios, DiarioEdicoes, aplicar_operacoes_lista, aplicar_operacoes_recuperacao
+from duplicatas_proximas import DetectorDuplicatas
+from exportacao import FORMATOS, gerar_exportacao
+from historico_bancos import HistoricoBanco, estado_lista, estado_recuperacao
+from indice_perguntas import ORDENACOES, IndicePerguntas
+from metricas import RegistroMetricas, metricas_processo
+from modelo_perguntas import ApresentacaoPergunta, RegistroPerguntas
+from observador_bancos import ObservadorBancos
+from restauracao_backups import PlanoRestauracao, chave_backup, descrever_chave, selecionar_backups
+from sessoes_store import ColetorSessoes, criar_evento, criar_session_store
+
 # Google Cloud integrations
 try:
     from google.cloud import secretmanager
@@ -99,20 +120,112 @@ PERGUNTAS_JSON_PATH = os.environ.get(
     'data/perguntas.json'
 )
 
+# Usa o banco compilado (<arquivo>.json.qbank, gerado por banco_compilado.py)
+# quando existir e estiver em dia com o JSON
+USAR_BANCO_COMPILADO = os.environ.get('USAR_BANCO_COMPILADO', 'true').lower() in ('1', 'true', 'sim')
+
+# Intervalo (segundos) da verificação de bancos alterados em disco; 0 desativa
+BANCOS_RECARGA_INTERVALO = int(os.environ.get('BANCOS_RECARGA_INTERVALO', 5))
+
+# Edições individuais do painel admin vão para um diário (<banco>.diario),
+# incorporado ao JSON em segundo plano
+DIARIO_COMPACTACAO_INTERVALO = int(os.environ.get('DIARIO_COMPACTACAO_INTERVALO', 60))
+DIARIO_MAX_BYTES = int(os.environ.get('DIARIO_MAX_BYTES', 256 * 1024))
+PERGUNTAS_RECUPERACAO_JSON_PATH = os.path.join('data', 'perguntas_recuperacao.json')
+diario_principal = DiarioEdicoes(PERGUNTAS_JSON_PATH)
+diario_recuperacao = DiarioEdicoes(PERGUNTAS_RECUPERACAO_JSON_PATH)
+compactador_diarios = CompactadorDiarios(intervalo=DIARIO_COMPACTACAO_INTERVALO, max_bytes=DIARIO_MAX_BYTES)
+
+# Backend dos bancos de perguntas: 'json' (arquivos em data/, padrão) ou 'sqlite'.
+# No SQLite o banco é importado dos JSON na primeira execução (ou via banco_sqlite.py importar).
+BANCO_PERGUNTAS_BACKEND = os.environ.get('BANCO_PERGUNTAS_BACKEND', 'json').strip().lower()
+BANCO_SQLITE_PATH = os.environ.get('BANCO_SQLITE_PATH', os.path.join('data', 'perguntas.sqlite3'))
+banco_sqlite = BancoSQLite(BANCO_SQLITE_PATH) if BANCO_PERGUNTAS_BACKEND == 'sqlite' else None
+
+# Similaridade mínima (0 a 1) para o upload apontar perguntas quase duplicadas; 0 desativa
+DUPLICATAS_LIMIAR = float(os.environ.get('DUPLICATAS_LIMIAR', 0.8))
+
+# Backups por disciplina: manifestos + objetos deduplicados por pergunta ('gzip', 'zstd' ou 'nenhuma')
+BACKUP_COMPRESSAO = os.environ.get('BACKUP_COMPRESSAO', 'gzip').strip().lower()
+armazem_backups_recuperacao = ArmazemBackups(os.path.join('data', 'backups'), BACKUP_COMPRESSAO)
+armazem_backups_principal = ArmazemBackups(os.path.join('data', 'backups_principal'), BACKUP_COMPRESSAO)
+
+# Histórico de alterações dos bancos (log + checkpoints) para recuperação pontual
+# com historico_bancos.py; um checkpoint novo a cada HISTORICO_CHECKPOINT_BYTES de log
+HISTORICO_ALTERACOES = os.environ.get('HISTORICO_ALTERACOES', 'true').lower() in ('1', 'true', 'sim')
+HISTORICO_DIR = os.environ.get('HISTORICO_DIR', os.path.join('data', 'historico'))
+HISTORICO_CHECKPOINT_BYTES = int(os.environ.get('HISTORICO_CHECKPOINT_BYTES', 1024 * 1024))
+historico_principal = historico_recuperacao = None
+if HISTORICO_ALTERACOES:
+    historico_principal = HistoricoBanco(
+        os.path.join(HISTORICO_DIR, BANCO_PRINCIPAL), BANCO_PRINCIPAL, BACKUP_COMPRESSAO, HISTORICO_CHECKPOINT_BYTES
+    )
+    historico_recuperacao = HistoricoBanco(
+        os.path.join(HISTORICO_DIR, BANCO_RECUPERACAO), BANCO_RECUPERACAO, BACKUP_COMPRESSAO, HISTORICO_CHECKPOINT_BYTES
+    )
+
 # Variáveis globais
 perguntas_db = []
 perguntas_recuperacao_db = {}
 
-# Variáveis globais para o quiz
-quiz_session = {}
-quiz_questions = {}
-quiz_answers = {}
+# Índice (período, disciplina) do banco principal, mantido pelas rotas admin
+indice_perguntas = IndicePerguntas()
+
+# Índice invertido para a busca textual do painel admin (os dois bancos)
+indice_busca = IndiceBusca()
+
+# Registro id -> pergunta dos dois bancos (as sessões guardam apenas ids)
+registro_perguntas = RegistroPerguntas()
+PREFIXO_ID_PRINCIPAL = 'p'
+PREFIXO_ID_RECUPERACAO = 'r'
+
+# Catálogo (disciplina -> tópico -> total) do banco de recuperação, calculado sob demanda
+catalogo_recuperacao_cache = None
+
 
 # Controle de tentativas de login
 login_attempts = {}
 
+# Armazenamento das sessões de quiz ('memoria', 'arquivo' ou 'sqlite').
+# Com mais de um worker/instância use um backend compartilhado.
 SESSOES_DIR = os.path.join('data', 'sessoes')
-os.makedirs(SESSOES_DIR, exist_ok=True)
+QUIZ_SESSION_STORE = os.environ.get('QUIZ_SESSION_STORE', 'arquivo')
+QUIZ_SESSION_SQLITE_PATH = os.environ.get('QUIZ_SESSION_SQLITE_PATH', os.path.join('data', 'sessoes.sqlite3'))
+QUIZ_SESSION_CAPACIDADE = int(os.environ.get('QUIZ_SESSION_CAPACIDADE', 10000))
+QUIZ_SESSION_LOG_MAX_BYTES = int(os.environ.get('QUIZ_SESSION_LOG_MAX_BYTES', 32 * 1024))
+# Sessões sem atividade por mais que o TTL (segundos) são apagadas pelo coletor
+QUIZ_SESSION_TTL = int(os.environ.get('QUIZ_SESSION_TTL', 24 * 60 * 60))
+QUIZ_SESSION_GC_INTERVALO = int(os.environ.get('QUIZ_SESSION_GC_INTERVALO', 600))
+
+session_store = criar_session_store(
+    QUIZ_SESSION_STORE,
+    diretorio=SESSOES_DIR,
+    caminho_sqlite=QUIZ_SESSION_SQLITE_PATH,
+    capacidade=QUIZ_SESSION_CAPACIDADE,
+    log_max_bytes=QUIZ_SESSION_LOG_MAX_BYTES,
+    ttl=QUIZ_SESSION_TTL
+)
+coletor_sessoes = ColetorSessoes(session_store, intervalo=QUIZ_SESSION_GC_INTERVALO)
+
+# Métricas no formato do Prometheus em /metrics (por processo/worker)
+METRICAS_HABILITADAS = os.environ.get('METRICAS_HABILITADAS', 'true').lower() in ('1', 'true', 'sim')
+metricas = RegistroMetricas()
+metrica_latencia = metricas.histograma(
+    'quiz_http_request_duration_seconds', 'Latência das requisições em segundos por rota.', ('rota', 'metodo')
+)
+metrica_requisicoes = metricas.contador(
+    'quiz_http_requests_total', 'Requisições atendidas por rota e status.', ('rota', 'metodo', 'status')
+)
+metrica_quizzes_iniciados = metricas.contador('quiz_quizzes_iniciados_total', 'Quizzes iniciados.', ('modo',))
+metrica_quizzes_finalizados = metricas.contador('quiz_quizzes_finalizados_total', 'Quizzes finalizados.', ('modo',))
+metrica_respostas = metricas.contador('quiz_respostas_total', 'Respostas enviadas.', ('correta',))
+metrica_sessoes = metricas.contador(
+    'quiz_sessoes_consultas_total', 'Leituras de sessões de quiz no armazenamento (encontrada ou ausente).', ('resultado',)
+)
+metrica_recargas = metricas.contador(
+    'quiz_bancos_recarregados_total', 'Recargas dos bancos alterados em disco.', ('banco',)
+)
+metricas.coletor(metricas_processo)
 
 def safe_write_json(file_path, data):
     """Escreve JSON de forma atômica (evita corrupção em caso de falha)."""
@@ -211,34 +324,137 @@ def admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# Lock dos bancos em memória (listas, dicts e índices) deste processo: a
+# recarga do observador e todas as rotas que alteram os bancos o seguram,
+# senão uma recarga no meio de uma edição descartaria a edição ou deixaria
+# os índices fora de sincronia com o banco. Reentrante porque as rotas de
+# upload/limpeza chamam as funções de carga.
+lock_bancos = threading.RLock()
+
+def bancos_travados(f):
+    """Decorator para rotas que alteram os bancos em memória"""
+    def decorated_function(*args, **kwargs):
+        with lock_bancos:
+            return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 def get_client_ip():
     """Obtém IP do cliente"""
     if request.environ.get('HTTP_X_FORWARDED_FOR'):
         return request.environ['HTTP_X_FORWARDED_FOR'].split(',')[0]
     return request.environ.get('REMOTE_ADDR', 'unknown')
 
+def iniciar_medicao():
+    """Marca o início da requisição para o histograma de latência"""
+    request.environ['quiz.inicio'] = time.perf_counter()
+
+def guardar_status_medicao(response):
+    """Guarda o status da resposta para registrar_medicao"""
+    request.environ['quiz.status'] = response.status_code
+    return response
+
+def registrar_medicao(exc=None):
+    """Registra a latência e o status da requisição por rota.
+
+    Roda no teardown, que o Flask chama mesmo quando uma exceção não tratada
+    impede os after_request; sem status guardado a requisição conta como 500.
+    """
+    inicio = request.environ.pop('quiz.inicio', None)
+    if inicio is not None:
+        # Rota da regra (/static/<path:filename>), não o caminho, para limitar as séries
+        rota = request.url_rule.rule if request.url_rule is not None else 'nao_encontrada'
+        status = request.environ.get('quiz.status', 500)
+        metrica_latencia.observar(time.perf_counter() - inicio, rota, request.method)
+        metrica_requisicoes.inc(rota, request.method, str(status))
+
+if METRICAS_HABILITADAS:
+    # Registrados antes dos demais hooks para medir a requisição inteira
+    app.before_request(iniciar_medicao)
+    app.after_request(guardar_status_medicao)
+    app.teardown_request(registrar_medicao)
+
+@app.before_request
+def garantir_bancos():
+    """Quem serve `app:app` direto, sem create_app(), carrega os bancos na primeira requisição"""
+    if not bancos_inicializados:
+        with lock_bancos:
+            inicializar_bancos()
+
+@app.before_request
+def garantir_coletor_sessoes():
+    """Inicia o coletor de sessões expiradas no processo atual (uma vez por worker)"""
+    coletor_sessoes.iniciar()
+    observador_bancos.iniciar()
+    compactador_diarios.iniciar()
+
 # Adiciona o filtro chr para converter números em letras (A, B, C, D)
 @app.template_filter('chr')
 def chr_filter(i, base=65):
     return chr(base + i)
 
+def aplicar_diario_principal(perguntas):
+    """Reaplica as edições do diário ainda não incorporadas ao JSON principal"""
+    operacoes = diario_principal.operacoes()
+    if not operacoes:
+        return perguntas
+    return registro_perguntas.congelar_lista(aplicar_operacoes_lista(perguntas, operacoes), PREFIXO_ID_PRINCIPAL)
+
+def carregar_perguntas_sqlite():
+    """Carrega o banco principal do SQLite (importando o JSON na primeira execução)"""
+    global perguntas_db
+    try:
+        if banco_sqlite.vazio(BANCO_PRINCIPAL) and os.path.exists(PERGUNTAS_JSON_PATH):
+            if banco_sqlite.salvar_principal(ler_principal_json(PERGUNTAS_JSON_PATH), somente_se_vazio=True):
+                print(f"SUCESSO: {PERGUNTAS_JSON_PATH} importado para {BANCO_SQLITE_PATH}")
+        novas = registro_perguntas.congelar_lista(banco_sqlite.carregar_lista(BANCO_PRINCIPAL), PREFIXO_ID_PRINCIPAL)
+        indice_perguntas.reconstruir(novas)
+        indice_busca.reconstruir(BANCO_PRINCIPAL, novas)
+        perguntas_db = novas
+        historico_carregado_principal(novas)
+        print(f"SUCESSO: {len(perguntas_db)} perguntas carregadas de {BANCO_SQLITE_PATH}!")
+        return True
+    except Exception as e:
+        print(f"ERRO ao carregar perguntas do SQLite: {e}")
+        return False
+
 def carregar_perguntas():
     """Carrega perguntas do arquivo JSON principal"""
     global perguntas_db
-    try:
-        with open(PERGUNTAS_JSON_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            if isinstance(data, list):
-                perguntas_db = data
-            elif isinstance(data, dict) and 'perguntas' in data:
-                perguntas_db = data['perguntas']
-            else:
-                print("ERRO: Formato do JSON não reconhecido!")
-                return False
-                
-            print(f"SUCESSO: {len(perguntas_db)} perguntas carregadas!")
+    if banco_sqlite is not None:
+        return carregar_perguntas_sqlite()
+    compilado = banco_compilado.abrir_se_atualizado(PERGUNTAS_JSON_PATH) if USAR_BANCO_COMPILADO else None
+    if compilado is not None:
+        try:
+            novas = aplicar_diario_principal(registro_perguntas.congelar_lista(compilado, PREFIXO_ID_PRINCIPAL))
+            indice_perguntas.reconstruir(novas)
+            indice_busca.reconstruir(BANCO_PRINCIPAL, novas)
+            perguntas_db = novas
+            historico_carregado_principal(novas)
+            print(f"SUCESSO: {len(perguntas_db)} perguntas carregadas de {compilado.caminho}!")
             return True
+        except Exception as e:
+            print(f"ERRO ao carregar banco compilado, usando JSON: {e}")
+        finally:
+            compilado.fechar()
+    try:
+        # Lista JSON, {"perguntas": [...]} ou NDJSON (detectado automaticamente)
+        try:
+            data = ler_perguntas(PERGUNTAS_JSON_PATH)
+        except ValueError as e:
+            print(f"ERRO: Formato do banco não reconhecido! {e}")
+            return False
+        novas = registro_perguntas.congelar_lista(data, PREFIXO_ID_PRINCIPAL)
+        novas = aplicar_diario_principal(novas)
+
+        # Monta o novo banco e o índice antes de trocar (requisições em
+        # andamento continuam usando o banco anterior)
+        indice_perguntas.reconstruir(novas)
+        indice_busca.reconstruir(BANCO_PRINCIPAL, novas)
+        perguntas_db = novas
+        historico_carregado_principal(novas)
+        print(f"SUCESSO: {len(perguntas_db)} perguntas carregadas!")
+        return True
             
     except FileNotFoundError:
         print(f"ERRO: Arquivo {PERGUNTAS_JSON_PATH} não encontrado!")
@@ -270,27 +486,91 @@ def debug_perguntas():
         print("NENHUMA PERGUNTA CARREGADA!")
     print("="*50 + "\n")
 
-def carregar_perguntas_recuperacao():
-    """Carrega perguntas de recuperação de todos os arquivos na pasta data/"""
-    global perguntas_recuperacao_db
-    perguntas_recuperacao_db = {}
-    arquivos = glob.glob(os.path.join('data', 'perguntas_recuperacao*.json')) + glob.glob(os.path.join('data', 'RECUP_*.json'))
-    total_perguntas = 0
+def arquivos_recuperacao():
+    """Arquivos JSON que compõem o banco de recuperação"""
+    return glob.glob(os.path.join('data', 'perguntas_recuperacao*.json')) + glob.glob(os.path.join('data', 'RECUP_*.json'))
+
+def ler_banco_recuperacao(registro):
+    """Lê e mescla os arquivos do banco de recuperação, atribuindo ids pelo registro informado"""
+    banco = {}
+    arquivos = arquivos_recuperacao()
+    ids_usados = set()
     for arquivo in arquivos:
         try:
-            with open(arquivo, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for disciplina, topicos in data.items():
-                    if disciplina not in perguntas_recuperacao_db:
-                        perguntas_recuperacao_db[disciplina] = {}
-                    for topico, perguntas in topicos.items():
-                        if topico not in perguntas_recuperacao_db[disciplina]:
-                            perguntas_recuperacao_db[disciplina][topico] = []
-                        for pergunta in perguntas:
-                            perguntas_recuperacao_db[disciplina][topico].append(pergunta)
-                            total_perguntas += 1
+            compilado = banco_compilado.abrir_se_atualizado(arquivo) if USAR_BANCO_COMPILADO else None
+            if compilado is not None:
+                try:
+                    data = compilado.como_recuperacao()
+                finally:
+                    compilado.fechar()
+            else:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            for disciplina, topicos in data.items():
+                if disciplina not in banco:
+                    banco[disciplina] = {}
+                for topico, perguntas in topicos.items():
+                    if topico not in banco[disciplina]:
+                        banco[disciplina][topico] = []
+                    for pergunta in perguntas:
+                        banco[disciplina][topico].append(
+                            registro.congelar(pergunta, PREFIXO_ID_RECUPERACAO, ids_usados)
+                        )
         except Exception as e:
             print(f"ERRO ao carregar {arquivo}: {e}")
+    return banco, arquivos
+
+def reindexar_busca_recuperacao(banco):
+    """Reconstrói a parte do índice de busca referente ao banco de recuperação"""
+    indice_busca.reconstruir(
+        BANCO_RECUPERACAO,
+        (p for topicos in banco.values() for perguntas in topicos.values() for p in perguntas),
+    )
+
+def carregar_perguntas_recuperacao_sqlite():
+    """Carrega o banco de recuperação do SQLite (importando os JSON na primeira execução)"""
+    global perguntas_recuperacao_db
+    try:
+        if banco_sqlite.vazio(BANCO_RECUPERACAO):
+            arquivos = arquivos_recuperacao()
+            if arquivos and banco_sqlite.salvar_recuperacao(
+                ler_recuperacao_json(arquivos, PERGUNTAS_RECUPERACAO_JSON_PATH), somente_se_vazio=True
+            ):
+                print(f"SUCESSO: {len(arquivos)} arquivos de recuperação importados para {BANCO_SQLITE_PATH}")
+        novo_banco = banco_sqlite.carregar_recuperacao()
+        total_perguntas = 0
+        for topicos in novo_banco.values():
+            for topico, perguntas in topicos.items():
+                topicos[topico] = [registro_perguntas.congelar(p, PREFIXO_ID_RECUPERACAO) for p in perguntas]
+                total_perguntas += len(perguntas)
+        reindexar_busca_recuperacao(novo_banco)
+        perguntas_recuperacao_db = novo_banco
+        historico_carregado_recuperacao(novo_banco)
+        invalidar_catalogo_recuperacao()
+        print(f"SUCESSO: {total_perguntas} perguntas de recuperação carregadas de {BANCO_SQLITE_PATH}!")
+        return True
+    except Exception as e:
+        print(f"ERRO ao carregar perguntas de recuperação do SQLite: {e}")
+        return False
+
+def carregar_perguntas_recuperacao():
+    """Carrega perguntas de recuperação de todos os arquivos na pasta data/"""
+    global perguntas_recuperacao_db
+    if banco_sqlite is not None:
+        return carregar_perguntas_recuperacao_sqlite()
+    # O banco é montado por completo e só então publicado
+    novo_banco, arquivos = ler_banco_recuperacao(registro_perguntas)
+    operacoes = diario_recuperacao.operacoes()
+    if operacoes:
+        aplicar_operacoes_recuperacao(novo_banco, operacoes)
+        for topicos in novo_banco.values():
+            for topico, perguntas in topicos.items():
+                topicos[topico] = [registro_perguntas.congelar(p, PREFIXO_ID_RECUPERACAO) for p in perguntas]
+    total_perguntas = sum(len(perguntas) for topicos in novo_banco.values() for perguntas in topicos.values())
+    reindexar_busca_recuperacao(novo_banco)
+    perguntas_recuperacao_db = novo_banco
+    historico_carregado_recuperacao(novo_banco)
+    invalidar_catalogo_recuperacao()
     print(f"SUCESSO: {total_perguntas} perguntas de recuperação carregadas de {len(arquivos)} arquivos!")
     return True
 
@@ -310,7 +590,7 @@ def criar_arquivo_exemplo():
     ]
     
     try:
-        safe_write_json(PERGUNTAS_JSON_PATH, exemplo)
+        gravar_perguntas(PERGUNTAS_JSON_PATH, exemplo)
         print(f"SUCESSO: Arquivo {PERGUNTAS_JSON_PATH} criado!")
     except Exception as e:
         print(f"ERRO ao criar arquivo: {e}")
@@ -410,19 +690,55 @@ def get_topicos_recuperacao():
         return list(perguntas_recuperacao_db["ESF"].keys())
     return []
 
+def invalidar_catalogo_recuperacao():
+    """Descarta o catálogo em cache (chamado sempre que o banco de recuperação muda)"""
+    global catalogo_recuperacao_cache
+    catalogo_recuperacao_cache = None
+
+def obter_catalogo_recuperacao():
+    """Retorna (catalogo, corpo_json, etag) do banco de recuperação, calculando uma única vez"""
+    global catalogo_recuperacao_cache
+    banco = perguntas_recuperacao_db
+    cache = catalogo_recuperacao_cache
+    # O cache vale apenas para o banco a partir do qual foi calculado (a
+    # recarga em segundo plano troca o objeto do banco)
+    if cache is None or cache[0] is not banco:
+        catalogo = {
+            disciplina: {topico: len(perguntas) for topico, perguntas in topicos.items()}
+            for disciplina, topicos in banco.items()
+        }
+        corpo = json.dumps(catalogo, ensure_ascii=False, sort_keys=True)
+        etag = hashlib.sha1(corpo.encode('utf-8')).hexdigest()
+        cache = (banco, catalogo, corpo, etag)
+        catalogo_recuperacao_cache = cache
+    return cache[1:]
+
 # ROTAS
 @app.route('/')
 def index():
     disciplinas_por_periodo = get_disciplinas_por_periodo()
     topicos_recuperacao = get_topicos_recuperacao()
+    catalogo_recuperacao, _, _ = obter_catalogo_recuperacao()
     return render_template(
         'index.html',
         periodos_disciplinas=get_periodos_disciplinas(),
         disciplinas_por_periodo=disciplinas_por_periodo,
         topicos_recuperacao=topicos_recuperacao,
-        perguntas_recuperacao_db=perguntas_recuperacao_db
+        catalogo_recuperacao=catalogo_recuperacao
     )
 
+@app.route('/api/catalogo')
+def api_catalogo():
+    """Catálogo compacto do banco de recuperação (disciplina -> tópico -> total de perguntas)"""
+    _, corpo, etag = obter_catalogo_recuperacao()
+    if request.if_none_match.contains(etag):
+        resposta = app.response_class(status=304)
+    else:
+        resposta = app.response_class(corpo, mimetype='application/json')
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
 @app.route('/configuracao-inicial', methods=['GET'])
 def configuracao_inicial():
     """Configuração inicial do usuário"""
@@ -530,7 +846,7 @@ def quiz():
             flash('Nenhuma pergunta encontrada para os critérios selecionados.', 'error')
             return redirect(url_for('index'))
         perguntas = embaralhar_opcoes(perguntas)
-        quiz_session[session_id] = {
+        quiz_data = {
             'modo': 'recuperacao',
             'disciplina': disciplina,
             'topico': session_topico_name,
@@ -545,51 +861,38 @@ def quiz():
         if not periodo or not disciplina:
             flash('Período e disciplina são obrigatórios.', 'error')
             return redirect(url_for('index'))
-        # Filtrar perguntas por período e disciplina
-        perguntas_filtradas = [p for p in perguntas_db 
-                             if p.get('periodo') == int(periodo) and 
-                             p.get('disciplina', '').lower() == disciplina.lower()]
+        # Consulta o índice por período e disciplina (sem varrer o banco)
+        total_professor, total_oficiais = indice_perguntas.contagens(periodo, disciplina)
         
         # Implementar distribuição 70% professor / 30% oficial se há material do professor
-        perguntas_professor = [p for p in perguntas_filtradas if p.get('fonte_material') == 'professor']
-        perguntas_oficiais = [p for p in perguntas_filtradas if p.get('fonte_material') != 'professor']
-        
-        if perguntas_professor:
+        if total_professor:
             # Aplicar distribuição 70/30
             qtd_professor = int(quantidade_questoes * 0.7)
             qtd_oficial = quantidade_questoes - qtd_professor
             
             # Garantir que não exceda o disponível
-            qtd_professor = min(qtd_professor, len(perguntas_professor))
-            qtd_oficial = min(qtd_oficial, len(perguntas_oficiais))
+            qtd_professor = min(qtd_professor, total_professor)
+            qtd_oficial = min(qtd_oficial, total_oficiais)
             
             # Ajustar se não há perguntas suficientes
             if qtd_professor + qtd_oficial < quantidade_questoes:
                 # Completar com o que estiver disponível
                 restante = quantidade_questoes - qtd_professor - qtd_oficial
-                if len(perguntas_professor) > qtd_professor:
-                    qtd_professor = min(qtd_professor + restante, len(perguntas_professor))
-                elif len(perguntas_oficiais) > qtd_oficial:
-                    qtd_oficial = min(qtd_oficial + restante, len(perguntas_oficiais))
-            
-            perguntas_selecionadas = []
-            if qtd_professor > 0:
-                random.shuffle(perguntas_professor)
-                perguntas_selecionadas.extend(perguntas_professor[:qtd_professor])
-            if qtd_oficial > 0:
-                random.shuffle(perguntas_oficiais)
-                perguntas_selecionadas.extend(perguntas_oficiais[:qtd_oficial])
+                if total_professor > qtd_professor:
+                    qtd_professor = min(qtd_professor + restante, total_professor)
+                elif total_oficiais > qtd_oficial:
+                    qtd_oficial = min(qtd_oficial + restante, total_oficiais)
             
+            perguntas_selecionadas = indice_perguntas.sortear(periodo, disciplina, qtd_professor, qtd_oficial)
             random.shuffle(perguntas_selecionadas)  # Embaralhar ordem final
         else:
             # Sem material professor, seleção normal
-            random.shuffle(perguntas_filtradas)
-            perguntas_selecionadas = perguntas_filtradas[:quantidade_questoes]
+            perguntas_selecionadas = indice_perguntas.sortear(periodo, disciplina, 0, quantidade_questoes)
         if not perguntas_selecionadas:
             flash('Nenhuma pergunta encontrada para os critérios selecionados.', 'error')
             return redirect(url_for('index'))
         perguntas = embaralhar_opcoes(perguntas_selecionadas)
-        quiz_session[session_id] = {
+        quiz_data = {
             'modo': 'normal',
             'periodo': periodo,
             'disciplina': disciplina,
@@ -600,19 +903,20 @@ def quiz():
             'config_usuario': config_usuario,
             'quantidade_questoes': quantidade_questoes
         }
-    salvar_sessao_quiz(session_id, quiz_session[session_id])
+    salvar_sessao_quiz(session_id, quiz_data)
+    metrica_quizzes_iniciados.inc(quiz_data['modo'])
     return redirect(url_for('proxima_pergunta', session_id=session_id))
 
 @app.route('/proxima_pergunta')
 def proxima_pergunta():
     """Mostra a próxima pergunta"""
     session_id = request.args.get('session_id')
+    quiz_data = carregar_sessao_quiz(session_id)
     
-    if not session_id or session_id not in quiz_session:
+    if not quiz_data:
         flash('Sessão de quiz inválida.', 'error')
         return redirect(url_for('index'))
     
-    quiz_data = quiz_session[session_id]
     pergunta_atual = quiz_data['pergunta_atual']
     perguntas = quiz_data['perguntas']
     
@@ -628,7 +932,6 @@ def proxima_pergunta():
     tempo_decorrido = (datetime.now() - parse_datetime(quiz_data['inicio'])).total_seconds()
     tempo_restante = max(0, tempo_total - tempo_decorrido)
     
-    salvar_sessao_quiz(session_id, quiz_data)
     return render_template('quiz.html', 
                          pergunta=pergunta,
                          pergunta_numero=pergunta_atual + 1,
@@ -643,13 +946,13 @@ def responder():
     session_id = request.form.get('session_id')
     resposta = request.form.get('resposta')
     
-    if not session_id or session_id not in quiz_session:
+    quiz_data = carregar_sessao_quiz(session_id)
+    if not quiz_data:
         return jsonify({'erro': 'Sessão de quiz inválida'}), 400
     
     if not resposta:
         return jsonify({'erro': 'Resposta não fornecida'}), 400
     
-    quiz_data = quiz_session[session_id]
     pergunta_atual = quiz_data['pergunta_atual']
     perguntas = quiz_data['perguntas']
     
@@ -685,20 +988,26 @@ def responder():
         bonus_tempo = min(5, int(tempo_restante_pergunta / 18))  # 90/5=18
         pontos += bonus_tempo
     
-    # Salva a resposta
-    quiz_data['respostas'].append({
-        'pergunta': pergunta['pergunta'],
-        'resposta_usuario': resposta,
-        'resposta_correta': pergunta['resposta_correta'],
-        'correta': correta,
-        'pontos': pontos,
-        'tempo_resposta': tempo_resposta,
-        'explicacao': pergunta.get('explicacao', ''),
-        'dificuldade': pergunta.get('dificuldade', 'medio')
-    })
+    # Resumo do resultado mantido a cada resposta (o relatório não precisa recontar)
+    resumo = dict(quiz_data.get('resumo') or {'respondidas': 0, 'acertos': 0, 'pontos': 0})
+    resumo['respondidas'] += 1
+    resumo['acertos'] += 1 if correta else 0
+    resumo['pontos'] += pontos
     
-    # Avança para a próxima pergunta
-    quiz_data['pergunta_atual'] += 1
+    # Salva a resposta e avança para a próxima pergunta (um único evento no log da sessão)
+    registrar_evento_sessao(session_id, quiz_data, criar_evento(
+        'resposta',
+        definir={'pergunta_atual': pergunta_atual + 1, 'resumo': resumo},
+        acrescentar={'respostas': [{
+            'posicao': pergunta_atual,
+            'id': pergunta.get('id'),
+            'resposta_usuario': resposta,
+            'correta': correta,
+            'pontos': pontos,
+            'tempo_resposta': tempo_resposta
+        }]}
+    ))
+    metrica_respostas.inc('true' if correta else 'false')
     
     # Verifica se o quiz terminou
     if quiz_data['pergunta_atual'] >= len(perguntas):
@@ -711,7 +1020,6 @@ def responder():
             'session_id': session_id
         })
     
-    salvar_sessao_quiz(session_id, quiz_data)
     return jsonify({
         'correta': correta,
         'resposta_correta': pergunta['resposta_correta'],
@@ -725,24 +1033,33 @@ def responder():
 def finalizar_quiz():
     """Finaliza o quiz e redireciona para resultado"""
     session_id = request.args.get('session_id') or session.get('quiz_session_id')
-    quiz_data = quiz_session.get(session_id) or carregar_sessao_quiz(session_id)
+    quiz_data = carregar_sessao_quiz(session_id)
     if not session_id or not quiz_data:
         return redirect(url_for('erro', mensagem='Sua sessão expirou ou não foi encontrada. O relatório não está disponível. Por favor, inicie um novo quiz.'))
-    quiz_data['fim'] = str(datetime.now())
-    # Garante que todas as perguntas não respondidas sejam marcadas
-    respostas = quiz_data.get('respostas', [])
-    respondidas = set(r['pergunta'] for r in respostas)
-    for pergunta in quiz_data['perguntas']:
-        if pergunta['pergunta'] not in respondidas:
-            respostas.append({
-                'pergunta': pergunta['pergunta'],
-                'resposta_usuario': '',
-                'resposta_correta': pergunta.get('resposta_correta', ''),
-                'correta': False,
-                'nao_respondida': True
-            })
-    quiz_data['respostas'] = respostas
-    salvar_sessao_quiz(session_id, quiz_data)
+    # Garante que todas as perguntas não respondidas sejam marcadas.
+    # As respostas são gravadas na ordem das perguntas, então as que faltam
+    # são exatamente as posições após a última registrada.
+    perguntas = quiz_data['perguntas']
+    nao_respondidas = [
+        {
+            'posicao': posicao,
+            'id': perguntas[posicao].get('id'),
+            'resposta_usuario': '',
+            'correta': False,
+            'nao_respondida': True
+        }
+        for posicao in range(len(quiz_data.get('respostas', [])), len(perguntas))
+    ]
+    ja_finalizado = bool(quiz_data.get('fim'))
+    # Quiz finalizado: o log da sessão é compactado no snapshot
+    registrar_evento_sessao(session_id, quiz_data, criar_evento(
+        'fim',
+        definir={'fim': str(datetime.now())},
+        acrescentar={'respostas': nao_respondidas},
+        compactar=True
+    ))
+    if not ja_finalizado:
+        metrica_quizzes_finalizados.inc(quiz_data.get('modo', 'normal'))
     return redirect(url_for('resultado', session_id=session_id))
 
 @app.route('/erro')
@@ -754,13 +1071,19 @@ def erro():
 def resultado():
     """Página de resultado do quiz"""
     session_id = request.args.get('session_id') or session.get('quiz_session_id')
-    quiz_data = quiz_session.get(session_id) or carregar_sessao_quiz(session_id)
+    quiz_data = carregar_sessao_quiz(session_id)
     if not session_id or not quiz_data:
         return redirect(url_for('index'))
     # Filtrar apenas respostas respondidas
     respostas_respondidas = [r for r in quiz_data['respostas'] if not r.get('nao_respondida')]
-    total_perguntas = len(respostas_respondidas)
-    acertos = sum(1 for r in respostas_respondidas if r.get('correta', r.get('correto', r.get('acertou', False))))
+    resumo = quiz_data.get('resumo')
+    if resumo:
+        total_perguntas = resumo['respondidas']
+        acertos = resumo['acertos']
+    else:
+        # Sessões gravadas antes do resumo incremental
+        total_perguntas = len(respostas_respondidas)
+        acertos = sum(1 for r in respostas_respondidas if r.get('correta', r.get('correto', r.get('acertou', False))))
     precisao = (acertos / total_perguntas * 100) if total_perguntas > 0 else 0
     inicio = parse_datetime(quiz_data.get('inicio'))
     fim = parse_datetime(quiz_data.get('fim', datetime.now()))
@@ -768,19 +1091,25 @@ def resultado():
     tempo_minutos = int(tempo_total.total_seconds() // 60)
     tempo_segundos = int(tempo_total.total_seconds() % 60)
     tempo_gasto = f"{tempo_minutos:02d}:{tempo_segundos:02d}"
+    # Junta cada resposta à sua pergunta pela posição no quiz (acesso direto)
+    perguntas = quiz_data['perguntas']
+    perguntas_por_id = None
     respostas_formatadas = []
     for i, resposta in enumerate(respostas_respondidas):
-        pergunta_original = None
-        for p in quiz_data['perguntas']:
-            if p['pergunta'] == resposta['pergunta']:
-                pergunta_original = p
-                break
+        posicao = resposta.get('posicao')
+        if posicao is not None and 0 <= posicao < len(perguntas):
+            pergunta_original = perguntas[posicao]
+        else:
+            # Sessões antigas: respostas sem posição são ligadas pelo id/texto
+            if perguntas_por_id is None:
+                perguntas_por_id = {p.get('id', p['pergunta']): p for p in perguntas}
+            pergunta_original = perguntas_por_id.get(resposta.get('id', resposta.get('pergunta')))
         respostas_formatadas.append({
             'numero': i + 1,
-            'pergunta': resposta['pergunta'],
+            'pergunta': pergunta_original['pergunta'] if pergunta_original else resposta.get('pergunta', ''),
             'opcoes': pergunta_original['opcoes'] if pergunta_original else [],
             'resposta_usuario': resposta.get('resposta_usuario', resposta.get('sua_resposta', '')),
-            'resposta_correta': resposta.get('resposta_correta', ''),
+            'resposta_correta': pergunta_original['resposta_correta'] if pergunta_original else resposta.get('resposta_correta', ''),
             'acertou': resposta.get('correta', resposta.get('correto', resposta.get('acertou', False))),
             'explicacao': pergunta_original.get('explicacao', '') if pergunta_original else ''
         })
@@ -793,7 +1122,6 @@ def resultado():
         'tipo': quiz_data['modo']
     }
     session.pop('quiz_session_id', None)
-    salvar_sessao_quiz(session_id, quiz_data)
     return render_template('resultado.html', **resultado_data)
 
 @app.route('/admin')
@@ -833,6 +1161,7 @@ def listar_topicos_disciplina(disciplina):
 
 @app.route('/admin/adicionar-pergunta', methods=['POST'])
 @admin_required
+@bancos_travados
 def adicionar_pergunta_recuperacao():
     """Adiciona uma nova pergunta ao sistema de recuperação"""
     try:
@@ -877,10 +1206,13 @@ def adicionar_pergunta_recuperacao():
         if topico not in perguntas_recuperacao_db[disciplina]:
             perguntas_recuperacao_db[disciplina][topico] = []
         
+        nova_pergunta = registro_perguntas.congelar(nova_pergunta, PREFIXO_ID_RECUPERACAO)
         perguntas_recuperacao_db[disciplina][topico].append(nova_pergunta)
+        indice_busca.adicionar(BANCO_RECUPERACAO, nova_pergunta)
+        invalidar_catalogo_recuperacao()
         
-        # Salva no arquivo
-        salvar_perguntas_recuperacao()
+        # Registra no diário de edições
+        registrar_edicao(diario_recuperacao, 'adicionar', nova_pergunta)
         
         return jsonify({
             'sucesso': True,
@@ -893,6 +1225,7 @@ def adicionar_pergunta_recuperacao():
 
 @app.route('/admin/excluir-pergunta', methods=['POST'])
 @admin_required
+@bancos_travados
 def excluir_pergunta_recuperacao():
     """Exclui uma pergunta específica"""
     try:
@@ -924,9 +1257,11 @@ def excluir_pergunta_recuperacao():
             # Remove disciplina se ficou vazia
             if len(perguntas_recuperacao_db[disciplina]) == 0:
                 del perguntas_recuperacao_db[disciplina]
+        indice_busca.remover(pergunta_removida.get('id'))
+        invalidar_catalogo_recuperacao()
         
-        # Salva no arquivo
-        salvar_perguntas_recuperacao()
+        # Registra no diário de edições
+        registrar_edicao(diario_recuperacao, 'remover', id_pergunta=pergunta_removida.get('id'))
         
         return jsonify({
             'sucesso': True,
@@ -939,6 +1274,7 @@ def excluir_pergunta_recuperacao():
 
 @app.route('/admin/editar-pergunta', methods=['POST'])
 @admin_required
+@bancos_travados
 def editar_pergunta_recuperacao():
     """Edita uma pergunta existente"""
     try:
@@ -976,7 +1312,7 @@ def editar_pergunta_recuperacao():
             return jsonify({'erro': 'Índice inválido'}), 400
         
         # Atualiza a pergunta
-        perguntas[indice] = {
+        perguntas[indice] = registro_perguntas.congelar_edicao({
             'pergunta': data['pergunta'].strip(),
             'opcoes': [opcao.strip() for opcao in opcoes],
             'resposta_correta': resposta_correta,
@@ -986,10 +1322,11 @@ def editar_pergunta_recuperacao():
             'dificuldade': data.get('dificuldade', 'medio'),
             'explicacao': data.get('explicacao', '').strip(),
             'referencia': data.get('referencia', '').strip()
-        }
+        }, perguntas[indice], PREFIXO_ID_RECUPERACAO)
+        indice_busca.adicionar(BANCO_RECUPERACAO, perguntas[indice])
         
-        # Salva no arquivo
-        salvar_perguntas_recuperacao()
+        # Registra no diário de edições
+        registrar_edicao(diario_recuperacao, 'substituir', perguntas[indice])
         
         return jsonify({
             'sucesso': True,
@@ -1025,8 +1362,20 @@ def obter_pergunta_recuperacao(disciplina, topico, indice):
 
 def salvar_perguntas_recuperacao():
     """Salva as perguntas de recuperação no arquivo JSON"""
+    invalidar_catalogo_recuperacao()
+    reindexar_busca_recuperacao(perguntas_recuperacao_db)
+    # Histórico antes do banco (write-ahead)
+    registrar_historico_recuperacao()
     try:
-        safe_write_json('data/perguntas_recuperacao.json', perguntas_recuperacao_db)
+        if banco_sqlite is not None:
+            banco_sqlite.salvar_recuperacao(perguntas_recuperacao_db)
+            marcar_banco_gravado(diario_recuperacao)
+            checkpoint_historico(historico_recuperacao)
+            return True
+        with diario_recuperacao.regravacao_completa():
+            safe_write_json(PERGUNTAS_RECUPERACAO_JSON_PATH, perguntas_recuperacao_db)
+        marcar_banco_gravado(diario_recuperacao)
+        checkpoint_historico(historico_recuperacao)
         return True
     except Exception as e:
         print(f"ERRO ao salvar perguntas de recuperação: {e}")
@@ -1062,6 +1411,7 @@ def exemplo_json():
 
 @app.route('/admin/upload-perguntas', methods=['POST'])
 @admin_required
+@bancos_travados
 def upload_perguntas():
     """Upload de perguntas via JSON"""
     try:
@@ -1078,6 +1428,20 @@ def upload_perguntas():
         # Valida a estrutura
         if not isinstance(data, dict):
             return jsonify({'erro': 'JSON deve ser um objeto'}), 400
+        # Quase duplicadas (MinHash/LSH) em relação ao banco e ao próprio upload
+        try:
+            limiar = float(request.form.get('limiar_similaridade', DUPLICATAS_LIMIAR))
+        except ValueError:
+            return jsonify({'erro': 'Parâmetro limiar_similaridade inválido'}), 400
+        ignorar_similares = request.form.get('ignorar_similares', '').lower() in ('1', 'true', 'sim')
+        detector = None
+        if limiar > 0:
+            detector = DetectorDuplicatas(min(limiar, 1.0))
+            for topicos in perguntas_recuperacao_db.values():
+                for perguntas in topicos.values():
+                    for pergunta in perguntas:
+                        detector.adicionar(pergunta.get('id'), pergunta)
+        similares = []
         # Processa as perguntas
         total_perguntas = 0
         for disciplina, topicos in data.items():
@@ -1092,20 +1456,39 @@ def upload_perguntas():
                 if topico not in perguntas_recuperacao_db[disciplina]:
                     perguntas_recuperacao_db[disciplina][topico] = []
                 # Adiciona perguntas
-                for pergunta in perguntas:
+                for posicao, pergunta in enumerate(perguntas):
                     if validar_pergunta(pergunta, len(perguntas_recuperacao_db[disciplina][topico]) + 1):
                         pergunta['disciplina'] = disciplina
                         pergunta['topico'] = topico
-                        perguntas_recuperacao_db[disciplina][topico].append(pergunta)
+                        if detector is not None:
+                            parecidas = detector.adicionar(f'upload:{disciplina}/{topico}#{posicao}', pergunta)
+                            if parecidas:
+                                similares.append({
+                                    'disciplina': disciplina,
+                                    'topico': topico,
+                                    'posicao': posicao,
+                                    'pergunta': str(pergunta.get('pergunta', ''))[:100],
+                                    'similares': [{'chave': c, 'similaridade': round(s, 3)} for c, s in parecidas[:5]],
+                                })
+                                if ignorar_similares:
+                                    continue
+                        perguntas_recuperacao_db[disciplina][topico].append(
+                            registro_perguntas.congelar(pergunta, PREFIXO_ID_RECUPERACAO)
+                        )
                         total_perguntas += 1
         # Salva no arquivo
         salvar_perguntas_recuperacao()
         # Recarrega o banco de perguntas de recuperação do arquivo salvo
         carregar_perguntas_recuperacao()
+        mensagem = f'{total_perguntas} perguntas importadas com sucesso!'
+        if similares:
+            acao = 'ignoradas' if ignorar_similares else 'importadas mesmo assim'
+            mensagem += f' {len(similares)} quase duplicadas ({acao}).'
         return jsonify({
             'sucesso': True,
-            'mensagem': f'{total_perguntas} perguntas importadas com sucesso!',
-            'total_perguntas': total_perguntas
+            'mensagem': mensagem,
+            'total_perguntas': total_perguntas,
+            'quase_duplicadas': similares
         })
     except json.JSONDecodeError:
         return jsonify({'erro': 'Arquivo JSON inválido'}), 400
@@ -1114,13 +1497,155 @@ def upload_perguntas():
 
 def salvar_perguntas_principais():
     """Salva as perguntas principais no arquivo JSON"""
+    # Histórico antes do banco (write-ahead)
+    registrar_historico_principal()
     try:
-        safe_write_json(PERGUNTAS_JSON_PATH, perguntas_db)
+        if banco_sqlite is not None:
+            banco_sqlite.salvar_principal(perguntas_db)
+            marcar_banco_gravado(diario_principal)
+            checkpoint_historico(historico_principal)
+            return True
+        with diario_principal.regravacao_completa():
+            gravar_perguntas(PERGUNTAS_JSON_PATH, perguntas_db)
+        marcar_banco_gravado(diario_principal)
+        checkpoint_historico(historico_principal)
         return True
     except Exception as e:
         print(f"ERRO ao salvar perguntas principais: {e}")
         return False
 
+def registrar_edicao(diario, op, pergunta=None, id_pergunta=None):
+    """Grava uma edição individual no diário do banco, sem regravar o JSON inteiro"""
+    historico = historico_principal if diario is diario_principal else historico_recuperacao
+    if historico is not None:
+        try:
+            historico.registrar_edicao(ler_disco(historico), op, pergunta, id_pergunta)
+        except Exception as e:
+            print(f"ERRO ao registrar edição no histórico {historico.caminho_log}: {e}")
+    try:
+        if banco_sqlite is not None:
+            # No SQLite a edição altera diretamente a linha da pergunta
+            banco = BANCO_PRINCIPAL if diario is diario_principal else BANCO_RECUPERACAO
+            banco_sqlite.aplicar_operacao(banco, op, pergunta, id_pergunta)
+            marcar_banco_gravado(diario)
+            checkpoint_historico(historico)
+            return True
+        tamanho = diario.registrar(op, pergunta, id_pergunta)
+        observador_bancos.marcar_atual(diario.caminho)
+        compactador_diarios.registrado(tamanho)
+        checkpoint_historico(historico)
+        return True
+    except Exception as e:
+        print(f"ERRO ao registrar edição no diário {diario.caminho}: {e}")
+        return False
+
+def historico_carregado_principal(perguntas):
+    """Estado recém-carregado do banco principal: base das próximas diferenças do histórico"""
+    if historico_principal is not None:
+        historico_principal.definir_estado(estado_lista(perguntas))
+
+def historico_carregado_recuperacao(banco):
+    """Estado recém-carregado do banco de recuperação: base das próximas diferenças do histórico"""
+    if historico_recuperacao is not None:
+        historico_recuperacao.definir_estado(estado_recuperacao(banco))
+
+def registrar_historico_principal(origem='admin'):
+    """Registra no histórico as alterações do banco principal desde a última carga/gravação"""
+    if historico_principal is None:
+        return
+    try:
+        historico_principal.registrar_estado(estado_lista(perguntas_db), origem, ler_disco_principal)
+    except Exception as e:
+        print(f"ERRO ao registrar histórico do banco principal: {e}")
+
+def registrar_historico_recuperacao(banco=None, origem='admin'):
+    """Registra no histórico as alterações do banco de recuperação desde a última carga/gravação"""
+    if historico_recuperacao is None:
+        return
+    try:
+        historico_recuperacao.registrar_estado(
+            estado_recuperacao(perguntas_recuperacao_db if banco is None else banco), origem, ler_disco_recuperacao
+        )
+    except Exception as e:
+        print(f"ERRO ao registrar histórico do banco de recuperação: {e}")
+
+def ler_disco_principal():
+    """Banco principal como está em disco (JSON com o diário ou SQLite), com as edições dos outros workers"""
+    if banco_sqlite is not None:
+        return registro_perguntas.congelar_lista(banco_sqlite.carregar_lista(BANCO_PRINCIPAL), PREFIXO_ID_PRINCIPAL)
+    base, operacoes = diario_principal.ler(
+        lambda: registro_perguntas.congelar_lista(ler_perguntas(PERGUNTAS_JSON_PATH), PREFIXO_ID_PRINCIPAL)
+    )
+    return aplicar_operacoes_lista(base, operacoes)
+
+def ler_disco_recuperacao():
+    """Banco de recuperação como está em disco (JSON com o diário ou SQLite), com as edições dos outros workers"""
+    if banco_sqlite is not None:
+        banco = banco_sqlite.carregar_recuperacao()
+        for topicos in banco.values():
+            for topico, perguntas in topicos.items():
+                topicos[topico] = [registro_perguntas.congelar(p, PREFIXO_ID_RECUPERACAO) for p in perguntas]
+        return banco
+    (banco, _), operacoes = diario_recuperacao.ler(lambda: ler_banco_recuperacao(registro_perguntas))
+    return aplicar_operacoes_recuperacao(banco, operacoes)
+
+def ler_disco(historico):
+    """Leitor do banco em disco correspondente ao histórico"""
+    return ler_disco_principal if historico is historico_principal else ler_disco_recuperacao
+
+def checkpoint_historico(historico):
+    """Checkpoint do banco no histórico quando o log cresceu além do intervalo"""
+    if historico is None:
+        return
+    try:
+        historico.checkpoint_se_devido(ler_disco(historico))
+    except Exception as e:
+        print(f"ERRO ao gravar checkpoint do histórico {historico.diretorio}: {e}")
+
+def marcar_banco_gravado(diario):
+    """Evita que o observador recarregue um banco gravado pelo próprio processo"""
+    if banco_sqlite is not None:
+        for caminho in banco_sqlite.arquivos():
+            observador_bancos.marcar_atual(caminho)
+        return
+    for caminho in [diario.caminho_banco] + diario.arquivos():
+        observador_bancos.marcar_atual(caminho)
+
+def incorporar_diario_principal(operacoes):
+    """Regrava o JSON principal com as edições do diário (compactação)"""
+    base = RegistroPerguntas().congelar_lista(ler_perguntas(PERGUNTAS_JSON_PATH), PREFIXO_ID_PRINCIPAL)
+    gravar_perguntas(PERGUNTAS_JSON_PATH, aplicar_operacoes_lista(base, operacoes))
+
+def incorporar_diario_recuperacao(operacoes):
+    """Regrava o JSON de recuperação com as edições do diário (compactação)"""
+    banco, _ = ler_banco_recuperacao(RegistroPerguntas())
+    safe_write_json(PERGUNTAS_RECUPERACAO_JSON_PATH, aplicar_operacoes_recuperacao(banco, operacoes))
+
+compactador_diarios.adicionar(diario_principal, incorporar_diario_principal, marcar_banco_gravado)
+compactador_diarios.adicionar(diario_recuperacao, incorporar_diario_recuperacao, marcar_banco_gravado)
+
+def remover_perguntas_disciplina_principal(disciplina, periodo=None):
+    """Remove do banco principal (e do índice) as perguntas de uma disciplina/período"""
+    mantidas = []
+    removidas = []
+    for p in perguntas_db:
+        if p.get('disciplina') == disciplina and (not periodo or p.get('periodo') == int(periodo)):
+            removidas.append(p)
+        else:
+            mantidas.append(p)
+    perguntas_db[:] = mantidas
+    indice_perguntas.remover_varios(removidas)
+    indice_busca.remover_varios(removidas)
+    return removidas
+
+def adicionar_perguntas_principais(perguntas):
+    """Adiciona perguntas ao banco principal mantendo o índice atualizado"""
+    perguntas = registro_perguntas.congelar_lista(perguntas, PREFIXO_ID_PRINCIPAL)
+    perguntas_db.extend(perguntas)
+    for pergunta in perguntas:
+        indice_perguntas.adicionar(pergunta)
+        indice_busca.adicionar(BANCO_PRINCIPAL, pergunta)
+
 @app.route('/admin/quiz-principal')
 @admin_required
 def admin_quiz_principal():
@@ -1141,6 +1666,7 @@ def admin_quiz_principal():
 
 @app.route('/admin/adicionar-pergunta-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def adicionar_pergunta_principal():
     """Adiciona uma nova pergunta ao quiz principal"""
     try:
@@ -1174,11 +1700,13 @@ def adicionar_pergunta_principal():
             'explicacao': data.get('explicacao', '').strip()
         }
         
-        # Adiciona ao banco de dados
-        perguntas_db.append(nova_pergunta)
+        # Adiciona ao banco de dados (id único em todo o registro, já que o
+        # diário identifica as perguntas pelo id)
+        nova_pergunta = registro_perguntas.congelar(nova_pergunta, PREFIXO_ID_PRINCIPAL)
+        adicionar_perguntas_principais([nova_pergunta])
         
-        # Salva no arquivo
-        salvar_perguntas_principais()
+        # Registra no diário de edições
+        registrar_edicao(diario_principal, 'adicionar', nova_pergunta)
         
         return jsonify({
             'sucesso': True,
@@ -1191,18 +1719,27 @@ def adicionar_pergunta_principal():
 
 @app.route('/admin/editar-pergunta-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def editar_pergunta_principal():
     """Edita uma pergunta existente do quiz principal"""
     try:
         data = request.get_json()
         
         # Validação dos dados
-        campos_obrigatorios = ['indice', 'pergunta', 'opcoes', 'resposta_correta', 'periodo', 'disciplina']
+        campos_obrigatorios = ['pergunta', 'opcoes', 'resposta_correta', 'periodo', 'disciplina']
         for campo in campos_obrigatorios:
             if not data.get(campo):
                 return jsonify({'erro': f'Campo {campo} é obrigatório'}), 400
         
-        indice = data['indice']
+        # A pergunta pode ser indicada pelo id (estável) ou pela posição
+        if data.get('id'):
+            indice = posicao_pergunta_principal(data['id'])
+            if indice is None:
+                return jsonify({'erro': 'Pergunta não encontrada'}), 404
+        elif data.get('indice') is None:
+            return jsonify({'erro': 'Campo id ou indice é obrigatório'}), 400
+        else:
+            indice = data['indice']
         if indice < 0 or indice >= len(perguntas_db):
             return jsonify({'erro': 'Índice inválido'}), 400
         
@@ -1217,7 +1754,8 @@ def editar_pergunta_principal():
             return jsonify({'erro': 'A resposta correta deve estar entre as opções'}), 400
         
         # Atualiza a pergunta
-        perguntas_db[indice] = {
+        pergunta_antiga = perguntas_db[indice]
+        perguntas_db[indice] = registro_perguntas.congelar_edicao({
             'pergunta': data['pergunta'].strip(),
             'opcoes': [opcao.strip() for opcao in opcoes],
             'resposta_correta': resposta_correta,
@@ -1226,10 +1764,12 @@ def editar_pergunta_principal():
             'disciplina': data['disciplina'].strip(),
             'dificuldade': data.get('dificuldade', 'medio'),
             'explicacao': data.get('explicacao', '').strip()
-        }
+        }, pergunta_antiga, PREFIXO_ID_PRINCIPAL)
+        indice_perguntas.substituir(pergunta_antiga, perguntas_db[indice])
+        indice_busca.adicionar(BANCO_PRINCIPAL, perguntas_db[indice])
         
-        # Salva no arquivo
-        salvar_perguntas_principais()
+        # Registra no diário de edições
+        registrar_edicao(diario_principal, 'substituir', perguntas_db[indice])
         
         return jsonify({
             'sucesso': True,
@@ -1242,12 +1782,19 @@ def editar_pergunta_principal():
 
 @app.route('/admin/excluir-pergunta-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def excluir_pergunta_principal():
     """Exclui uma pergunta do quiz principal"""
     try:
         data = request.get_json()
         indice = data.get('indice')
         
+        # A pergunta pode ser indicada pelo id (estável) ou pela posição
+        if data.get('id'):
+            indice = posicao_pergunta_principal(data['id'])
+            if indice is None:
+                return jsonify({'erro': 'Pergunta não encontrada'}), 404
+        
         if indice is None:
             return jsonify({'erro': 'Índice é obrigatório'}), 400
         
@@ -1256,9 +1803,11 @@ def excluir_pergunta_principal():
         
         # Remove a pergunta
         pergunta_removida = perguntas_db.pop(indice)
+        indice_perguntas.remover(pergunta_removida)
+        indice_busca.remover(pergunta_removida.get('id'))
         
-        # Salva no arquivo
-        salvar_perguntas_principais()
+        # Registra no diário de edições
+        registrar_edicao(diario_principal, 'remover', id_pergunta=pergunta_removida.get('id'))
         
         return jsonify({
             'sucesso': True,
@@ -1285,15 +1834,87 @@ def obter_pergunta_principal(indice):
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
+def codificar_cursor(chave):
+    """Cursor opaco da listagem: chave de ordenação da última pergunta da página"""
+    return base64.urlsafe_b64encode(json.dumps(list(chave), ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(chave, list):
+        raise ValueError('Cursor inválido')
+    return tuple(chave)
+
+def posicao_pergunta_principal(id_pergunta):
+    """Posição atual de uma pergunta do banco principal a partir do id (pelo índice)"""
+    posicao = indice_perguntas.posicao(id_pergunta)
+    if posicao is None or posicao >= len(perguntas_db) or perguntas_db[posicao].get('id') != id_pergunta:
+        return None
+    return posicao
+
 @app.route('/admin/listar-perguntas-principais')
 @admin_required
 def listar_perguntas_principais():
     """Lista todas as perguntas do quiz principal com paginação"""
     try:
-        pagina = int(request.args.get('pagina', 1))
-        por_pagina = int(request.args.get('por_pagina', 20))
+        try:
+            pagina = int(request.args.get('pagina', 1))
+            por_pagina = int(request.args.get('por_pagina', 20))
+        except ValueError:
+            return jsonify({'erro': 'Parâmetros pagina e por_pagina devem ser inteiros'}), 400
         disciplina = request.args.get('disciplina', '')
-        periodo = request.args.get('periodo', '')
+        try:
+            periodo = int(request.args['periodo']) if request.args.get('periodo') else None
+        except ValueError:
+            return jsonify({'erro': 'Parâmetro periodo inválido'}), 400
+        
+        # Paginação por cursor sobre o índice (estável sob exclusões concorrentes)
+        if 'cursor' in request.args or 'ordem' in request.args:
+            ordem = request.args.get('ordem', 'id')
+            if ordem not in ORDENACOES:
+                return jsonify({'erro': f'Ordenação inválida. Use: {", ".join(ORDENACOES)}'}), 400
+            direcao = request.args.get('direcao', 'asc')
+            try:
+                limite = min(max(int(request.args.get('limite', por_pagina)), 1), 200)
+            except ValueError:
+                return jsonify({'erro': 'Parâmetro limite inválido'}), 400
+            cursor = request.args.get('cursor')
+            try:
+                apos = decodificar_cursor(cursor) if cursor else None
+            except ValueError:
+                return jsonify({'erro': 'Cursor inválido'}), 400
+            try:
+                perguntas_pagina, total, ultima = indice_perguntas.pagina(
+                    periodo, disciplina or None, ordem, direcao == 'desc', apos, limite
+                )
+            except ValueError as e:
+                return jsonify({'erro': str(e)}), 400
+            return jsonify({
+                'perguntas': perguntas_pagina,
+                'total': total,
+                'limite': limite,
+                'ordem': ordem,
+                'direcao': direcao,
+                'proximo_cursor': codificar_cursor(ultima) if ultima is not None else None
+            })
+        
+        if banco_sqlite is not None:
+            # Filtro e paginação pelos índices do SQLite
+            perguntas_pagina, total = banco_sqlite.listar(
+                BANCO_PRINCIPAL,
+                {'disciplina': disciplina, 'periodo': periodo},
+                limite=por_pagina,
+                deslocamento=(pagina - 1) * por_pagina
+            )
+            return jsonify({
+                'perguntas': perguntas_pagina,
+                'total': total,
+                'pagina': pagina,
+                'por_pagina': por_pagina,
+                'total_paginas': (total + por_pagina - 1) // por_pagina
+            })
         
         # Filtra perguntas
         perguntas_filtradas = perguntas_db
@@ -1301,8 +1922,8 @@ def listar_perguntas_principais():
         if disciplina:
             perguntas_filtradas = [p for p in perguntas_filtradas if p.get('disciplina') == disciplina]
         
-        if periodo:
-            perguntas_filtradas = [p for p in perguntas_filtradas if p.get('periodo') == int(periodo)]
+        if periodo is not None:
+            perguntas_filtradas = [p for p in perguntas_filtradas if p.get('periodo') == periodo]
         
         # Calcula paginação
         total = len(perguntas_filtradas)
@@ -1318,7 +1939,36 @@ def listar_perguntas_principais():
             'por_pagina': por_pagina,
             'total_paginas': (total + por_pagina - 1) // por_pagina
         })
-        
+
+    except Exception as e:
+        return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
+
+@app.route('/admin/buscar')
+@admin_required
+def buscar_perguntas():
+    """Busca textual nas perguntas dos dois bancos (pergunta, opções, explicação e referência)"""
+    try:
+        consulta = request.args.get('q', '').strip()
+        if not consulta:
+            return jsonify({'erro': 'Parâmetro q é obrigatório'}), 400
+        banco = request.args.get('banco', '')
+        if banco and banco not in (BANCO_PRINCIPAL, BANCO_RECUPERACAO):
+            return jsonify({'erro': f'Banco inválido. Use: {BANCO_PRINCIPAL}, {BANCO_RECUPERACAO}'}), 400
+        limite = min(max(int(request.args.get('limite', 20)), 1), 100)
+
+        resultados, total = indice_busca.buscar(consulta, banco or None, limite)
+
+        return jsonify({
+            'consulta': consulta,
+            'total': total,
+            'resultados': [
+                {'banco': banco_pergunta, 'pontuacao': round(pontuacao, 3), 'pergunta': pergunta}
+                for pontuacao, banco_pergunta, pergunta in resultados
+            ]
+        })
+
+    except ValueError:
+        return jsonify({'erro': 'Parâmetro limite inválido'}), 400
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
@@ -1448,6 +2098,15 @@ def admin_dashboard():
     
     return render_template('admin/dashboard.html', stats=stats)
 
+@app.route('/admin/estatisticas-sessoes')
+@admin_required
+def estatisticas_sessoes():
+    """Métricas das sessões de quiz (ativas, expiradas, despejadas)"""
+    try:
+        return jsonify(session_store.estatisticas())
+    except Exception as e:
+        return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
+
 @app.route('/admin/listar-disciplinas')
 @admin_required
 def listar_disciplinas():
@@ -1489,23 +2148,12 @@ def embaralhar_perguntas(perguntas):
     return perguntas_embaralhadas
 
 def embaralhar_opcoes(perguntas):
-    """Embaralha as opções de cada pergunta mantendo a resposta correta"""
-    for pergunta in perguntas:
-        # Guarda a resposta correta
-        resposta_correta = pergunta['resposta_correta']
-        
-        # Embaralha as opções
-        opcoes = pergunta['opcoes'].copy()
-        random.shuffle(opcoes)
-        
-        # Atualiza as opções e a resposta correta
-        pergunta['opcoes'] = opcoes
-        pergunta['resposta_correta'] = resposta_correta
-        
-        # Atualiza o índice da resposta correta
-        pergunta['indice_resposta_correta'] = opcoes.index(resposta_correta)
-    
-    return perguntas
+    """Embaralha as opções de cada pergunta mantendo a resposta correta.
+
+    Não altera os registros do banco: retorna uma apresentação por pergunta,
+    que guarda apenas a permutação dos índices das opções.
+    """
+    return [ApresentacaoPergunta.embaralhada(pergunta) for pergunta in perguntas]
 
 @app.route('/admin/estatisticas')
 def admin_estatisticas():
@@ -1604,20 +2252,99 @@ def admin_redefinir_banco():
 
 @app.route('/admin/exportar_banco')
 def admin_exportar_banco():
-    # Exporta o banco de perguntas principal como download
+    # Exporta o banco de perguntas principal como download (?formato=json|ndjson;
+    # padrão: o formato do arquivo do banco)
+    formato_banco = formato_arquivo(PERGUNTAS_JSON_PATH) if banco_sqlite is None else 'json'
+    formato = request.args.get('formato', formato_banco)
+    if formato == FORMATO_NDJSON:
+        if formato_banco == FORMATO_NDJSON and not diario_principal.pendente():
+            return send_file(PERGUNTAS_JSON_PATH, as_attachment=True, download_name='perguntas.ndjson',
+                             mimetype='application/x-ndjson')
+        perguntas = perguntas_db
+        return app.response_class(
+            (linha_ndjson(p) for p in perguntas),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': 'attachment; filename=perguntas.ndjson'}
+        )
+    if banco_sqlite is not None or formato_banco == FORMATO_NDJSON or diario_principal.pendente():
+        return app.response_class(
+            json.dumps(perguntas_db, ensure_ascii=False, indent=2),
+            mimetype='application/json',
+            headers={'Content-Disposition': 'attachment; filename=perguntas.json'}
+        )
     return send_file(PERGUNTAS_JSON_PATH, as_attachment=True, download_name='perguntas.json')
 
+@app.route('/admin/exportar')
+@admin_required
+def admin_exportar():
+    """Exporta um banco (ou parte dele) em JSON, NDJSON ou CSV, em streaming.
+
+    Parâmetros: banco (principal|recuperacao), formato (json|ndjson|csv),
+    gzip (1 para compactar) e os filtros periodo, disciplina, topico e
+    fonte_material.
+    """
+    banco = request.args.get('banco', BANCO_PRINCIPAL)
+    if banco not in (BANCO_PRINCIPAL, BANCO_RECUPERACAO):
+        return jsonify({'erro': f'Banco inválido. Use: {BANCO_PRINCIPAL}, {BANCO_RECUPERACAO}'}), 400
+    formato = request.args.get('formato', 'json')
+    if formato not in FORMATOS:
+        return jsonify({'erro': f'Formato inválido. Use: {", ".join(FORMATOS)}'}), 400
+    compactar = request.args.get('gzip', '').lower() in ('1', 'true', 'sim')
+    filtros = {
+        campo: request.args.get(campo, '').strip()
+        for campo in ('periodo', 'disciplina', 'topico', 'fonte_material')
+        if request.args.get(campo, '').strip()
+    }
+
+    # Copia apenas as referências: edições durante o download não afetam a exportação
+    if banco == BANCO_PRINCIPAL:
+        perguntas = list(perguntas_db)
+    else:
+        perguntas = [
+            p for d, topicos in list(perguntas_recuperacao_db.items())
+            if 'disciplina' not in filtros or d == filtros['disciplina']
+            for t, lista in list(topicos.items())
+            if 'topico' not in filtros or t == filtros['topico']
+            for p in list(lista)
+        ]
+
+    def filtradas():
+        for pergunta in perguntas:
+            if all(str(pergunta.get(campo, '')) == valor for campo, valor in filtros.items()):
+                yield pergunta
+
+    mimetype, extensao = FORMATOS[formato]
+    nome = f'perguntas_{banco}.{extensao}'
+    if compactar:
+        mimetype, nome = 'application/gzip', nome + '.gz'
+    return app.response_class(
+        gerar_exportacao(filtradas(), formato, compactar),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nome}'}
+    )
+
 def salvar_sessao_quiz(session_id, quiz_data):
-    path = os.path.join(SESSOES_DIR, f'{session_id}.json')
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(quiz_data, f, ensure_ascii=False, default=str)
+    """Grava a sessão do quiz no backend configurado"""
+    session_store.save(session_id, quiz_data)
+
+def registrar_evento_sessao(session_id, quiz_data, evento):
+    """Aplica o evento à sessão carregada e grava apenas o evento no log"""
+    return session_store.append_event(session_id, quiz_data, evento)
 
 def carregar_sessao_quiz(session_id):
-    path = os.path.join(SESSOES_DIR, f'{session_id}.json')
-    if not os.path.exists(path):
+    """Carrega a sessão do quiz do backend configurado (None se não existir).
+
+    As perguntas gravadas como [id, permutação] são resolvidas contra o banco em memória.
+    """
+    if not session_id:
         return None
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    quiz_data = session_store.get(session_id)
+    metrica_sessoes.inc('encontrada' if quiz_data else 'ausente')
+    if quiz_data:
+        quiz_data['perguntas'] = [
+            ApresentacaoPergunta.da_sessao(item, registro_perguntas) for item in quiz_data.get('perguntas', [])
+        ]
+    return quiz_data
 
 def parse_datetime(dt):
     if isinstance(dt, datetime):
@@ -1629,16 +2356,20 @@ def parse_datetime(dt):
 
 @app.route('/admin/limpar_banco_recuperacao', methods=['POST'])
 @admin_required
+@bancos_travados
 def limpar_banco_recuperacao():
     """Remove todos os arquivos de perguntas de recuperação e recarrega o banco."""
     import glob
     import os
     arquivos = glob.glob(os.path.join('data', 'perguntas_recuperacao*.json')) + glob.glob(os.path.join('data', 'RECUP_*.json'))
-    for arquivo in arquivos:
-        try:
-            os.remove(arquivo)
-        except Exception as e:
-            print(f"Erro ao remover {arquivo}: {e}")
+    registrar_historico_recuperacao({})
+    # O diário de edições também é descartado, senão seria reaplicado ao recarregar
+    with diario_recuperacao.regravacao_completa():
+        for arquivo in arquivos:
+            try:
+                os.remove(arquivo)
+            except Exception as e:
+                print(f"Erro ao remover {arquivo}: {e}")
     # Recarrega banco vazio
     carregar_perguntas_recuperacao()
     return jsonify({'status': 'ok', 'msg': 'Banco de recuperação limpo com sucesso.'})
@@ -1653,26 +2384,17 @@ def criar_backup_disciplina(disciplina):
         if disciplina not in perguntas_recuperacao_db:
             return None, "Disciplina não encontrada"
         
-        # Cria diretório de backup se não existir
-        backup_dir = os.path.join('data', 'backups')
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
         # Gera timestamp único
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_filename = f"backup_{disciplina}_{timestamp}.json"
-        backup_path = os.path.join(backup_dir, backup_filename)
         
-        # Salva backup
-        backup_data = {
+        # Salva backup (só as perguntas que ainda não estão no armazém são gravadas)
+        metadados = {
             'disciplina': disciplina,
             'timestamp': timestamp,
-            'data': perguntas_recuperacao_db[disciplina],
             'total_perguntas': sum(len(perguntas) for perguntas in perguntas_recuperacao_db[disciplina].values())
         }
-        
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
+        backup_path, _ = armazem_backups_recuperacao.gravar(backup_filename, metadados, perguntas_recuperacao_db[disciplina])
         
         return backup_path, None
     except Exception as e:
@@ -1681,27 +2403,19 @@ def criar_backup_disciplina(disciplina):
 def listar_backups_disponiveis():
     """Lista todos os backups disponíveis"""
     try:
-        backup_dir = os.path.join('data', 'backups')
-        if not os.path.exists(backup_dir):
-            return []
-        
+        # Só o cabeçalho de cada manifesto é lido
         backups = []
-        for filename in os.listdir(backup_dir):
-            if filename.startswith('backup_') and filename.endswith('.json'):
-                filepath = os.path.join(backup_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        backup_data = json.load(f)
-                    
-                    backups.append({
-                        'filename': filename,
-                        'disciplina': backup_data.get('disciplina', 'Desconhecida'),
-                        'timestamp': backup_data.get('timestamp', ''),
-                        'total_perguntas': backup_data.get('total_perguntas', 0),
-                        'data_criacao': datetime.strptime(backup_data['timestamp'], '%Y%m%d_%H%M%S').strftime('%d/%m/%Y %H:%M:%S')
-                    })
-                except Exception as e:
-                    print(f"Erro ao ler backup {filename}: {e}")
+        for filename, backup_data in armazem_backups_recuperacao.listar('backup_'):
+            try:
+                backups.append({
+                    'filename': filename,
+                    'disciplina': backup_data.get('disciplina', 'Desconhecida'),
+                    'timestamp': backup_data.get('timestamp', ''),
+                    'total_perguntas': backup_data.get('total_perguntas', 0),
+                    'data_criacao': datetime.strptime(backup_data['timestamp'], '%Y%m%d_%H%M%S').strftime('%d/%m/%Y %H:%M:%S')
+                })
+            except Exception as e:
+                print(f"Erro ao ler backup {filename}: {e}")
         
         # Ordena por timestamp (mais recente primeiro)
         backups.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -1712,6 +2426,7 @@ def listar_backups_disponiveis():
 
 @app.route('/admin/remover-disciplina', methods=['POST'])
 @admin_required
+@bancos_travados
 def remover_disciplina():
     """Remove uma disciplina específica com backup automático"""
     try:
@@ -1765,6 +2480,7 @@ def listar_backups():
 
 @app.route('/admin/restaurar-backup', methods=['POST'])
 @admin_required
+@bancos_travados
 def restaurar_backup():
     """Restaura uma disciplina a partir de um backup"""
     try:
@@ -1774,13 +2490,11 @@ def restaurar_backup():
         if not filename:
             return jsonify({'erro': 'Nome do arquivo de backup é obrigatório'}), 400
         
-        backup_path = os.path.join('data', 'backups', filename)
-        if not os.path.exists(backup_path):
+        if not armazem_backups_recuperacao.existe(filename):
             return jsonify({'erro': 'Arquivo de backup não encontrado'}), 404
         
         # Carrega backup
-        with open(backup_path, 'r', encoding='utf-8') as f:
-            backup_data = json.load(f)
+        backup_data = armazem_backups_recuperacao.ler(filename)
         
         disciplina = backup_data.get('disciplina')
         dados_disciplina = backup_data.get('data', {})
@@ -1792,7 +2506,10 @@ def restaurar_backup():
         disciplina_existente = disciplina in perguntas_recuperacao_db
         
         # Restaura a disciplina
-        perguntas_recuperacao_db[disciplina] = dados_disciplina
+        perguntas_recuperacao_db[disciplina] = {
+            topico: registro_perguntas.congelar_lista(perguntas, PREFIXO_ID_RECUPERACAO)
+            for topico, perguntas in dados_disciplina.items()
+        }
         
         # Salva no arquivo
         salvar_perguntas_recuperacao()
@@ -1822,12 +2539,11 @@ def excluir_backup():
         if not filename:
             return jsonify({'erro': 'Nome do arquivo de backup é obrigatório'}), 400
         
-        backup_path = os.path.join('data', 'backups', filename)
-        if not os.path.exists(backup_path):
+        if not armazem_backups_recuperacao.existe(filename):
             return jsonify({'erro': 'Arquivo de backup não encontrado'}), 404
         
-        # Remove o arquivo
-        os.remove(backup_path)
+        # Remove o manifesto e os objetos que só ele usava
+        armazem_backups_recuperacao.excluir(filename)
         
         return jsonify({
             'sucesso': True,
@@ -1839,6 +2555,7 @@ def excluir_backup():
 
 @app.route('/admin/restaurar-todos-backups', methods=['POST'])
 @admin_required
+@bancos_travados
 def restaurar_todos_backups():
     """Restaura todos os backups disponíveis de uma vez"""
     try:
@@ -1849,20 +2566,18 @@ def restaurar_todos_backups():
         
         # Cria backup do estado atual antes da restauração
         timestamp_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_atual_path = os.path.join('data', 'backups', f'backup_estado_atual_{timestamp_atual}.json')
-        
-        backup_atual_data = {
-            'disciplina': 'ESTADO_ATUAL',
-            'timestamp': timestamp_atual,
-            'data': perguntas_recuperacao_db.copy(),
-            'total_perguntas': sum(
-                sum(len(perguntas) for perguntas in topicos.values()) 
-                for topicos in perguntas_recuperacao_db.values()
-            )
-        }
-        
-        with open(backup_atual_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_atual_data, f, ensure_ascii=False, indent=2)
+        backup_atual_path, _ = armazem_backups_recuperacao.gravar(
+            f'backup_estado_atual_{timestamp_atual}.json',
+            {
+                'disciplina': 'ESTADO_ATUAL',
+                'timestamp': timestamp_atual,
+                'total_perguntas': sum(
+                    sum(len(perguntas) for perguntas in topicos.values()) 
+                    for topicos in perguntas_recuperacao_db.values()
+                )
+            },
+            perguntas_recuperacao_db.copy()
+        )
         
         # Restaura todos os backups
         disciplinas_restauradas = []
@@ -1872,10 +2587,7 @@ def restaurar_todos_backups():
         
         for backup_info in backups:
             try:
-                backup_path = os.path.join('data', 'backups', backup_info['filename'])
-                
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    backup_data = json.load(f)
+                backup_data = armazem_backups_recuperacao.ler(backup_info['filename'])
                 
                 disciplina = backup_data.get('disciplina')
                 dados_disciplina = backup_data.get('data', {})
@@ -1885,7 +2597,10 @@ def restaurar_todos_backups():
                     disciplina_existente = disciplina in perguntas_recuperacao_db
                     
                     # Restaura a disciplina
-                    perguntas_recuperacao_db[disciplina] = dados_disciplina
+                    perguntas_recuperacao_db[disciplina] = {
+                        topico: registro_perguntas.congelar_lista(perguntas, PREFIXO_ID_RECUPERACAO)
+                        for topico, perguntas in dados_disciplina.items()
+                    }
                     
                     total_perguntas = sum(len(perguntas) for perguntas in dados_disciplina.values())
                     total_topicos = len(dados_disciplina)
@@ -1931,32 +2646,30 @@ def limpar_todos_backups():
         
         # Cria backup do estado atual antes da limpeza
         timestamp_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_atual_path = os.path.join('data', 'backups', f'backup_estado_atual_{timestamp_atual}.json')
-        
-        backup_atual_data = {
-            'disciplina': 'ESTADO_ATUAL',
-            'timestamp': timestamp_atual,
-            'data': perguntas_recuperacao_db.copy(),
-            'total_perguntas': sum(
-                sum(len(perguntas) for perguntas in topicos.values()) 
-                for topicos in perguntas_recuperacao_db.values()
-            )
-        }
-        
-        with open(backup_atual_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_atual_data, f, ensure_ascii=False, indent=2)
+        backup_atual_path, _ = armazem_backups_recuperacao.gravar(
+            f'backup_estado_atual_{timestamp_atual}.json',
+            {
+                'disciplina': 'ESTADO_ATUAL',
+                'timestamp': timestamp_atual,
+                'total_perguntas': sum(
+                    sum(len(perguntas) for perguntas in topicos.values()) 
+                    for topicos in perguntas_recuperacao_db.values()
+                )
+            },
+            perguntas_recuperacao_db.copy()
+        )
         
         # Remove todos os backups
         arquivos_removidos = []
         for backup_info in backups:
             try:
-                backup_path = os.path.join('data', 'backups', backup_info['filename'])
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
+                if armazem_backups_recuperacao.existe(backup_info['filename']):
+                    armazem_backups_recuperacao.excluir(backup_info['filename'], coletar=False)
                     arquivos_removidos.append(backup_info['filename'])
             except Exception as e:
                 print(f"Erro ao remover backup {backup_info['filename']}: {e}")
                 continue
+        armazem_backups_recuperacao.coletar_lixo()
         
         return jsonify({
             'sucesso': True,
@@ -1986,30 +2699,21 @@ def criar_backup_disciplina_principal(disciplina, periodo=None):
         if not perguntas_disciplina:
             return None, "Disciplina não encontrada"
         
-        # Cria diretório de backup se não existir
-        backup_dir = os.path.join('data', 'backups_principal')
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
         # Gera timestamp único
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         if periodo:
             backup_filename = f"backup_principal_{disciplina}_periodo{periodo}_{timestamp}.json"
         else:
             backup_filename = f"backup_principal_{disciplina}_{timestamp}.json"
-        backup_path = os.path.join(backup_dir, backup_filename)
         
-        # Salva backup
-        backup_data = {
+        # Salva backup (só as perguntas que ainda não estão no armazém são gravadas)
+        metadados = {
             'disciplina': disciplina,
             'periodo': periodo,
             'timestamp': timestamp,
-            'data': perguntas_disciplina,
             'total_perguntas': len(perguntas_disciplina)
         }
-        
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
+        backup_path, _ = armazem_backups_principal.gravar(backup_filename, metadados, perguntas_disciplina)
         
         return backup_path, None
     except Exception as e:
@@ -2018,28 +2722,20 @@ def criar_backup_disciplina_principal(disciplina, periodo=None):
 def listar_backups_principal_disponiveis():
     """Lista todos os backups do quiz principal disponíveis"""
     try:
-        backup_dir = os.path.join('data', 'backups_principal')
-        if not os.path.exists(backup_dir):
-            return []
-        
+        # Só o cabeçalho de cada manifesto é lido
         backups = []
-        for filename in os.listdir(backup_dir):
-            if filename.startswith('backup_principal_') and filename.endswith('.json'):
-                filepath = os.path.join(backup_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        backup_data = json.load(f)
-                    
-                    backups.append({
-                        'filename': filename,
-                        'disciplina': backup_data.get('disciplina', 'Desconhecida'),
-                        'periodo': backup_data.get('periodo'),
-                        'timestamp': backup_data.get('timestamp', ''),
-                        'total_perguntas': backup_data.get('total_perguntas', 0),
-                        'data_criacao': datetime.strptime(backup_data['timestamp'], '%Y%m%d_%H%M%S').strftime('%d/%m/%Y %H:%M:%S')
-                    })
-                except Exception as e:
-                    print(f"Erro ao ler backup {filename}: {e}")
+        for filename, backup_data in armazem_backups_principal.listar('backup_principal_'):
+            try:
+                backups.append({
+                    'filename': filename,
+                    'disciplina': backup_data.get('disciplina', 'Desconhecida'),
+                    'periodo': backup_data.get('periodo'),
+                    'timestamp': backup_data.get('timestamp', ''),
+                    'total_perguntas': backup_data.get('total_perguntas', 0),
+                    'data_criacao': datetime.strptime(backup_data['timestamp'], '%Y%m%d_%H%M%S').strftime('%d/%m/%Y %H:%M:%S')
+                })
+            except Exception as e:
+                print(f"Erro ao ler backup {filename}: {e}")
         
         # Ordena por timestamp (mais recente primeiro)
         backups.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -2050,6 +2746,7 @@ def listar_backups_principal_disponiveis():
 
 @app.route('/admin/remover-disciplina-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def remover_disciplina_principal():
     """Remove uma disciplina específica do quiz principal com backup automático"""
     try:
@@ -2075,10 +2772,7 @@ def remover_disciplina_principal():
             return jsonify({'erro': f'Erro ao criar backup: {erro_backup}'}), 500
         
         # Remove as perguntas
-        if periodo:
-            perguntas_db[:] = [p for p in perguntas_db if not (p.get('disciplina') == disciplina and p.get('periodo') == int(periodo))]
-        else:
-            perguntas_db[:] = [p for p in perguntas_db if p.get('disciplina') != disciplina]
+        remover_perguntas_disciplina_principal(disciplina, periodo)
         
         # Salva no arquivo
         salvar_perguntas_principais()
@@ -2108,6 +2802,7 @@ def listar_backups_principal():
 
 @app.route('/admin/restaurar-backup-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def restaurar_backup_principal():
     """Restaura uma disciplina do quiz principal a partir de um backup"""
     try:
@@ -2117,13 +2812,11 @@ def restaurar_backup_principal():
         if not filename:
             return jsonify({'erro': 'Nome do arquivo de backup é obrigatório'}), 400
         
-        backup_path = os.path.join('data', 'backups_principal', filename)
-        if not os.path.exists(backup_path):
+        if not armazem_backups_principal.existe(filename):
             return jsonify({'erro': 'Arquivo de backup não encontrado'}), 404
         
         # Carrega backup
-        with open(backup_path, 'r', encoding='utf-8') as f:
-            backup_data = json.load(f)
+        backup_data = armazem_backups_principal.ler(filename)
         
         disciplina = backup_data.get('disciplina')
         periodo = backup_data.get('periodo')
@@ -2139,13 +2832,10 @@ def restaurar_backup_principal():
             disciplina_existente = any(p.get('disciplina') == disciplina for p in perguntas_db)
         
         # Remove disciplinas existentes se necessário
-        if periodo:
-            perguntas_db[:] = [p for p in perguntas_db if not (p.get('disciplina') == disciplina and p.get('periodo') == int(periodo))]
-        else:
-            perguntas_db[:] = [p for p in perguntas_db if p.get('disciplina') != disciplina]
+        remover_perguntas_disciplina_principal(disciplina, periodo)
         
         # Adiciona as perguntas do backup
-        perguntas_db.extend(dados_disciplina)
+        adicionar_perguntas_principais(dados_disciplina)
         
         # Salva no arquivo
         salvar_perguntas_principais()
@@ -2171,12 +2861,11 @@ def excluir_backup_principal():
         if not filename:
             return jsonify({'erro': 'Nome do arquivo de backup é obrigatório'}), 400
         
-        backup_path = os.path.join('data', 'backups_principal', filename)
-        if not os.path.exists(backup_path):
+        if not armazem_backups_principal.existe(filename):
             return jsonify({'erro': 'Arquivo de backup não encontrado'}), 404
         
-        # Remove o arquivo
-        os.remove(backup_path)
+        # Remove o manifesto e os objetos que só ele usava
+        armazem_backups_principal.excluir(filename)
         
         return jsonify({
             'sucesso': True,
@@ -2188,70 +2877,75 @@ def excluir_backup_principal():
 
 @app.route('/admin/restaurar-todos-backups-principal', methods=['POST'])
 @admin_required
+@bancos_travados
 def restaurar_todos_backups_principal():
-    """Restaura todos os backups do quiz principal de uma vez"""
+    """Restaura de uma vez o backup mais recente de cada disciplina/período do quiz principal
+
+    Com {"dry_run": true} (ou ?dry_run=1) retorna só a prévia das diferenças, sem alterar o banco.
+    """
     try:
+        data = request.get_json(silent=True) or {}
+        dry_run = str(data.get('dry_run', request.args.get('dry_run', ''))).lower() in ('1', 'true', 'sim')
         backups = listar_backups_principal_disponiveis()
         
         if not backups:
             return jsonify({'erro': 'Nenhum backup disponível para restauração'}), 404
         
+        # Só o backup mais recente de cada (disciplina, período) é lido
+        selecionados, backups_ignorados = selecionar_backups(backups)
+        restauracoes = []
+        for backup_info in selecionados:
+            try:
+                dados_disciplina = armazem_backups_principal.ler(backup_info['filename']).get('data', [])
+            except Exception as e:
+                print(f"Erro ao restaurar backup {backup_info['filename']}: {e}")
+                dados_disciplina = None
+            if dados_disciplina:
+                restauracoes.append((backup_info, dados_disciplina))
+            else:
+                backups_ignorados.append(backup_info['filename'])
+        
+        plano = PlanoRestauracao(perguntas_db, restauracoes)
+        resumo = plano.resumo()
+        
+        if dry_run:
+            return jsonify({
+                'sucesso': True,
+                'dry_run': True,
+                'backups': resumo,
+                'backups_ignorados': backups_ignorados,
+                'total_perguntas_atual': len(perguntas_db),
+                'total_perguntas_apos': len(plano.mantidas) + len(plano.adicionadas),
+                'total_perguntas_removidas': len(plano.removidas),
+                'total_perguntas_restauradas': len(plano.adicionadas)
+            })
+        
         # Cria backup do estado atual antes da restauração
         timestamp_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_atual_path = os.path.join('data', 'backups_principal', f'backup_estado_atual_{timestamp_atual}.json')
-        
-        backup_atual_data = {
-            'disciplina': 'ESTADO_ATUAL',
-            'timestamp': timestamp_atual,
-            'data': perguntas_db.copy(),
-            'total_perguntas': len(perguntas_db)
-        }
-        
-        with open(backup_atual_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_atual_data, f, ensure_ascii=False, indent=2)
+        backup_atual_path, _ = armazem_backups_principal.gravar(
+            f'backup_estado_atual_{timestamp_atual}.json',
+            {
+                'disciplina': 'ESTADO_ATUAL',
+                'timestamp': timestamp_atual,
+                'total_perguntas': len(perguntas_db)
+            },
+            perguntas_db.copy()
+        )
+        
+        # Aplica todos os backups de uma vez; os índices recebem só o que mudou
+        perguntas_db[:] = plano.mantidas
+        indice_perguntas.remover_varios(plano.removidas)
+        indice_busca.remover_varios(plano.removidas)
+        adicionar_perguntas_principais(plano.adicionadas)
         
-        # Restaura todos os backups
         disciplinas_restauradas = []
         disciplinas_substituidas = []
-        total_perguntas_restauradas = 0
-        
-        for backup_info in backups:
-            try:
-                backup_path = os.path.join('data', 'backups_principal', backup_info['filename'])
-                
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    backup_data = json.load(f)
-                
-                disciplina = backup_data.get('disciplina')
-                periodo = backup_data.get('periodo')
-                dados_disciplina = backup_data.get('data', [])
-                
-                if disciplina and dados_disciplina:
-                    # Verifica se a disciplina já existe
-                    if periodo:
-                        disciplina_existente = any(p.get('disciplina') == disciplina and p.get('periodo') == int(periodo) for p in perguntas_db)
-                    else:
-                        disciplina_existente = any(p.get('disciplina') == disciplina for p in perguntas_db)
-                    
-                    # Remove disciplinas existentes se necessário
-                    if periodo:
-                        perguntas_db[:] = [p for p in perguntas_db if not (p.get('disciplina') == disciplina and p.get('periodo') == int(periodo))]
-                    else:
-                        perguntas_db[:] = [p for p in perguntas_db if p.get('disciplina') != disciplina]
-                    
-                    # Adiciona as perguntas do backup
-                    perguntas_db.extend(dados_disciplina)
-                    
-                    total_perguntas_restauradas += len(dados_disciplina)
-                    
-                    if disciplina_existente:
-                        disciplinas_substituidas.append(f"{disciplina}{' - Período ' + str(periodo) if periodo else ''}")
-                    else:
-                        disciplinas_restauradas.append(f"{disciplina}{' - Período ' + str(periodo) if periodo else ''}")
-                        
-            except Exception as e:
-                print(f"Erro ao restaurar backup {backup_info['filename']}: {e}")
-                continue
+        for item in resumo:
+            descricao = descrever_chave(chave_backup(item))
+            if item['perguntas_atuais']:
+                disciplinas_substituidas.append(descricao)
+            else:
+                disciplinas_restauradas.append(descricao)
         
         # Salva o banco atualizado
         salvar_perguntas_principais()
@@ -2260,10 +2954,11 @@ def restaurar_todos_backups_principal():
             'sucesso': True,
             'mensagem': f'Restauração completa do quiz principal realizada com sucesso!',
             'backup_estado_atual': backup_atual_path,
-            'total_backups_restaurados': len(backups),
+            'total_backups_restaurados': len(restauracoes),
+            'backups_ignorados': backups_ignorados,
             'disciplinas_restauradas': disciplinas_restauradas,
             'disciplinas_substituidas': disciplinas_substituidas,
-            'total_perguntas_restauradas': total_perguntas_restauradas
+            'total_perguntas_restauradas': len(plano.adicionadas)
         })
         
     except Exception as e:
@@ -2281,29 +2976,27 @@ def limpar_todos_backups_principal():
         
         # Cria backup do estado atual antes da limpeza
         timestamp_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_atual_path = os.path.join('data', 'backups_principal', f'backup_estado_atual_{timestamp_atual}.json')
-        
-        backup_atual_data = {
-            'disciplina': 'ESTADO_ATUAL',
-            'timestamp': timestamp_atual,
-            'data': perguntas_db.copy(),
-            'total_perguntas': len(perguntas_db)
-        }
-        
-        with open(backup_atual_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_atual_data, f, ensure_ascii=False, indent=2)
+        backup_atual_path, _ = armazem_backups_principal.gravar(
+            f'backup_estado_atual_{timestamp_atual}.json',
+            {
+                'disciplina': 'ESTADO_ATUAL',
+                'timestamp': timestamp_atual,
+                'total_perguntas': len(perguntas_db)
+            },
+            perguntas_db.copy()
+        )
         
         # Remove todos os backups
         arquivos_removidos = []
         for backup_info in backups:
             try:
-                backup_path = os.path.join('data', 'backups_principal', backup_info['filename'])
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
+                if armazem_backups_principal.existe(backup_info['filename']):
+                    armazem_backups_principal.excluir(backup_info['filename'], coletar=False)
                     arquivos_removidos.append(backup_info['filename'])
             except Exception as e:
                 print(f"Erro ao remover backup {backup_info['filename']}: {e}")
                 continue
+        armazem_backups_principal.coletar_lixo()
         
         return jsonify({
             'sucesso': True,
@@ -2316,15 +3009,72 @@ def limpar_todos_backups_principal():
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
-# Carrega perguntas na inicialização
-if not carregar_perguntas():
-    print("ERRO: Não foi possível carregar as perguntas principais!")
-    exit(1)
-else:
-    debug_perguntas()
+def arquivos_bancos():
+    """Arquivos observados para recarga automática"""
+    if banco_sqlite is not None:
+        return banco_sqlite.arquivos()
+    return [PERGUNTAS_JSON_PATH] + diario_principal.arquivos() + arquivos_recuperacao() + diario_recuperacao.arquivos()
+
+def recarregar_bancos_alterados(alterados):
+    """Recarrega os bancos cujos arquivos mudaram em disco (thread do observador)"""
+    with lock_bancos:
+        recarregar_bancos(alterados)
 
-if not carregar_perguntas_recuperacao():
-    print("AVISO: Não foi possível carregar as perguntas de recuperação. Modo recuperação pode não funcionar.")
+def recarregar_bancos(alterados):
+    if banco_sqlite is not None:
+        carregar_perguntas()
+        carregar_perguntas_recuperacao()
+        metrica_recargas.inc(BANCO_PRINCIPAL)
+        metrica_recargas.inc(BANCO_RECUPERACAO)
+        return
+    arquivos_principal = {PERGUNTAS_JSON_PATH, *diario_principal.arquivos()}
+    if alterados & arquivos_principal and os.path.exists(PERGUNTAS_JSON_PATH):
+        carregar_perguntas()
+        metrica_recargas.inc(BANCO_PRINCIPAL)
+    if alterados - arquivos_principal:
+        carregar_perguntas_recuperacao()
+        metrica_recargas.inc(BANCO_RECUPERACAO)
+
+observador_bancos = ObservadorBancos(arquivos_bancos, recarregar_bancos_alterados, intervalo=BANCOS_RECARGA_INTERVALO)
+
+bancos_inicializados = False
+
+def inicializar_bancos():
+    """Carrega os bancos de perguntas uma única vez por processo.
+
+    Com o gunicorn em modo preload (gunicorn.conf.py) isso roda no processo
+    mestre, antes do fork, e os workers herdam os bancos já carregados. Ao
+    final os objetos carregados são movidos para a geração permanente do
+    coletor de lixo (gc.freeze), para que as coletas nos workers não escrevam
+    nos cabeçalhos desses objetos e as páginas continuem compartilhadas.
+    """
+    global bancos_inicializados
+    if bancos_inicializados:
+        return
+    # Estado dos arquivos antes da leitura: uma gravação durante a carga
+    # ainda é detectada pelo observador
+    observador_bancos.marcar_atual()
+    if not carregar_perguntas():
+        print("ERRO: Não foi possível carregar as perguntas principais!")
+        exit(1)
+    else:
+        debug_perguntas()
+
+    if not carregar_perguntas_recuperacao():
+        print("AVISO: Não foi possível carregar as perguntas de recuperação. Modo recuperação pode não funcionar.")
+
+    gc.collect()
+    gc.freeze()
+    bancos_inicializados = True
+
+def create_app():
+    """Fábrica da aplicação (usada pelo gunicorn: 'app:create_app()'): carrega os bancos e devolve o app.
+
+    Importar o módulo não carrega nada, então testes e ferramentas de linha
+    de comando podem importá-lo sem ler os bancos nem congelar o GC.
+    """
+    inicializar_bancos()
+    return app
 
 # Health check endpoint
 @app.route('/health')
@@ -2336,6 +3086,13 @@ def health_check():
         'service': 'quiz-app'
     }), 200
 
+@app.route('/metrics')
+def metrics():
+    """Métricas do processo no formato de texto do Prometheus"""
+    if not METRICAS_HABILITADAS:
+        return jsonify({'erro': 'Métricas desabilitadas'}), 404
+    return app.response_class(metricas.exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == "__main__":
       port = int(os.environ.get("PORT", 8080))
-      app.run(host="0.0.0.0", port=port)
+      create_app().run(host="0.0.0.0", port=port)
@@ -0,0 +1,332 @@
+"""
+Armazém de backups endereçado por conteúdo (data/backups e data/backups_principal).
+
+Antes cada backup era uma cópia completa e indentada das perguntas, então
+backups repetidos de uma disciplina que não mudou duplicavam megabytes. Aqui
+cada pergunta vira um objeto imutável em objetos/<hh>/<sha256>, gravado uma
+única vez (opcionalmente compactado com gzip ou zstd), e o arquivo do backup
+(o mesmo backup_*.json de antes, com os mesmos nomes) passa a ser um
+manifesto: os metadados e, no lugar das perguntas, os hashes delas. O custo de
+um backup novo é proporcional ao que mudou desde o anterior.
+
+O manifesto tem duas linhas: a primeira é o cabeçalho (disciplina, período,
+timestamp, total de perguntas) e a segunda os hashes. Listar os backups lê só
+a primeira linha de cada arquivo, com custo constante por backup.
+
+O manifesto mantém a estrutura de 'data' do backup original (lista de
+perguntas no banco principal, {topico: [...]} na recuperação) trocando cada
+item das listas pelo hash do objeto. Backups no formato antigo, com 'data'
+completo, continuam sendo lidos normalmente.
+
+Objetos que nenhum manifesto referencia são apagados por coletar_lixo() após
+a exclusão de backups. Um objeto reaproveitado tem a data de modificação
+renovada e a coleta ignora objetos recentes, então um backup sendo gravado
+em paralelo (outro worker) não perde objetos antes de gravar o manifesto.
+
+Converter backups antigos (cópias completas) em manifestos:
+    python armazem_backups.py data/backups data/backups_principal
+    python armazem_backups.py data/backups --compressao zstd
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+from modelo_perguntas import PerguntaCongelada
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMATO_MANIFESTO = 'manifesto'
+COMPRESSOES = ('nenhuma', 'gzip', 'zstd')
+DIRETORIO_OBJETOS = 'objetos'
+
+_MAGICO_GZIP = b'\x1f\x8b'
+_MAGICO_ZSTD = b'\x28\xb5\x2f\xfd'
+
+# Objetos modificados há menos que isso (segundos) não são coletados
+CARENCIA_COLETA = 300
+
+
+def serializar(pergunta):
+    """Bytes do objeto de uma pergunta (JSON compacto, na ordem original dos campos)"""
+    return json.dumps(pergunta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ArmazemBackups:
+    """Backups de um diretório, guardados como manifestos de objetos deduplicados"""
+
+    def __init__(self, diretorio, compressao='gzip'):
+        if compressao not in COMPRESSOES:
+            raise ValueError(f'Compressão inválida. Use: {", ".join(COMPRESSOES)}')
+        if compressao == 'zstd' and zstandard is None:
+            logger.warning("Pacote zstandard não instalado; backups serão compactados com gzip")
+            compressao = 'gzip'
+        self.diretorio = diretorio
+        self.compressao = compressao
+        self.diretorio_objetos = os.path.join(diretorio, DIRETORIO_OBJETOS)
+        self._hashes = {}
+        self._metadados_antigos = {}
+        self._lock = threading.Lock()
+
+    def caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def existe(self, nome):
+        return os.path.isfile(self.caminho(nome))
+
+    def _caminho_objeto(self, hash_objeto):
+        return os.path.join(self.diretorio_objetos, hash_objeto[:2], hash_objeto)
+
+    def _compactar(self, dados):
+        if self.compressao == 'gzip':
+            return gzip.compress(dados, compresslevel=6, mtime=0)
+        if self.compressao == 'zstd':
+            return zstandard.ZstdCompressor(level=3).compress(dados)
+        return dados
+
+    @staticmethod
+    def _descompactar(dados):
+        if dados.startswith(_MAGICO_GZIP):
+            return gzip.decompress(dados)
+        if dados.startswith(_MAGICO_ZSTD):
+            if zstandard is None:
+                raise RuntimeError('Backup compactado com zstd, mas o pacote zstandard não está instalado')
+            return zstandard.ZstdDecompressor().decompress(dados)
+        return dados
+
+    def _hash(self, pergunta):
+        """(hash, bytes ou None); registros imutáveis são serializados uma vez só"""
+        if isinstance(pergunta, PerguntaCongelada):
+            memorizado = self._hashes.get(id(pergunta))
+            if memorizado is not None and memorizado[0]() is pergunta:
+                return memorizado[1], None
+        dados = serializar(pergunta)
+        hash_objeto = hashlib.sha256(dados).hexdigest()
+        if isinstance(pergunta, PerguntaCongelada):
+            # Referência fraca: a entrada sai do cache junto com o registro
+            chave = id(pergunta)
+            ref = weakref.ref(pergunta, lambda ref, chave=chave: self._esquecer_hash(chave, ref))
+            self._hashes[chave] = (ref, hash_objeto)
+        return hash_objeto, dados
+
+    def _esquecer_hash(self, chave, ref):
+        memorizado = self._hashes.get(chave)
+        if memorizado is not None and memorizado[0] is ref:
+            self._hashes.pop(chave, None)
+
+    def _gravar_objeto(self, pergunta, novos):
+        hash_objeto, dados = self._hash(pergunta)
+        caminho = self._caminho_objeto(hash_objeto)
+        try:
+            # Já existe: só renova a data para a coleta não apagá-lo agora
+            os.utime(caminho)
+            return hash_objeto
+        except FileNotFoundError:
+            pass
+        if dados is None:
+            dados = serializar(pergunta)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp_path = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._compactar(dados))
+        os.replace(tmp_path, caminho)
+        novos.append(hash_objeto)
+        return hash_objeto
+
+    def _ler_objeto(self, hash_objeto):
+        with open(self._caminho_objeto(hash_objeto), 'rb') as f:
+            return json.loads(self._descompactar(f.read()))
+
+    def _para_manifesto(self, dados, novos):
+        if isinstance(dados, dict):
+            return {chave: self._para_manifesto(valor, novos) for chave, valor in dados.items()}
+        if isinstance(dados, (list, tuple)):
+            return [self._gravar_objeto(item, novos) for item in dados]
+        return dados
+
+    def _de_manifesto(self, objetos):
+        if isinstance(objetos, dict):
+            return {chave: self._de_manifesto(valor) for chave, valor in objetos.items()}
+        if isinstance(objetos, list):
+            return [self._ler_objeto(h) for h in objetos]
+        return objetos
+
+    def _ler_manifesto(self, nome, com_objetos=True):
+        """(cabeçalho, objetos) de um manifesto ou (backup completo, None) no formato antigo"""
+        with open(self.caminho(nome), 'r', encoding='utf-8') as f:
+            try:
+                cabecalho = json.loads(f.readline())
+            except ValueError:
+                cabecalho = None
+            if not isinstance(cabecalho, dict) or cabecalho.get('formato') != FORMATO_MANIFESTO:
+                f.seek(0)
+                return json.load(f), None
+            if 'objetos' in cabecalho:
+                # Manifesto gravado em uma linha só, antes do cabeçalho separado
+                return cabecalho, cabecalho.pop('objetos')
+            if not com_objetos:
+                return cabecalho, None
+            return cabecalho, json.loads(f.readline())
+
+    def gravar(self, nome, metadados, dados):
+        """Grava o backup `nome` com os metadados e as perguntas em `dados`.
+
+        Retorna (caminho, objetos_novos): quantos objetos precisaram ser
+        gravados (os demais já existiam de backups anteriores).
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        novos = []
+        with self._lock:
+            objetos = self._para_manifesto(dados, novos)
+        cabecalho = dict(metadados)
+        cabecalho['formato'] = FORMATO_MANIFESTO
+        caminho = self.caminho(nome)
+        tmp_path = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(cabecalho, ensure_ascii=False) + '\n')
+            f.write(json.dumps(objetos, ensure_ascii=False) + '\n')
+            # Os objetos já estão em disco: o manifesto só aparece com o conteúdo completo
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, caminho)
+        return caminho, len(novos)
+
+    def ler_metadados(self, nome):
+        """Metadados do backup (sem 'data'), lidos só do cabeçalho do manifesto.
+
+        Backups no formato antigo precisam ser lidos inteiros; o resultado
+        fica em cache enquanto o arquivo não mudar.
+        """
+        estado = os.stat(self.caminho(nome))
+        chave = (estado.st_mtime_ns, estado.st_size)
+        memorizado = self._metadados_antigos.get(nome)
+        if memorizado is not None and memorizado[0] == chave:
+            return dict(memorizado[1])
+        cabecalho, _ = self._ler_manifesto(nome, com_objetos=False)
+        if not isinstance(cabecalho, dict):
+            raise ValueError('Backup sem metadados')
+        if cabecalho.pop('formato', None) != FORMATO_MANIFESTO:
+            cabecalho.pop('data', None)
+            self._metadados_antigos[nome] = (chave, dict(cabecalho))
+        return cabecalho
+
+    def listar(self, prefixo='backup_'):
+        """Lista de (nome, metadados) dos backups do diretório cujo nome começa com `prefixo`"""
+        if not os.path.isdir(self.diretorio):
+            return []
+        backups = []
+        for nome in os.listdir(self.diretorio):
+            if not (nome.startswith(prefixo) and nome.endswith('.json')):
+                continue
+            try:
+                backups.append((nome, self.ler_metadados(nome)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Erro ao ler backup {nome}: {e}")
+        return backups
+
+    def ler(self, nome):
+        """Backup completo, no mesmo formato dos arquivos antigos (com 'data')"""
+        backup, objetos = self._ler_manifesto(nome)
+        if objetos is not None:
+            del backup['formato']
+            backup['data'] = self._de_manifesto(objetos)
+        return backup
+
+    def excluir(self, nome, coletar=True):
+        os.remove(self.caminho(nome))
+        self._metadados_antigos.pop(nome, None)
+        if coletar:
+            self.coletar_lixo()
+
+    def _hashes_referenciados(self):
+        referenciados = set()
+
+        def marcar(objetos):
+            if isinstance(objetos, dict):
+                for valor in objetos.values():
+                    marcar(valor)
+            elif isinstance(objetos, list):
+                referenciados.update(objetos)
+
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.json'):
+                continue
+            try:
+                _, objetos = self._ler_manifesto(nome)
+            except (OSError, ValueError) as e:
+                # Na dúvida não coleta nada: o manifesto ilegível pode referenciar qualquer objeto
+                raise RuntimeError(f"Manifesto {nome} ilegível: {e}")
+            marcar(objetos)
+        return referenciados
+
+    def coletar_lixo(self):
+        """Apaga objetos que nenhum manifesto referencia; retorna quantos foram apagados"""
+        if not os.path.isdir(self.diretorio_objetos):
+            return 0
+        limite = time.time() - CARENCIA_COLETA
+        with self._lock:
+            try:
+                referenciados = self._hashes_referenciados()
+            except RuntimeError as e:
+                logger.warning(f"Coleta de objetos de backup cancelada: {e}")
+                return 0
+            apagados = 0
+            for prefixo in os.listdir(self.diretorio_objetos):
+                pasta = os.path.join(self.diretorio_objetos, prefixo)
+                if not os.path.isdir(pasta):
+                    continue
+                for hash_objeto in os.listdir(pasta):
+                    if hash_objeto in referenciados:
+                        continue
+                    caminho = os.path.join(pasta, hash_objeto)
+                    try:
+                        if os.path.getmtime(caminho) > limite:
+                            continue
+                        os.remove(caminho)
+                        apagados += 1
+                    except FileNotFoundError:
+                        continue
+        return apagados
+
+
+def migrar(armazem):
+    """Converte os backups completos do diretório em manifestos; retorna (backups, objetos novos)"""
+    convertidos = novos = 0
+    for nome in sorted(os.listdir(armazem.diretorio)):
+        if not nome.endswith('.json'):
+            continue
+        backup, objetos = armazem._ler_manifesto(nome)
+        if objetos is not None or not isinstance(backup, dict) or 'data' not in backup:
+            continue
+        dados = backup.pop('data')
+        _, gravados = armazem.gravar(nome, backup, dados)
+        convertidos += 1
+        novos += gravados
+    return convertidos, novos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Converte backups completos em manifestos deduplicados.')
+    parser.add_argument('diretorios', nargs='+', help='Diretórios de backup (ex.: data/backups data/backups_principal)')
+    parser.add_argument('--compressao', choices=COMPRESSOES, default='gzip', help='Compressão dos objetos novos')
+    args = parser.parse_args()
+
+    for diretorio in args.diretorios:
+        armazem = ArmazemBackups(diretorio, args.compressao)
+        convertidos, novos = migrar(armazem)
+        print(f"{diretorio}: {convertidos} backups convertidos, {novos} objetos gravados")
+
+
+if __name__ == '__main__':
+    main()
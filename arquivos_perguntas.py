@@ -0,0 +1,114 @@
+"""
+Leitura e gravação dos arquivos de perguntas em JSON ou NDJSON.
+
+Além do JSON tradicional (lista de perguntas ou {"perguntas": [...]}), os
+bancos e os arquivos de staging podem estar em NDJSON: uma pergunta por
+linha. Em NDJSON acrescentar perguntas é O(1) (append no fim do arquivo) e o
+arquivo pode ser lido em streaming, linha a linha.
+
+O formato é detectado pela extensão (.ndjson/.jsonl) ou, nas demais, pelo
+conteúdo: um arquivo cuja primeira linha é um objeto JSON completo que não é
+{"perguntas": [...]} é NDJSON. Ao regravar um arquivo o formato é mantido.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+FORMATO_JSON = 'json'
+FORMATO_NDJSON = 'ndjson'
+EXTENSOES_NDJSON = ('.ndjson', '.jsonl')
+
+_OBJETO_PERGUNTAS = re.compile(r'\{\s*"perguntas"\s*:')
+
+
+def formato_arquivo(caminho):
+    """FORMATO_JSON ou FORMATO_NDJSON (arquivos inexistentes seguem a extensão)"""
+    if caminho.lower().endswith(EXTENSOES_NDJSON):
+        return FORMATO_NDJSON
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            linha = f.readline().strip()
+    except FileNotFoundError:
+        return FORMATO_JSON
+    if not linha.startswith('{') or _OBJETO_PERGUNTAS.match(linha):
+        return FORMATO_JSON
+    try:
+        primeira = json.loads(linha)
+    except ValueError:
+        return FORMATO_JSON
+    return FORMATO_NDJSON if isinstance(primeira, dict) else FORMATO_JSON
+
+
+def iterar_ndjson(caminho):
+    """Perguntas de um arquivo NDJSON, uma por vez"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                # Última linha incompleta (queda durante um append)
+                logger.warning(f"Linha {numero} inválida ignorada em {caminho}")
+
+
+def extrair_perguntas(dados):
+    """Lista de perguntas de um JSON já lido (lista ou {"perguntas": [...]})"""
+    if isinstance(dados, list):
+        return dados
+    if isinstance(dados, dict) and isinstance(dados.get('perguntas'), list):
+        return dados['perguntas']
+    raise ValueError('Formato não reconhecido. Use uma lista de perguntas, um objeto {"perguntas": [...]} ou NDJSON')
+
+
+def ler_perguntas(caminho):
+    """Lista de perguntas de um arquivo JSON ou NDJSON"""
+    if formato_arquivo(caminho) == FORMATO_NDJSON:
+        return list(iterar_ndjson(caminho))
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return extrair_perguntas(json.load(f))
+
+
+def linha_ndjson(pergunta):
+    return json.dumps(pergunta, ensure_ascii=False) + '\n'
+
+
+def gravar_perguntas(caminho, perguntas, formato=None):
+    """Regrava o arquivo inteiro de forma atômica, mantendo o formato atual (ou o informado).
+
+    `perguntas` também pode ser o banco de recuperação ({disciplina: {tópico:
+    [...]}}), que é sempre gravado como JSON.
+    """
+    formato = FORMATO_JSON if isinstance(perguntas, dict) else formato or formato_arquivo(caminho)
+    tmp_path = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if formato == FORMATO_NDJSON:
+            for pergunta in perguntas:
+                f.write(linha_ndjson(pergunta))
+        else:
+            json.dump(perguntas if isinstance(perguntas, dict) else list(perguntas), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, caminho)
+
+
+def acrescentar_ndjson(caminho, perguntas):
+    """Acrescenta perguntas ao fim de um arquivo NDJSON sem relê-lo; retorna quantas foram gravadas"""
+    total = 0
+    with open(caminho, 'a', encoding='utf-8') as f:
+        # Completa uma última linha sem '\n' (arquivo editado à mão)
+        if f.tell() > 0:
+            with open(caminho, 'rb') as leitura:
+                leitura.seek(-1, os.SEEK_END)
+                if leitura.read(1) != b'\n':
+                    f.write('\n')
+        for pergunta in perguntas:
+            f.write(linha_ndjson(pergunta))
+            total += 1
+        f.flush()
+        os.fsync(f.fileno())
+    return total
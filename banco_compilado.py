@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Formato compilado (binário) dos bancos de perguntas.
+
+O JSON formatado do banco principal é grande e precisa ser interpretado por
+completo a cada carga. O formato compilado (.qbank) é gerado a partir do JSON
+por uma etapa de build e lido via mmap: cada texto distinto é decodificado uma
+única vez (disciplinas, categorias e perguntas duplicadas passam a
+compartilhar o mesmo objeto) e os ids das perguntas já vêm prontos, então a
+carga é mais rápida que a do JSON.
+
+O ganho é de tempo de carga, não de memória compartilhada: o app decodifica
+todos os registros em dicts Python na carga (o índice por período e o
+registro de ids percorrem todas as perguntas) e fecha o mmap em seguida. O
+compartilhamento das perguntas entre os workers vem da carga antes do fork
+(preload do gunicorn, ver gunicorn.conf.py).
+
+Layout (little-endian):
+    cabeçalho         struct CABECALHO
+    offsets           (n_textos + 1) x u32, posições dos textos no bloco
+    bloco de textos   UTF-8 concatenado (alinhado a 4 bytes)
+    opções            n_opcoes x u32, referências a textos
+    registros         n_registros x struct REGISTRO (largura fixa)
+
+O cabeçalho guarda o mtime/tamanho do JSON de origem; o app só usa o arquivo
+compilado enquanto o JSON não tiver sido alterado depois da compilação.
+
+Uso:
+    python banco_compilado.py data/perguntas.json
+    python banco_compilado.py --recuperacao data/perguntas_recuperacao.json
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from arquivos_perguntas import ler_perguntas
+
+MAGICO = b'QBNK'
+VERSAO = 1
+EXTENSAO = '.qbank'
+
+TIPO_LISTA = 0
+TIPO_RECUPERACAO = 1
+
+# magico, versao, tipo, mtime_ns da origem, tamanho da origem, n_textos, n_opcoes, n_registros
+CABECALHO = struct.Struct('<4sHHqqIII')
+
+# Campos de texto com coluna própria no registro; os demais vão para 'extras' (JSON)
+CAMPOS_TEXTO = (
+    'id', 'pergunta', 'resposta_correta', 'categoria', 'disciplina', 'topico',
+    'dificuldade', 'explicacao', 'referencia', 'fonte_material',
+)
+# campos de texto, grupo_disciplina, grupo_topico, extras, opcoes_inicio, opcoes_qtd, periodo, flags
+REGISTRO = struct.Struct('<' + 'I' * len(CAMPOS_TEXTO) + 'IIIIHhH')
+
+AUSENTE = 0xFFFFFFFF
+FLAG_PERIODO = 1
+
+
+def caminho_compilado(caminho_json):
+    """Caminho do arquivo compilado correspondente a um JSON"""
+    return caminho_json + EXTENSAO
+
+
+class _TabelaTextos:
+    def __init__(self):
+        self.indices = {}
+        self.textos = []
+
+    def ref(self, texto):
+        if texto is None:
+            return AUSENTE
+        indice = self.indices.get(texto)
+        if indice is None:
+            indice = len(self.textos)
+            self.indices[texto] = indice
+            self.textos.append(texto)
+        return indice
+
+
+def _registros_recuperacao(dados):
+    for disciplina, topicos in dados.items():
+        for topico, perguntas in topicos.items():
+            for pergunta in perguntas:
+                yield pergunta, disciplina, topico
+
+
+def compilar(origem, destino=None, recuperacao=False, ids=None):
+    """Compila um banco JSON para o formato binário e retorna o caminho gerado.
+
+    ids: função opcional lista_de_perguntas -> lista_de_ids, usada para gravar
+    os ids já atribuídos (o app usa o mesmo algoritmo do carregamento).
+    """
+    destino = destino or caminho_compilado(origem)
+    estado_origem = os.stat(origem)
+    if recuperacao:
+        with open(origem, 'r', encoding='utf-8') as f:
+            itens = list(_registros_recuperacao(json.load(f)))
+    else:
+        itens = [(pergunta, None, None) for pergunta in ler_perguntas(origem)]
+
+    lista_ids = ids([p for p, _, _ in itens]) if ids else [p.get('id') for p, _, _ in itens]
+
+    textos = _TabelaTextos()
+    opcoes_refs = []
+    registros = []
+    for (pergunta, grupo_disciplina, grupo_topico), id_pergunta in zip(itens, lista_ids):
+        extras = {}
+        refs = []
+        for campo in CAMPOS_TEXTO:
+            valor = id_pergunta if campo == 'id' else pergunta.get(campo)
+            if campo in pergunta or (campo == 'id' and valor is not None):
+                if isinstance(valor, str):
+                    refs.append(textos.ref(valor))
+                    continue
+                if campo != 'id':
+                    extras[campo] = valor
+            refs.append(AUSENTE)
+
+        periodo = pergunta.get('periodo')
+        flags = 0
+        if isinstance(periodo, int) and not isinstance(periodo, bool) and -32768 <= periodo <= 32767:
+            flags |= FLAG_PERIODO
+        else:
+            if 'periodo' in pergunta:
+                extras['periodo'] = periodo
+            periodo = 0
+
+        opcoes = pergunta.get('opcoes')
+        opcoes_inicio = len(opcoes_refs)
+        if isinstance(opcoes, list) and all(isinstance(o, str) for o in opcoes) and len(opcoes) < 0xFFFF:
+            opcoes_refs.extend(textos.ref(o) for o in opcoes)
+            opcoes_qtd = len(opcoes)
+        else:
+            if 'opcoes' in pergunta:
+                extras['opcoes'] = opcoes
+            opcoes_qtd = 0xFFFF
+
+        for campo, valor in pergunta.items():
+            if campo not in CAMPOS_TEXTO and campo not in ('periodo', 'opcoes'):
+                extras[campo] = valor
+        extras_ref = textos.ref(json.dumps(extras, ensure_ascii=False)) if extras else AUSENTE
+
+        registros.append(REGISTRO.pack(
+            *refs, textos.ref(grupo_disciplina), textos.ref(grupo_topico), extras_ref,
+            opcoes_inicio, opcoes_qtd, periodo, flags
+        ))
+
+    blocos = [t.encode('utf-8') for t in textos.textos]
+    offsets = [0]
+    for bloco in blocos:
+        offsets.append(offsets[-1] + len(bloco))
+    bloco_textos = b''.join(blocos)
+    bloco_textos += b'\0' * (-len(bloco_textos) % 4)
+
+    tmp_path = f"{destino}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(CABECALHO.pack(
+            MAGICO, VERSAO, TIPO_RECUPERACAO if recuperacao else TIPO_LISTA,
+            estado_origem.st_mtime_ns, estado_origem.st_size,
+            len(textos.textos), len(opcoes_refs), len(registros)
+        ))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(bloco_textos)
+        f.write(struct.pack(f'<{len(opcoes_refs)}I', *opcoes_refs))
+        f.write(b''.join(registros))
+    os.replace(tmp_path, destino)
+    return destino
+
+
+class BancoCompilado:
+    """Leitura de um arquivo .qbank via mmap.
+
+    Os registros são decodificados sob demanda (banco[i]) e cada texto é
+    decodificado uma única vez, sendo compartilhado entre os registros. Os
+    dicts devolvidos são cópias independentes do arquivo (o mmap pode ser
+    fechado depois de lidos).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magico, versao, self.tipo, self.origem_mtime_ns, self.origem_tamanho,
+         n_textos, n_opcoes, self.n_registros) = CABECALHO.unpack_from(self._mmap, 0)
+        if magico != MAGICO or versao != VERSAO:
+            self._mmap.close()
+            raise ValueError(f'{caminho} não é um banco compilado compatível')
+        pos = CABECALHO.size
+        self._offsets = memoryview(self._mmap)[pos:pos + (n_textos + 1) * 4].cast('I')
+        pos += (n_textos + 1) * 4
+        self._inicio_textos = pos
+        pos += self._offsets[n_textos] + (-self._offsets[n_textos] % 4)
+        self._opcoes = memoryview(self._mmap)[pos:pos + n_opcoes * 4].cast('I')
+        pos += n_opcoes * 4
+        self._inicio_registros = pos
+        self._textos = [None] * n_textos
+
+    def atualizado_para(self, caminho_json):
+        """True se o JSON de origem não mudou desde a compilação"""
+        try:
+            estado = os.stat(caminho_json)
+        except FileNotFoundError:
+            return True
+        return estado.st_mtime_ns == self.origem_mtime_ns and estado.st_size == self.origem_tamanho
+
+    def _texto(self, ref):
+        if ref == AUSENTE:
+            return None
+        texto = self._textos[ref]
+        if texto is None:
+            inicio = self._inicio_textos + self._offsets[ref]
+            fim = self._inicio_textos + self._offsets[ref + 1]
+            texto = self._mmap[inicio:fim].decode('utf-8')
+            self._textos[ref] = texto
+        return texto
+
+    def __len__(self):
+        return self.n_registros
+
+    def registro(self, indice):
+        """Retorna (pergunta, grupo_disciplina, grupo_topico) do registro"""
+        if not 0 <= indice < self.n_registros:
+            raise IndexError(indice)
+        valores = REGISTRO.unpack_from(self._mmap, self._inicio_registros + indice * REGISTRO.size)
+        n = len(CAMPOS_TEXTO)
+        pergunta = {}
+        for campo, ref in zip(CAMPOS_TEXTO, valores[:n]):
+            if ref != AUSENTE:
+                pergunta[campo] = self._texto(ref)
+        grupo_disciplina, grupo_topico, extras_ref, opcoes_inicio, opcoes_qtd, periodo, flags = valores[n:]
+        if opcoes_qtd != 0xFFFF:
+            pergunta['opcoes'] = [self._texto(r) for r in self._opcoes[opcoes_inicio:opcoes_inicio + opcoes_qtd]]
+        if flags & FLAG_PERIODO:
+            pergunta['periodo'] = periodo
+        if extras_ref != AUSENTE:
+            pergunta.update(json.loads(self._texto(extras_ref)))
+        return pergunta, self._texto(grupo_disciplina), self._texto(grupo_topico)
+
+    def __getitem__(self, indice):
+        return self.registro(indice)[0]
+
+    def __iter__(self):
+        for indice in range(self.n_registros):
+            yield self[indice]
+
+    def como_recuperacao(self):
+        """Reconstrói o formato {disciplina: {topico: [perguntas]}}"""
+        dados = {}
+        for indice in range(self.n_registros):
+            pergunta, disciplina, topico = self.registro(indice)
+            dados.setdefault(disciplina, {}).setdefault(topico, []).append(pergunta)
+        return dados
+
+    def fechar(self):
+        self._offsets.release()
+        self._opcoes.release()
+        self._mmap.close()
+
+
+def abrir_se_atualizado(caminho_json):
+    """Abre o .qbank de um JSON se existir e estiver em dia; senão retorna None"""
+    caminho = caminho_compilado(caminho_json)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        banco = BancoCompilado(caminho)
+    except (OSError, ValueError, struct.error):
+        return None
+    if not banco.atualizado_para(caminho_json):
+        banco.fechar()
+        return None
+    return banco
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compila bancos de perguntas JSON para o formato binário (.qbank) lido via mmap pelo app.'
+    )
+    parser.add_argument('arquivos', nargs='+', help='Arquivos JSON a compilar')
+    parser.add_argument(
+        '--recuperacao',
+        action='store_true',
+        help='Os arquivos estão no formato do banco de recuperação ({disciplina: {topico: [...]}})'
+    )
+    args = parser.parse_args()
+
+    from modelo_perguntas import RegistroPerguntas
+
+    def atribuir_ids(perguntas):
+        return [p['id'] for p in RegistroPerguntas().congelar_lista(perguntas, 'p')]
+
+    for arquivo in args.arquivos:
+        # Os ids do banco de recuperação são únicos entre todos os arquivos
+        # carregados, então só podem ser atribuídos pelo app na carga
+        destino = compilar(arquivo, recuperacao=args.recuperacao, ids=None if args.recuperacao else atribuir_ids)
+        print(f"Compilado: {arquivo} -> {destino} ({os.path.getsize(destino)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
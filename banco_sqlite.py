@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Backend SQLite (opcional) dos bancos de perguntas.
+
+Com BANCO_PERGUNTAS_BACKEND=sqlite o app lê e grava os dois bancos em um
+único arquivo SQLite em modo WAL, em vez dos arquivos JSON de data/. Cada
+pergunta é uma linha da tabela 'perguntas' (registro completo em JSON na
+coluna 'dados') com colunas indexadas para os filtros usados pelo app:
+período, disciplina, tópico, fonte do material e dificuldade. Edições
+individuais do painel admin alteram uma única linha, com transações que
+valem entre workers.
+
+A ordem original dos bancos é mantida pela coluna 'posicao'. No banco de
+recuperação, grupo_disciplina/grupo_topico guardam o agrupamento do JSON
+({disciplina: {topico: [...]}}).
+
+Importação a partir dos JSON atuais:
+    python banco_sqlite.py importar
+    python banco_sqlite.py importar --db data/perguntas.sqlite3 --principal data/perguntas.json \\
+        --recuperacao data/perguntas_recuperacao.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+from arquivos_perguntas import ler_perguntas
+from diario_edicoes import DiarioEdicoes, aplicar_operacoes_lista, aplicar_operacoes_recuperacao
+from modelo_perguntas import RegistroPerguntas
+
+BANCO_PRINCIPAL = 'principal'
+BANCO_RECUPERACAO = 'recuperacao'
+PREFIXOS = {BANCO_PRINCIPAL: 'p', BANCO_RECUPERACAO: 'r'}
+
+# Filtros aceitos por listar() -> coluna indexada
+COLUNAS_FILTRO = ('periodo', 'disciplina', 'topico', 'fonte_material', 'dificuldade')
+
+
+def _periodo_coluna(periodo):
+    try:
+        return int(periodo)
+    except (TypeError, ValueError):
+        return None
+
+
+def _linha(banco, posicao, pergunta, grupo_disciplina=None, grupo_topico=None):
+    return (
+        pergunta.get('id'),
+        banco,
+        posicao,
+        _periodo_coluna(pergunta.get('periodo')),
+        pergunta.get('disciplina'),
+        pergunta.get('topico'),
+        pergunta.get('fonte_material'),
+        pergunta.get('dificuldade'),
+        grupo_disciplina,
+        grupo_topico,
+        json.dumps(dict(pergunta), ensure_ascii=False),
+    )
+
+
+_INSERIR = (
+    'INSERT INTO perguntas (id, banco, posicao, periodo, disciplina, topico, fonte_material,'
+    ' dificuldade, grupo_disciplina, grupo_topico, dados) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+
+class BancoSQLite:
+    """Bancos de perguntas em um arquivo SQLite (WAL)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conexao()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS perguntas ('
+            ' id TEXT PRIMARY KEY,'
+            ' banco TEXT NOT NULL,'
+            ' posicao INTEGER NOT NULL,'
+            ' periodo INTEGER,'
+            ' disciplina TEXT,'
+            ' topico TEXT,'
+            ' fonte_material TEXT,'
+            ' dificuldade TEXT,'
+            ' grupo_disciplina TEXT,'
+            ' grupo_topico TEXT,'
+            ' dados TEXT NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_posicao ON perguntas (banco, posicao)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_periodo_disciplina ON perguntas (banco, periodo, disciplina)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_disciplina ON perguntas (banco, disciplina)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_topico ON perguntas (banco, topico)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_fonte ON perguntas (banco, fonte_material)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_dificuldade ON perguntas (banco, dificuldade)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_perguntas_grupo ON perguntas (banco, grupo_disciplina, grupo_topico)')
+        conn.commit()
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (não reutilizar após fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def arquivos(self):
+        """Arquivos do banco (observados para recarga automática)"""
+        return [self.caminho, self.caminho + '-wal']
+
+    def vazio(self, banco):
+        conn = self._conexao()
+        return conn.execute('SELECT 1 FROM perguntas WHERE banco = ? LIMIT 1', (banco,)).fetchone() is None
+
+    def iterar(self, banco=BANCO_PRINCIPAL):
+        """Perguntas do banco, na ordem original, lidas sob demanda"""
+        conn = self._conexao()
+        for (dados,) in conn.execute('SELECT dados FROM perguntas WHERE banco = ? ORDER BY posicao', (banco,)):
+            yield json.loads(dados)
+
+    def carregar_lista(self, banco=BANCO_PRINCIPAL):
+        """Perguntas do banco, na ordem original"""
+        return list(self.iterar(banco))
+
+    def carregar_recuperacao(self):
+        """Banco de recuperação no formato {disciplina: {topico: [perguntas]}}"""
+        conn = self._conexao()
+        linhas = conn.execute(
+            'SELECT grupo_disciplina, grupo_topico, dados FROM perguntas WHERE banco = ? ORDER BY posicao',
+            (BANCO_RECUPERACAO,)
+        )
+        dados_banco = {}
+        for disciplina, topico, dados in linhas:
+            dados_banco.setdefault(disciplina, {}).setdefault(topico, []).append(json.loads(dados))
+        return dados_banco
+
+    def _substituir(self, banco, linhas, somente_se_vazio=False):
+        conn = self._conexao()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if somente_se_vazio and conn.execute(
+                'SELECT 1 FROM perguntas WHERE banco = ? LIMIT 1', (banco,)
+            ).fetchone() is not None:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('DELETE FROM perguntas WHERE banco = ?', (banco,))
+            conn.executemany(_INSERIR, linhas)
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def salvar_principal(self, perguntas, somente_se_vazio=False):
+        """Substitui todo o banco principal (uma transação)"""
+        linhas = (_linha(BANCO_PRINCIPAL, i, p) for i, p in enumerate(perguntas))
+        return self._substituir(BANCO_PRINCIPAL, linhas, somente_se_vazio)
+
+    def salvar_recuperacao(self, dados_banco, somente_se_vazio=False):
+        """Substitui todo o banco de recuperação (uma transação)"""
+        def linhas():
+            posicao = 0
+            for disciplina, topicos in dados_banco.items():
+                for topico, perguntas in topicos.items():
+                    for pergunta in perguntas:
+                        yield _linha(BANCO_RECUPERACAO, posicao, pergunta, disciplina, topico)
+                        posicao += 1
+        return self._substituir(BANCO_RECUPERACAO, linhas(), somente_se_vazio)
+
+    def aplicar_operacao(self, banco, op, pergunta=None, id_pergunta=None):
+        """Aplica uma edição individual (mesmas operações do diário de edições)"""
+        id_pergunta = id_pergunta or (pergunta or {}).get('id')
+        conn = self._conexao()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            atual = conn.execute(
+                'SELECT posicao, grupo_disciplina, grupo_topico FROM perguntas WHERE id = ? AND banco = ?',
+                (id_pergunta, banco)
+            ).fetchone()
+            if op == 'remover':
+                conn.execute('DELETE FROM perguntas WHERE id = ? AND banco = ?', (id_pergunta, banco))
+            elif op in ('adicionar', 'substituir'):
+                if atual is not None:
+                    posicao, grupo_disciplina, grupo_topico = atual
+                    conn.execute('DELETE FROM perguntas WHERE id = ? AND banco = ?', (id_pergunta, banco))
+                    conn.execute(_INSERIR, _linha(banco, posicao, pergunta, grupo_disciplina, grupo_topico))
+                elif op == 'adicionar':
+                    (posicao,) = conn.execute(
+                        'SELECT COALESCE(MAX(posicao), -1) + 1 FROM perguntas WHERE banco = ?', (banco,)
+                    ).fetchone()
+                    grupos = (pergunta.get('disciplina'), pergunta.get('topico')) if banco == BANCO_RECUPERACAO else (None, None)
+                    conn.execute(_INSERIR, _linha(banco, posicao, pergunta, *grupos))
+            else:
+                raise ValueError(f'Operação desconhecida: {op}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acrescentar(self, banco, perguntas):
+        """Acrescenta perguntas novas ao final do banco, atribuindo ids únicos"""
+        conn = self._conexao()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            usados = {i for (i,) in conn.execute('SELECT id FROM perguntas')}
+            (posicao,) = conn.execute(
+                'SELECT COALESCE(MAX(posicao), -1) + 1 FROM perguntas WHERE banco = ?', (banco,)
+            ).fetchone()
+            registro = RegistroPerguntas()
+            linhas = []
+            for pergunta in perguntas:
+                pergunta = registro.congelar(pergunta, PREFIXOS[banco], usados)
+                grupos = (pergunta.get('disciplina'), pergunta.get('topico')) if banco == BANCO_RECUPERACAO else (None, None)
+                linhas.append(_linha(banco, posicao, pergunta, *grupos))
+                posicao += 1
+            conn.executemany(_INSERIR, linhas)
+            conn.execute('COMMIT')
+            return len(linhas)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def listar(self, banco, filtros=None, limite=None, deslocamento=0):
+        """Filtra pelas colunas indexadas; retorna (perguntas, total)"""
+        condicoes = ['banco = ?']
+        parametros = [banco]
+        for coluna, valor in (filtros or {}).items():
+            if coluna not in COLUNAS_FILTRO:
+                raise ValueError(f'Filtro não suportado: {coluna}')
+            if valor in (None, ''):
+                continue
+            condicoes.append(f'{coluna} = ?')
+            parametros.append(_periodo_coluna(valor) if coluna == 'periodo' else valor)
+        where = ' AND '.join(condicoes)
+        conn = self._conexao()
+        (total,) = conn.execute(f'SELECT COUNT(*) FROM perguntas WHERE {where}', parametros).fetchone()
+        sql = f'SELECT dados FROM perguntas WHERE {where} ORDER BY posicao'
+        if limite is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            parametros = parametros + [int(limite), int(deslocamento)]
+        perguntas = [json.loads(dados) for (dados,) in conn.execute(sql, parametros)]
+        return perguntas, total
+
+    def copiar_para(self, destino):
+        """Cópia consistente do banco (API de backup do SQLite)"""
+        destino_conn = sqlite3.connect(destino)
+        try:
+            self._conexao().backup(destino_conn)
+        finally:
+            destino_conn.close()
+        return destino
+
+
+def ler_principal_json(caminho):
+    """Lê o banco principal em JSON ou NDJSON (com o diário de edições pendente) atribuindo os ids do app"""
+    perguntas = RegistroPerguntas().congelar_lista(ler_perguntas(caminho), PREFIXOS[BANCO_PRINCIPAL])
+    operacoes = DiarioEdicoes(caminho).operacoes()
+    if operacoes:
+        perguntas = aplicar_operacoes_lista(perguntas, operacoes)
+    return perguntas
+
+
+def ler_recuperacao_json(arquivos, caminho_diario=None):
+    """Lê e mescla os arquivos do banco de recuperação atribuindo os ids do app"""
+    registro = RegistroPerguntas()
+    ids_usados = set()
+    dados_banco = {}
+    for arquivo in arquivos:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for disciplina, topicos in data.items():
+            for topico, perguntas in topicos.items():
+                lista = dados_banco.setdefault(disciplina, {}).setdefault(topico, [])
+                for pergunta in perguntas:
+                    lista.append(registro.congelar(pergunta, PREFIXOS[BANCO_RECUPERACAO], ids_usados))
+    if caminho_diario:
+        operacoes = DiarioEdicoes(caminho_diario).operacoes()
+        if operacoes:
+            aplicar_operacoes_recuperacao(dados_banco, operacoes)
+    return dados_banco
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backend SQLite dos bancos de perguntas.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    importar = subparsers.add_parser('importar', help='Importa os bancos JSON atuais para o SQLite (substitui o conteúdo)')
+    importar.add_argument(
+        '--db',
+        default=os.environ.get('BANCO_SQLITE_PATH', os.path.join('data', 'perguntas.sqlite3')),
+        help='Arquivo SQLite de destino (padrão: BANCO_SQLITE_PATH ou data/perguntas.sqlite3)'
+    )
+    importar.add_argument(
+        '--principal',
+        default=os.environ.get('PERGUNTAS_JSON_PATH', os.path.join('data', 'perguntas.json')),
+        help='Banco principal em JSON (padrão: PERGUNTAS_JSON_PATH ou data/perguntas.json)'
+    )
+    importar.add_argument(
+        '--recuperacao',
+        nargs='*',
+        default=None,
+        help='Arquivos do banco de recuperação (padrão: data/perguntas_recuperacao*.json e data/RECUP_*.json)'
+    )
+    args = parser.parse_args()
+
+    if args.comando == 'importar':
+        banco = BancoSQLite(args.db)
+        if os.path.exists(args.principal):
+            perguntas = ler_principal_json(args.principal)
+            banco.salvar_principal(perguntas)
+            print(f"Banco principal: {len(perguntas)} perguntas importadas de {args.principal}")
+        else:
+            print(f"Aviso: banco principal não encontrado: {args.principal}")
+
+        arquivos = args.recuperacao
+        if arquivos is None:
+            arquivos = glob.glob(os.path.join('data', 'perguntas_recuperacao*.json')) + glob.glob(os.path.join('data', 'RECUP_*.json'))
+        diario = os.path.join('data', 'perguntas_recuperacao.json') if args.recuperacao is None else None
+        dados_banco = ler_recuperacao_json(arquivos, diario)
+        banco.salvar_recuperacao(dados_banco)
+        total = sum(len(p) for topicos in dados_banco.values() for p in topicos.values())
+        print(f"Banco de recuperação: {total} perguntas importadas de {len(arquivos)} arquivos")
+        print(f"SQLite: {args.db}")
+
+
+if __name__ == '__main__':
+    main()
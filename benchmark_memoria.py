@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Mede a memória por worker do gunicorn com os bancos de perguntas carregados.
+
+Sobe o app com gunicorn.conf.py para cada quantidade de workers, espera o
+/health responder e lê /proc/<pid>/smaps_rollup de cada worker (somente Linux):
+    RSS      memória residente (conta páginas compartilhadas em cada worker)
+    PSS      RSS com as páginas compartilhadas divididas entre os processos
+    Privada  páginas exclusivas do worker (o que cada worker a mais custa)
+
+Uso:
+    python benchmark_memoria.py                  # 1, 4 e 8 workers
+    python benchmark_memoria.py --workers 1 4 --sem-preload
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def ler_memoria(pid: int) -> dict:
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for linha in f:
+            partes = linha.split()
+            if len(partes) >= 3 and partes[-1] == 'kB':
+                valores[partes[0].rstrip(':')] = int(partes[1])
+    return {
+        'rss': valores.get('Rss', 0),
+        'pss': valores.get('Pss', 0),
+        'privada': valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0),
+    }
+
+
+def filhos(pid: int) -> list:
+    pids = []
+    for tarefa in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{tarefa}/children', 'r') as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def esperar_workers(processo, porta: int, workers: int, limite: float = 120.0) -> list:
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < limite:
+        if processo.poll() is not None:
+            raise RuntimeError('gunicorn terminou antes de ficar pronto')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{porta}/health', timeout=2).read()
+            pids = filhos(processo.pid)
+            if len(pids) >= workers:
+                # Algumas requisições para que todos os workers atendam ao menos uma
+                for _ in range(workers * 4):
+                    urllib.request.urlopen(f'http://127.0.0.1:{porta}/', timeout=5).read()
+                return pids
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('tempo esgotado esperando o gunicorn')
+
+
+def medir(workers: int, preload: bool) -> dict:
+    porta = porta_livre()
+    env = dict(
+        os.environ,
+        PORT=str(porta),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD='true' if preload else 'false',
+    )
+    inicio = time.monotonic()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        pids = esperar_workers(processo, porta, workers)
+        pronto_em = time.monotonic() - inicio
+        mestre = ler_memoria(processo.pid)
+        medidas = [ler_memoria(pid) for pid in pids]
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        processo.wait(timeout=30)
+
+    def media(chave):
+        return sum(m[chave] for m in medidas) / len(medidas) / 1024
+
+    return {
+        'workers': workers,
+        'pronto_em': pronto_em,
+        'rss': media('rss'),
+        'pss': media('pss'),
+        'privada': media('privada'),
+        'total_pss': (mestre['pss'] + sum(m['pss'] for m in medidas)) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Mede a memória por worker do gunicorn (RSS/PSS/privada).')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help='Quantidades de workers a medir')
+    parser.add_argument('--sem-preload', action='store_true', help='Mede também sem preload_app, para comparação')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    modos = [True, False] if args.sem_preload else [True]
+
+    print(f"{'modo':<12}{'workers':>8}{'pronto (s)':>12}{'RSS/worker':>12}{'PSS/worker':>12}{'privada/worker':>16}{'PSS total':>11}")
+    for preload in modos:
+        for workers in args.workers:
+            r = medir(workers, preload)
+            print(
+                f"{'preload' if preload else 'sem preload':<12}{r['workers']:>8}{r['pronto_em']:>12.1f}"
+                f"{r['rss']:>9.1f} MB{r['pss']:>9.1f} MB{r['privada']:>13.1f} MB{r['total_pss']:>8.1f} MB"
+            )
+
+
+if __name__ == '__main__':
+    main()
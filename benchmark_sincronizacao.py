@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Mede a leitura de staging em paralelo do sincronizar_perguntas.py (--jobs).
+
+Gera em um diretório temporário uma árvore sintética periodo_<n>/<Disciplina>.json
+com perguntas aleatórias e roda a sincronização em modo --dry-run para cada
+quantidade de processos, com inferência de período e disciplina, comparando o
+tempo total com o da execução sequencial (--jobs 1).
+
+Uso:
+    python benchmark_sincronizacao.py                       # 3000 arquivos, jobs 1 2 4 8
+    python benchmark_sincronizacao.py --arquivos 5000 --perguntas 30 --jobs 1 4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+PALAVRAS = (
+    'célula membrana proteína enzima tecido órgão sistema nervoso circulatório respiratório '
+    'digestivo hormônio receptor anticorpo antígeno bactéria vírus fungo metabolismo energia '
+    'glicose lipídio ácido nucleico gene cromossomo mitose meiose saúde paciente diagnóstico '
+    'tratamento prevenção atenção básica política pública direito cidadania ética pesquisa'
+).split()
+
+
+def gerar_pergunta(gerador: random.Random) -> dict:
+    opcoes = [' '.join(gerador.choices(PALAVRAS, k=5)).capitalize() + '.' for _ in range(4)]
+    return {
+        'pergunta': ' '.join(gerador.choices(PALAVRAS, k=14)).capitalize() + '?',
+        'opcoes': opcoes,
+        'resposta_correta': opcoes[0],
+        'categoria': 'Sintética',
+        'dificuldade': gerador.choice(['facil', 'medio', 'dificil']),
+        'explicacao': ' '.join(gerador.choices(PALAVRAS, k=20)).capitalize() + '.',
+    }
+
+
+def gerar_arvore(raiz: str, arquivos: int, perguntas: int, periodos: int = 8) -> int:
+    gerador = random.Random(42)
+    total = 0
+    for i in range(arquivos):
+        diretorio = os.path.join(raiz, f'periodo_{i % periodos + 1}')
+        os.makedirs(diretorio, exist_ok=True)
+        dados = [gerar_pergunta(gerador) for _ in range(perguntas)]
+        with open(os.path.join(diretorio, f'Disciplina_{i:05d}.json'), 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        total += perguntas
+    return total
+
+
+def medir(diretorio: str, staging: str, banco: str, jobs: int) -> float:
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sincronizar_perguntas.py')
+    inicio = time.monotonic()
+    subprocess.run(
+        [
+            sys.executable, script,
+            '--staging', os.path.join(diretorio, 'inexistente.json'),
+            '--staging-dir', staging,
+            '--main', banco,
+            '--infer-period-from-dir',
+            '--infer-discipline-from-filename',
+            '--dry-run',
+            '--jobs', str(jobs),
+        ],
+        cwd=diretorio,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.monotonic() - inicio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark do sincronizar_perguntas.py com --jobs.')
+    parser.add_argument('--arquivos', type=int, default=3000, help='Arquivos de staging gerados')
+    parser.add_argument('--perguntas', type=int, default=20, help='Perguntas por arquivo')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8], help='Quantidades de processos a medir')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_sync_') as diretorio:
+        staging = os.path.join(diretorio, 'staging')
+        total = gerar_arvore(staging, args.arquivos, args.perguntas)
+        banco = os.path.join(diretorio, 'perguntas.json')
+        with open(banco, 'w', encoding='utf-8') as f:
+            json.dump([], f)
+
+        print(f"{args.arquivos} arquivos, {total} perguntas (CPUs: {os.cpu_count()})")
+        print(f"{'jobs':>6}{'tempo (s)':>12}{'speedup':>10}")
+        base = None
+        for jobs in args.jobs:
+            tempo = medir(diretorio, staging, banco, jobs)
+            base = base or tempo
+            print(f"{jobs:>6}{tempo:>12.2f}{base / tempo:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Índice invertido para a busca de perguntas no painel admin.
+
+Indexa os campos pergunta, opcoes, explicacao e referencia dos dois bancos.
+Os textos são normalizados sem acentos e em minúsculas, as palavras vazias
+do português são descartadas e os plurais mais comuns são reduzidos ao
+singular ("ações" e "ação" viram o mesmo termo). O índice é montado na carga
+dos bancos e atualizado a cada inclusão/edição/exclusão do painel admin.
+
+A pontuação é um TF-IDF simples com pesos por campo; todas as palavras da
+busca precisam aparecer na pergunta, e a última também casa por prefixo
+(busca enquanto se digita).
+"""
+
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+# Peso de cada campo na pontuação
+PESOS_CAMPOS = {
+    'pergunta': 3.0,
+    'opcoes': 1.0,
+    'explicacao': 1.0,
+    'referencia': 0.5,
+}
+
+# Máximo de termos considerados na expansão por prefixo da última palavra
+MAX_EXPANSAO_PREFIXO = 50
+
+PALAVRAS_VAZIAS = frozenset('''
+a ao aos as com como da das de do dos e ela ele em entre era essa esse esta este eu foi ha isso
+isto ja lhe mais mas me na nas nem no nos o os ou para pela pelas pelo pelos por qual quais que
+quando se sem ser seu sua sao tambem te tem um uma umas uns nao sim sobre sua suas seus
+'''.split())
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def remover_acentos(texto):
+    """Remove acentos e cedilha ('coração' -> 'coracao')"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def reduzir_plural(termo):
+    """Redução simples de plurais do português (sem acentos)"""
+    if len(termo) <= 3 or not termo.endswith('s'):
+        return termo
+    if termo.endswith('oes') or termo.endswith('aes'):
+        return termo[:-3] + 'ao'
+    if termo.endswith('ais'):
+        return termo[:-3] + 'al'
+    if termo.endswith('eis') and len(termo) > 4:
+        return termo[:-3] + 'el'
+    if termo.endswith('ns'):
+        return termo[:-2] + 'm'
+    if termo.endswith(('res', 'zes', 'ses')) and len(termo) > 4:
+        return termo[:-2]
+    return termo[:-1]
+
+
+def tokenizar(texto):
+    """Termos normalizados de um texto, sem palavras vazias"""
+    termos = []
+    for token in _TOKEN.findall(remover_acentos(str(texto or '')).lower()):
+        if token in PALAVRAS_VAZIAS or (len(token) < 2 and not token.isdigit()):
+            continue
+        termos.append(reduzir_plural(token))
+    return termos
+
+
+def _campos_texto(pergunta):
+    for campo, peso in PESOS_CAMPOS.items():
+        valor = pergunta.get(campo)
+        if not valor:
+            continue
+        if isinstance(valor, (list, tuple)):
+            valor = ' '.join(str(v) for v in valor)
+        yield valor, peso
+
+
+class IndiceBusca:
+    """Índice invertido termo -> {id da pergunta: peso}"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._termos_ordenados = None
+        self._documentos = {}   # id -> (banco, pergunta, termos)
+        self._por_banco = defaultdict(set)
+
+    def _adicionar(self, banco, pergunta):
+        id_pergunta = pergunta.get('id')
+        if not id_pergunta:
+            return
+        if id_pergunta in self._documentos:
+            self._remover(id_pergunta)
+        pesos = defaultdict(float)
+        for texto, peso in _campos_texto(pergunta):
+            for termo in tokenizar(texto):
+                pesos[termo] += peso
+        for termo, peso in pesos.items():
+            if termo not in self._postings:
+                self._termos_ordenados = None
+            self._postings[termo][id_pergunta] = peso
+        self._documentos[id_pergunta] = (banco, pergunta, tuple(pesos))
+        self._por_banco[banco].add(id_pergunta)
+
+    def _remover(self, id_pergunta):
+        documento = self._documentos.pop(id_pergunta, None)
+        if documento is None:
+            return
+        banco, _, termos = documento
+        self._por_banco[banco].discard(id_pergunta)
+        for termo in termos:
+            postings = self._postings.get(termo)
+            if postings is None:
+                continue
+            postings.pop(id_pergunta, None)
+            if not postings:
+                del self._postings[termo]
+                self._termos_ordenados = None
+
+    def reconstruir(self, banco, perguntas):
+        """Reindexa todas as perguntas de um banco ('principal' ou 'recuperacao')"""
+        with self._lock:
+            for id_pergunta in list(self._por_banco[banco]):
+                self._remover(id_pergunta)
+            for pergunta in perguntas:
+                self._adicionar(banco, pergunta)
+
+    def adicionar(self, banco, pergunta):
+        """Indexa uma pergunta (substitui a versão anterior com o mesmo id)"""
+        with self._lock:
+            self._adicionar(banco, pergunta)
+
+    def remover(self, id_pergunta):
+        with self._lock:
+            self._remover(id_pergunta)
+
+    def remover_varios(self, perguntas):
+        with self._lock:
+            for pergunta in perguntas:
+                self._remover(pergunta.get('id'))
+
+    def _expandir_prefixo(self, prefixo):
+        if self._termos_ordenados is None:
+            self._termos_ordenados = sorted(self._postings)
+        termos = self._termos_ordenados
+        inicio = bisect.bisect_left(termos, prefixo)
+        expandidos = []
+        for termo in termos[inicio:inicio + MAX_EXPANSAO_PREFIXO]:
+            if not termo.startswith(prefixo):
+                break
+            expandidos.append(termo)
+        return expandidos
+
+    def buscar(self, consulta, banco=None, limite=20):
+        """Busca as perguntas com todas as palavras da consulta; retorna (resultados, total).
+
+        resultados: lista de (pontuação, banco, pergunta), da mais relevante
+        para a menos relevante.
+        """
+        palavras = tokenizar(consulta)
+        if not palavras:
+            return [], 0
+        with self._lock:
+            total_docs = max(len(self._documentos), 1)
+            pontuacoes = None
+            for posicao, palavra in enumerate(palavras):
+                termos = [palavra] if palavra in self._postings else []
+                if posicao == len(palavras) - 1:
+                    termos = list(dict.fromkeys(termos + self._expandir_prefixo(palavra)))
+                parcial = defaultdict(float)
+                for termo in termos:
+                    postings = self._postings[termo]
+                    idf = math.log(1 + total_docs / len(postings))
+                    # Termo exato vale mais que um termo que só casa pelo prefixo
+                    fator = idf if termo == palavra else idf * 0.5
+                    for id_pergunta, peso in postings.items():
+                        parcial[id_pergunta] += peso * fator
+                if pontuacoes is None:
+                    pontuacoes = parcial
+                else:
+                    pontuacoes = {i: p + parcial[i] for i, p in pontuacoes.items() if i in parcial}
+                if not pontuacoes:
+                    return [], 0
+            if banco:
+                pontuacoes = {i: p for i, p in pontuacoes.items() if self._documentos[i][0] == banco}
+            melhores = sorted(pontuacoes.items(), key=lambda item: (-item[1], item[0]))[:limite]
+            resultados = [(pontuacao,) + self._documentos[i][:2] for i, pontuacao in melhores]
+        return resultados, len(pontuacoes)
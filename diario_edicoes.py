@@ -0,0 +1,293 @@
+"""
+Diário de edições dos bancos de perguntas.
+
+Incluir, editar ou excluir uma pergunta pelo painel admin não regrava mais o
+JSON inteiro do banco: a operação é acrescentada como uma linha (NDJSON) ao
+diário do banco (<arquivo>.json.diario), com custo constante. A carga do banco
+lê o JSON base e reaplica o diário por cima.
+
+De tempos em tempos o CompactadorDiarios incorpora o diário ao JSON base em
+segundo plano. A compactação primeiro renomeia o diário para
+<arquivo>.json.diario.compactando (novas edições vão para um diário novo),
+regrava o JSON base com as operações aplicadas e só então apaga o arquivo
+renomeado. As operações são idempotentes (incluir/substituir/remover por id),
+então reaplicar um arquivo .compactando que sobrou de uma falha não altera o
+resultado.
+
+Formato de cada linha:
+    {"op": "adicionar" | "substituir" | "remover", "id": ..., "pergunta": {...}, "em": ...}
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from threads_processo import ThreadPorProcesso
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads do processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+OPERACOES = ('adicionar', 'substituir', 'remover')
+
+
+class DiarioEdicoes:
+    """Diário somente-acréscimo das edições de um arquivo de banco"""
+
+    def __init__(self, caminho_banco):
+        self.caminho_banco = caminho_banco
+        self.caminho = caminho_banco + '.diario'
+        self.caminho_compactando = self.caminho + '.compactando'
+        self._caminho_lock = self.caminho + '.lock'
+        self._locks = {'': threading.Lock(), '.compactacao': threading.Lock()}
+
+    def arquivos(self):
+        """Arquivos do diário (observados para recarga automática)"""
+        return [self.caminho, self.caminho_compactando]
+
+    @contextmanager
+    def _travado(self, sufixo='', bloquear=True):
+        """Lock exclusivo entre threads e processos (flock em um arquivo auxiliar)"""
+        lock_thread = self._locks[sufixo]
+        if not lock_thread.acquire(blocking=bloquear):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            diretorio = os.path.dirname(self._caminho_lock)
+            if diretorio:
+                os.makedirs(diretorio, exist_ok=True)
+            with open(self._caminho_lock + sufixo, 'a') as f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            lock_thread.release()
+
+    def registrar(self, op, pergunta=None, id_pergunta=None):
+        """Acrescenta uma operação ao diário e retorna o tamanho atual do diário em bytes"""
+        if op not in OPERACOES:
+            raise ValueError(f'Operação de diário desconhecida: {op}')
+        operacao = {'op': op, 'id': id_pergunta or (pergunta or {}).get('id')}
+        if pergunta is not None:
+            operacao['pergunta'] = dict(pergunta)
+        operacao['em'] = datetime.now().isoformat()
+        linha = (json.dumps(operacao, ensure_ascii=False) + '\n').encode('utf-8')
+        # O lock impede que a linha caia no diário que está sendo renomeado
+        # para compactação depois de ele já ter sido lido
+        with self._travado():
+            fd = os.open(self.caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, linha)
+                return os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+    def _ler(self, caminho):
+        operacoes = []
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        operacoes.append(json.loads(linha))
+                    except ValueError:
+                        # Última linha incompleta (queda durante a gravação)
+                        logger.warning(f"Linha inválida ignorada no diário {caminho}")
+        except FileNotFoundError:
+            pass
+        return operacoes
+
+    def operacoes(self):
+        """Operações ainda não incorporadas ao JSON base, em ordem"""
+        return self._ler(self.caminho_compactando) + self._ler(self.caminho)
+
+    def ler(self, ler_base):
+        """(ler_base(), operações do diário) lidos sem uma compactação no meio, que troca os dois"""
+        with self._travado('.compactacao'):
+            return ler_base(), self.operacoes()
+
+    def pendente(self):
+        return os.path.exists(self.caminho) or os.path.exists(self.caminho_compactando)
+
+    def compactar(self, incorporar):
+        """Incorpora o diário ao JSON base.
+
+        incorporar: função que recebe a lista de operações e regrava o JSON
+        base com elas aplicadas. Retorna o número de operações incorporadas
+        (None se outra compactação já estiver em andamento).
+        """
+        with self._travado('.compactacao', bloquear=False) as obtido:
+            if not obtido:
+                return None
+            if not os.path.exists(self.caminho_compactando):
+                with self._travado():
+                    if not os.path.exists(self.caminho):
+                        return 0
+                    os.replace(self.caminho, self.caminho_compactando)
+            operacoes = self._ler(self.caminho_compactando)
+            incorporar(operacoes)
+            os.remove(self.caminho_compactando)
+            return len(operacoes)
+
+    @contextmanager
+    def alteracao_externa(self):
+        """Contexto para alterar o JSON base fora do app (ex.: sincronizar_perguntas.py).
+
+        Enquanto ativo nenhuma compactação ou regravação completa sobrescreve
+        o arquivo. O diário é mantido e continua recebendo edições, que são
+        reaplicadas sobre o JSON alterado.
+        """
+        with self._travado('.compactacao'):
+            yield
+
+    @contextmanager
+    def regravacao_completa(self):
+        """Contexto para regravar o JSON base inteiro a partir da memória.
+
+        Ao final o diário é descartado, pois o JSON gravado já contém todas
+        as edições conhecidas pelo processo.
+        """
+        with self._travado('.compactacao'):
+            with self._travado():
+                yield
+                for caminho in (self.caminho, self.caminho_compactando):
+                    try:
+                        os.remove(caminho)
+                    except FileNotFoundError:
+                        pass
+
+
+def aplicar_operacoes_lista(perguntas, operacoes):
+    """Aplica as operações do diário a um banco em formato de lista"""
+    perguntas = list(perguntas)
+    posicoes = {p.get('id'): i for i, p in enumerate(perguntas) if p.get('id')}
+    for operacao in operacoes:
+        id_pergunta = operacao.get('id')
+        op = operacao.get('op')
+        if op == 'remover':
+            posicao = posicoes.pop(id_pergunta, None)
+            if posicao is not None:
+                perguntas[posicao] = None
+        elif op in ('adicionar', 'substituir'):
+            posicao = posicoes.get(id_pergunta)
+            if posicao is not None:
+                perguntas[posicao] = operacao['pergunta']
+            elif op == 'adicionar':
+                posicoes[id_pergunta] = len(perguntas)
+                perguntas.append(operacao['pergunta'])
+    return [p for p in perguntas if p is not None]
+
+
+def aplicar_operacoes_recuperacao(banco, operacoes):
+    """Aplica as operações do diário ao banco de recuperação ({disciplina: {topico: [...]}}), no lugar"""
+    posicoes = {}
+    for disciplina, topicos in banco.items():
+        for topico, perguntas in topicos.items():
+            for pergunta in perguntas:
+                if pergunta.get('id'):
+                    posicoes[pergunta['id']] = (disciplina, topico)
+
+    def localizar(id_pergunta):
+        local = posicoes.get(id_pergunta)
+        if local is None:
+            return None, None
+        perguntas = banco[local[0]][local[1]]
+        for i, pergunta in enumerate(perguntas):
+            if pergunta.get('id') == id_pergunta:
+                return perguntas, i
+        return None, None
+
+    for operacao in operacoes:
+        id_pergunta = operacao.get('id')
+        op = operacao.get('op')
+        perguntas, i = localizar(id_pergunta)
+        if op == 'remover':
+            if perguntas is None:
+                continue
+            disciplina, topico = posicoes.pop(id_pergunta)
+            perguntas.pop(i)
+            if not perguntas:
+                del banco[disciplina][topico]
+                if not banco[disciplina]:
+                    del banco[disciplina]
+        elif op in ('adicionar', 'substituir'):
+            nova = operacao['pergunta']
+            if perguntas is not None:
+                perguntas[i] = nova
+            elif op == 'adicionar':
+                # O histórico de alterações informa o local na própria operação
+                disciplina = operacao.get('disciplina', nova.get('disciplina'))
+                topico = operacao.get('topico', nova.get('topico'))
+                banco.setdefault(disciplina, {}).setdefault(topico, []).append(nova)
+                posicoes[id_pergunta] = (disciplina, topico)
+    return banco
+
+
+class CompactadorDiarios:
+    """Thread em segundo plano que incorpora os diários aos JSON base.
+
+    Compacta a cada `intervalo` segundos (se houver edições pendentes) ou
+    logo depois que um diário passa de `max_bytes`.
+    """
+
+    def __init__(self, intervalo=60, max_bytes=256 * 1024):
+        self.intervalo = intervalo
+        self.max_bytes = max_bytes
+        self._diarios = []
+        self._evento = threading.Event()
+        self._thread = ThreadPorProcesso(self._executar, 'compactador-diarios')
+
+    def adicionar(self, diario, incorporar, ao_compactar=None):
+        """Registra um diário e a função que o incorpora ao JSON base"""
+        self._diarios.append((diario, incorporar, ao_compactar))
+
+    def registrado(self, tamanho):
+        """Chamado após cada edição com o tamanho do diário; antecipa a compactação se necessário"""
+        if self.max_bytes and tamanho >= self.max_bytes:
+            self._evento.set()
+
+    def compactar_agora(self):
+        """Compacta todos os diários pendentes (na thread atual)"""
+        total = 0
+        for diario, incorporar, ao_compactar in self._diarios:
+            if not diario.pendente():
+                continue
+            try:
+                incorporadas = diario.compactar(incorporar)
+            except Exception as e:
+                logger.error(f"Erro ao compactar diário {diario.caminho}: {e}")
+                continue
+            if incorporadas:
+                total += incorporadas
+                logger.info(f"Diário {diario.caminho}: {incorporadas} edições incorporadas ao banco")
+                if ao_compactar:
+                    ao_compactar(diario)
+        return total
+
+    def iniciar(self):
+        if not self.intervalo:
+            return
+        self._thread.iniciar()
+
+    def _executar(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            self.compactar_agora()
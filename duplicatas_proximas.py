@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Detecção de perguntas quase duplicadas (MinHash + LSH).
+
+A deduplicação do sincronizar_perguntas.py e do adicionar_ao_staging.py só
+pega cópias exatas (após normalizar espaços e maiúsculas); uma pergunta
+reescrita com outras palavras passa. Aqui cada pergunta vira um conjunto de
+shingles (pares de palavras consecutivas do enunciado e das opções, já sem
+acentos, sem palavras vazias e com plurais reduzidos, como na busca do painel
+admin) e uma assinatura MinHash desse conjunto. A fração de posições iguais
+entre duas assinaturas estima a similaridade de Jaccard das perguntas.
+
+Para não comparar todos os pares, a assinatura é dividida em faixas (LSH):
+perguntas que coincidem em ao menos uma faixa inteira viram candidatas e só
+elas têm a similaridade estimada. O custo por pergunta é constante, então o
+detector escala linearmente para centenas de milhares de perguntas.
+
+Relatório de grupos de quase duplicadas de um banco:
+    python duplicatas_proximas.py data/perguntas.json
+    python duplicatas_proximas.py data/perguntas.json perguntas_test.json --limiar 0.7 --relatorio grupos.json
+"""
+
+import argparse
+import hashlib
+import json
+from array import array
+
+from arquivos_perguntas import FORMATO_NDJSON, extrair_perguntas, formato_arquivo
+from arquivos_perguntas import ler_perguntas as ler_arquivo_perguntas
+from busca_perguntas import tokenizar
+
+LIMIAR_PADRAO = 0.8
+NUM_PERMUTACOES_PADRAO = 64
+TAMANHO_SHINGLE = 2
+
+
+def texto_pergunta(pergunta):
+    """Texto comparado: enunciado seguido das opções"""
+    opcoes = pergunta.get('opcoes') or []
+    return ' '.join([str(pergunta.get('pergunta') or '')] + [str(o) for o in opcoes])
+
+
+def shingles(texto, tamanho=TAMANHO_SHINGLE):
+    """Conjunto das sequências de `tamanho` termos consecutivos do texto"""
+    termos = tokenizar(texto)
+    if len(termos) < tamanho:
+        return {' '.join(termos)} if termos else set()
+    return {' '.join(termos[i:i + tamanho]) for i in range(len(termos) - tamanho + 1)}
+
+
+def parametros_lsh(num_permutacoes, limiar):
+    """(faixas, linhas por faixa) cujo ponto de corte (1/faixas)^(1/linhas) fica mais perto do limiar"""
+    melhor = None
+    for linhas in range(1, num_permutacoes + 1):
+        if num_permutacoes % linhas:
+            continue
+        faixas = num_permutacoes // linhas
+        corte = (1 / faixas) ** (1 / linhas)
+        # Corte um pouco abaixo do limiar: prefere candidatos a mais (a
+        # similaridade é conferida depois) a perder pares
+        distancia = abs(corte - (limiar - 0.05))
+        if melhor is None or distancia < melhor[0]:
+            melhor = (distancia, faixas, linhas)
+    return melhor[1], melhor[2]
+
+
+class DetectorDuplicatas:
+    """Índice LSH de assinaturas MinHash das perguntas.
+
+    Cada pergunta adicionada recebe uma chave escolhida por quem chama (id,
+    posição, nome do arquivo...). As assinaturas ficam em arrays compactos
+    (4 bytes por permutação) para caber 100k+ perguntas em memória.
+
+    Em vez de aplicar uma permutação por posição da assinatura, cada shingle
+    passa uma única vez pelo SHAKE-128, cuja saída fornece um valor de 32
+    bits independente para cada posição; o mínimo por posição é calculado
+    em C (zip/min), sem aritmética por permutação em Python.
+    """
+
+    def __init__(self, limiar=LIMIAR_PADRAO, num_permutacoes=NUM_PERMUTACOES_PADRAO, semente=1):
+        if not 0 < limiar <= 1:
+            raise ValueError('O limiar de similaridade deve estar entre 0 e 1')
+        self.limiar = limiar
+        self.num_permutacoes = num_permutacoes
+        self.faixas, self.linhas = parametros_lsh(num_permutacoes, limiar)
+        self._semente = str(semente).encode('ascii') + b':'
+        self._chaves = []
+        self._assinaturas = []
+        self._baldes = [{} for _ in range(self.faixas)]
+        self._pares = {}
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def assinatura(self, pergunta):
+        grupos = shingles(texto_pergunta(pergunta))
+        if not grupos:
+            return None
+        tamanho = 4 * self.num_permutacoes
+        valores = [
+            array('I', hashlib.shake_128(self._semente + g.encode('utf-8')).digest(tamanho)) for g in grupos
+        ]
+        return array('I', map(min, zip(*valores)))
+
+    def _chaves_faixas(self, assinatura):
+        linhas = self.linhas
+        for faixa in range(self.faixas):
+            yield faixa, hash(tuple(assinatura[faixa * linhas:(faixa + 1) * linhas]))
+
+    def _similaridade(self, a, b):
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_permutacoes
+
+    def _candidatos(self, assinatura):
+        vistos = set()
+        for faixa, chave in self._chaves_faixas(assinatura):
+            balde = self._baldes[faixa].get(chave)
+            if balde is None:
+                continue
+            for posicao in (balde if isinstance(balde, list) else (balde,)):
+                if posicao not in vistos:
+                    vistos.add(posicao)
+                    yield posicao
+
+    def _similares(self, assinatura):
+        similares = []
+        for posicao in self._candidatos(assinatura):
+            similaridade = self._similaridade(assinatura, self._assinaturas[posicao])
+            if similaridade >= self.limiar:
+                similares.append((posicao, similaridade))
+        similares.sort(key=lambda item: -item[1])
+        return similares
+
+    def similares(self, pergunta):
+        """Perguntas já adicionadas parecidas com `pergunta`: lista de (chave, similaridade)"""
+        assinatura = self.assinatura(pergunta)
+        if assinatura is None:
+            return []
+        return [(self._chaves[p], s) for p, s in self._similares(assinatura)]
+
+    def adicionar(self, chave, pergunta):
+        """Adiciona uma pergunta e retorna as já adicionadas parecidas com ela: lista de (chave, similaridade)"""
+        assinatura = self.assinatura(pergunta)
+        if assinatura is None:
+            return []
+        posicao = len(self._chaves)
+        similares = self._similares(assinatura)
+        for outra, similaridade in similares:
+            self._pares[(outra, posicao)] = similaridade
+        self._chaves.append(chave)
+        self._assinaturas.append(assinatura)
+        for faixa, chave_faixa in self._chaves_faixas(assinatura):
+            baldes = self._baldes[faixa]
+            balde = baldes.get(chave_faixa)
+            # A maioria dos baldes tem uma pergunta só: guarda o inteiro e
+            # só cria a lista na primeira colisão
+            if balde is None:
+                baldes[chave_faixa] = posicao
+            elif isinstance(balde, list):
+                balde.append(posicao)
+            else:
+                baldes[chave_faixa] = [balde, posicao]
+        return [(self._chaves[p], s) for p, s in similares]
+
+    def grupos(self):
+        """Grupos de quase duplicadas entre as perguntas adicionadas.
+
+        Retorna uma lista de dicts {'chaves': [...], 'similaridade_minima': x},
+        maiores grupos primeiro. Os grupos são componentes conexos dos pares
+        acima do limiar, então dois membros de um grupo grande podem ser
+        menos parecidos entre si que o limiar.
+        """
+        pai = {}
+
+        def raiz(x):
+            while pai.get(x, x) != x:
+                pai[x] = pai.get(pai[x], pai[x])
+                x = pai[x]
+            return x
+
+        for a, b in self._pares:
+            ra, rb = raiz(a), raiz(b)
+            if ra != rb:
+                pai[max(ra, rb)] = min(ra, rb)
+
+        membros = {}
+        for a, b in self._pares:
+            membros.setdefault(raiz(a), set()).update((a, b))
+        minimas = {}
+        for (a, _), similaridade in self._pares.items():
+            r = raiz(a)
+            minimas[r] = min(minimas.get(r, 1.0), similaridade)
+
+        grupos = [
+            {'chaves': [self._chaves[p] for p in sorted(posicoes)], 'similaridade_minima': round(minimas[r], 3)}
+            for r, posicoes in membros.items()
+        ]
+        grupos.sort(key=lambda g: (-len(g['chaves']), g['similaridade_minima']))
+        return grupos
+
+
+def ler_perguntas(caminho):
+    """Perguntas de um arquivo JSON ou NDJSON (lista, {"perguntas": [...]} ou {disciplina: {topico: [...]}})"""
+    if formato_arquivo(caminho) == FORMATO_NDJSON:
+        return ler_arquivo_perguntas(caminho)
+    with open(caminho, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and not isinstance(data.get('perguntas'), list):
+        # Banco de recuperação
+        return [p for topicos in data.values() if isinstance(topicos, dict)
+                for perguntas in topicos.values() if isinstance(perguntas, list) for p in perguntas]
+    return extrair_perguntas(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Relatório de perguntas quase duplicadas (MinHash/LSH).')
+    parser.add_argument('arquivos', nargs='+', help='Arquivos JSON ou NDJSON de perguntas (banco principal, recuperação ou staging)')
+    parser.add_argument('--limiar', type=float, default=LIMIAR_PADRAO, help=f'Similaridade mínima, de 0 a 1 (padrão: {LIMIAR_PADRAO})')
+    parser.add_argument('--permutacoes', type=int, default=NUM_PERMUTACOES_PADRAO, help='Tamanho da assinatura MinHash')
+    parser.add_argument('--relatorio', default=None, help='Grava os grupos encontrados neste arquivo JSON')
+    parser.add_argument('--mostrar', type=int, default=20, help='Quantidade de grupos exibidos no terminal')
+    args = parser.parse_args()
+
+    detector = DetectorDuplicatas(args.limiar, args.permutacoes)
+    perguntas = {}
+    for arquivo in args.arquivos:
+        for i, pergunta in enumerate(ler_perguntas(arquivo)):
+            chave = f'{arquivo}#{i}'
+            perguntas[chave] = pergunta
+            detector.adicionar(chave, pergunta)
+
+    grupos = detector.grupos()
+    repetidas = sum(len(g['chaves']) - 1 for g in grupos)
+    print(f"{len(detector)} perguntas, {len(grupos)} grupos de quase duplicadas "
+          f"({repetidas} perguntas a mais), limiar {args.limiar} "
+          f"({detector.faixas} faixas x {detector.linhas} linhas)")
+    for grupo in grupos[:args.mostrar]:
+        print(f"\n{len(grupo['chaves'])} perguntas, similaridade >= {grupo['similaridade_minima']}")
+        for chave in grupo['chaves']:
+            print(f"  {chave}: {str(perguntas[chave].get('pergunta', ''))[:100]}")
+
+    if args.relatorio:
+        for grupo in grupos:
+            grupo['perguntas'] = [
+                {'chave': c, 'pergunta': perguntas[c].get('pergunta'), 'disciplina': perguntas[c].get('disciplina')}
+                for c in grupo['chaves']
+            ]
+        with open(args.relatorio, 'w', encoding='utf-8') as f:
+            json.dump(grupos, f, ensure_ascii=False, indent=2)
+        print(f"\nRelatório gravado em {args.relatorio}")
+
+
+if __name__ == '__main__':
+    main()
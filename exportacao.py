@@ -0,0 +1,89 @@
+"""
+Serialização em streaming das perguntas para exportação (JSON, NDJSON e CSV).
+
+Os geradores produzem o arquivo em blocos de ~64 KB à medida que percorrem as
+perguntas, então a resposta HTTP começa a ser enviada imediatamente e a
+memória usada não depende do tamanho do banco. Com compactar=True os blocos
+passam por um compressor gzip incremental.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+FORMATOS = {
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+MAX_OPCOES_CSV = 5
+COLUNAS_CSV = (
+    ['id', 'periodo', 'disciplina', 'topico', 'categoria', 'dificuldade', 'fonte_material', 'pergunta']
+    + [f'opcao_{i}' for i in range(1, MAX_OPCOES_CSV + 1)]
+    + ['resposta_correta', 'explicacao', 'referencia']
+)
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+def _partes_json(perguntas):
+    yield '['
+    primeira = True
+    for pergunta in perguntas:
+        yield ('\n' if primeira else ',\n') + json.dumps(pergunta, ensure_ascii=False)
+        primeira = False
+    yield '\n]\n'
+
+
+def _partes_ndjson(perguntas):
+    for pergunta in perguntas:
+        yield json.dumps(pergunta, ensure_ascii=False) + '\n'
+
+
+def _partes_csv(perguntas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para o Excel reconhecer UTF-8
+    yield '\ufeff'
+    escritor.writerow(COLUNAS_CSV)
+    for pergunta in perguntas:
+        opcoes = list(pergunta.get('opcoes') or [])[:MAX_OPCOES_CSV]
+        opcoes += [''] * (MAX_OPCOES_CSV - len(opcoes))
+        escritor.writerow(
+            [pergunta.get(c, '') for c in COLUNAS_CSV[:8]]
+            + opcoes
+            + [pergunta.get('resposta_correta', ''), pergunta.get('explicacao', ''), pergunta.get('referencia', '')]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+_GERADORES = {'json': _partes_json, 'ndjson': _partes_ndjson, 'csv': _partes_csv}
+
+
+def gerar_exportacao(perguntas, formato='json', compactar=False):
+    """Gera o conteúdo exportado em blocos de bytes"""
+    if formato not in _GERADORES:
+        raise ValueError(f'Formato inválido. Use: {", ".join(FORMATOS)}')
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+    bloco = []
+    tamanho = 0
+    for parte in _GERADORES[formato](perguntas):
+        bloco.append(parte)
+        tamanho += len(parte)
+        if tamanho >= TAMANHO_BLOCO:
+            dados = ''.join(bloco).encode('utf-8')
+            bloco, tamanho = [], 0
+            if compressor is not None:
+                dados = compressor.compress(dados)
+            if dados:
+                yield dados
+    dados = ''.join(bloco).encode('utf-8')
+    if compressor is not None:
+        dados = compressor.compress(dados) + compressor.flush()
+    if dados:
+        yield dados
@@ -0,0 +1,25 @@
+"""
+Configuração do gunicorn.
+
+Os bancos de perguntas são carregados uma única vez no processo mestre
+(preload_app) e compartilhados com os workers via copy-on-write.
+
+Uso:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import gc
+import os
+
+wsgi_app = 'app:create_app()'
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'sim')
+
+
+def pre_fork(server, worker):
+    # Congela também os objetos criados depois da carga dos bancos (imports do
+    # próprio gunicorn etc.), para que o GC dos workers não os toque
+    gc.freeze()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Histórico de alterações dos bancos de perguntas, para recuperação pontual.
+
+Os backups por disciplina só existem quando um admin remove ou restaura uma
+disciplina, então um upload em massa errado ou uma sincronização ruim não
+podiam ser desfeitos com precisão. Aqui cada banco tem um log somente-
+acréscimo com todas as alterações (edições do painel admin, gravações
+completas do banco e execuções do sincronizar_perguntas.py), gravado antes
+do banco, e checkpoints periódicos do banco inteiro.
+
+Estrutura em <HISTORICO_DIR>/<banco>/ (banco = principal ou recuperacao):
+    alteracoes.ndjson        uma operação por linha, no formato do diário de
+                             edições ({"op", "id", "pergunta", "em"}) mais a
+                             origem e, na recuperação, disciplina e tópico
+    checkpoint_<em>.json     estado completo do banco em um instante, como
+                             manifesto do ArmazemBackups (perguntas em objetos/,
+                             deduplicadas entre checkpoints)
+
+Cada checkpoint guarda a posição do log em que foi tirado. Reconstruir o
+banco em um instante parte do último checkpoint anterior a ele e reaplica só
+o trecho do log a partir dessa posição; um checkpoint novo é tirado sempre
+que o log cresce mais que o intervalo configurado, o que limita o replay.
+Como vários workers gravam no mesmo log, os checkpoints são tirados do banco
+em disco (JSON com o diário ou SQLite), não do estado de um processo.
+
+Nas gravações completas (upload, remoção ou restauração de disciplina) as
+operações são a diferença entre o estado que o processo carregou ou gravou
+por último e o estado gravado agora; como os registros de pergunta são
+imutáveis, a comparação é por identidade na maior parte do banco.
+
+Uso:
+    python historico_bancos.py listar principal
+    python historico_bancos.py restaurar principal --as-of "2026-10-18 14:30" --saida /tmp/perguntas.json
+    python historico_bancos.py restaurar recuperacao --as-of 2026-10-18T14:30:00 --saida data/perguntas_recuperacao.json --aplicar
+"""
+
+import argparse
+import glob
+import io
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from armazem_backups import ArmazemBackups
+from arquivos_perguntas import gravar_perguntas
+from diario_edicoes import DiarioEdicoes, aplicar_operacoes_lista, aplicar_operacoes_recuperacao
+from modelo_perguntas import RegistroPerguntas
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads do processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BANCO_PRINCIPAL = 'principal'
+BANCO_RECUPERACAO = 'recuperacao'
+# Mesmos prefixos de id usados pelo app ao carregar cada banco
+PREFIXOS_ID = {BANCO_PRINCIPAL: 'p', BANCO_RECUPERACAO: 'r'}
+
+ARQUIVO_LOG = 'alteracoes.ndjson'
+PREFIXO_CHECKPOINT = 'checkpoint_'
+INTERVALO_CHECKPOINT_PADRAO = 1024 * 1024
+
+
+def agora():
+    return datetime.now().isoformat(timespec='microseconds')
+
+
+def normalizar_instante(valor):
+    """Instante informado pelo usuário no formato gravado no log"""
+    return datetime.fromisoformat(valor.strip()).isoformat(timespec='microseconds')
+
+
+def operacao(op, pergunta=None, id_pergunta=None, local=None):
+    """Operação do log; `local` é o (disciplina, tópico) da pergunta no banco de recuperação"""
+    registro = {'op': op, 'id': id_pergunta or (pergunta or {}).get('id')}
+    if pergunta is not None:
+        registro['pergunta'] = dict(pergunta)
+    if local is not None:
+        registro['disciplina'], registro['topico'] = local
+    return registro
+
+
+def estado_lista(perguntas):
+    """Estado do banco principal: id -> (registro, None), na ordem do banco"""
+    return {p.get('id'): (p, None) for p in perguntas}
+
+
+def estado_recuperacao(banco):
+    """Estado do banco de recuperação: id -> (registro, (disciplina, tópico))"""
+    return {
+        p.get('id'): (p, (disciplina, topico))
+        for disciplina, topicos in banco.items()
+        for topico, perguntas in topicos.items()
+        for p in perguntas
+    }
+
+
+def diferencas(anterior, atual):
+    """Operações que levam o estado `anterior` ao `atual`"""
+    operacoes = []
+    for id_pergunta, (pergunta, local) in atual.items():
+        antes = anterior.get(id_pergunta)
+        if antes is None:
+            operacoes.append(operacao('adicionar', pergunta, id_pergunta, local))
+        elif antes[1] != local:
+            # Mudou de disciplina/tópico: substituir manteria a posição antiga
+            operacoes.append(operacao('remover', id_pergunta=id_pergunta))
+            operacoes.append(operacao('adicionar', pergunta, id_pergunta, local))
+        elif antes[0] is not pergunta and antes[0] != pergunta:
+            operacoes.append(operacao('substituir', pergunta, id_pergunta, local))
+    for id_pergunta in anterior.keys() - atual.keys():
+        operacoes.append(operacao('remover', id_pergunta=id_pergunta))
+    return operacoes
+
+
+class HistoricoBanco:
+    """Log de alterações e checkpoints de um banco"""
+
+    def __init__(self, diretorio, banco, compressao='gzip', intervalo_checkpoint=INTERVALO_CHECKPOINT_PADRAO):
+        if banco not in PREFIXOS_ID:
+            raise ValueError(f'Banco inválido: {banco}')
+        self.diretorio = diretorio
+        self.banco = banco
+        self.caminho_log = os.path.join(diretorio, ARQUIVO_LOG)
+        self.intervalo_checkpoint = intervalo_checkpoint
+        self.armazem = ArmazemBackups(diretorio, compressao)
+        self._caminho_lock = os.path.join(diretorio, '.lock')
+        self._lock_log = threading.Lock()
+        self._lock_estado = threading.Lock()
+        self._estado = None
+        self._posicao_checkpoint = None
+
+    @contextmanager
+    def _travado(self):
+        """Lock exclusivo do log entre threads e processos"""
+        with self._lock_log:
+            os.makedirs(self.diretorio, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self._caminho_lock, 'a') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def tamanho_log(self):
+        try:
+            return os.path.getsize(self.caminho_log)
+        except FileNotFoundError:
+            return 0
+
+    # Log
+
+    def registrar(self, operacoes, origem):
+        """Acrescenta as operações ao log (antes de gravá-las no banco)"""
+        if not operacoes:
+            return
+        with self._travado():
+            em = agora()
+            dados = ''.join(
+                json.dumps(dict(op, em=em, origem=origem), ensure_ascii=False) + '\n' for op in operacoes
+            ).encode('utf-8')
+            fd = os.open(self.caminho_log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                escritos = 0
+                while escritos < len(dados):
+                    escritos += os.write(fd, dados[escritos:])
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def garantir_checkpoint(self, ler_banco):
+        """Sem checkpoint não há de onde reaplicar o log: grava o banco em disco antes da primeira alteração.
+
+        O banco é lido fora do lock do log (a leitura trava o diário, e a
+        restauração trava o diário antes do log); a verificação e a gravação
+        ficam sob o lock, então só um processo grava o checkpoint inicial.
+        """
+        if self._posicao_checkpoint is not None:
+            return
+        recentes = self.checkpoints()
+        if recentes:
+            self._posicao_checkpoint = recentes[-1][1].get('posicao', 0)
+            return
+        dados = ler_banco()
+        with self._travado():
+            recentes = self.checkpoints()
+            if recentes:
+                self._posicao_checkpoint = recentes[-1][1].get('posicao', 0)
+                return
+            posicao = self.tamanho_log()
+            dados = self._aplicar(dados, self._operacoes_para_reaplicar(RegistroPerguntas(), 0, fim=posicao))
+            self._gravar_checkpoint(dados, 'inicial', posicao, agora())
+
+    def operacoes(self, a_partir_de=0, ate=None, fim=None):
+        """Operações do log a partir de uma posição (bytes), até o instante `ate` inclusive ou a posição `fim`"""
+        try:
+            f = open(self.caminho_log, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(a_partir_de)
+            linhas = f if fim is None else io.BytesIO(f.read(max(fim - a_partir_de, 0)))
+            for linha in linhas:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    logger.warning(f"Linha inválida ignorada no histórico {self.caminho_log}")
+                    continue
+                if ate is not None and registro.get('em', '') > ate:
+                    break
+                yield registro
+
+    # Estado conhecido pelo processo
+
+    def definir_estado(self, estado):
+        """Estado carregado do disco (não gera operações)"""
+        with self._lock_estado:
+            self._estado = estado
+
+    def registrar_estado(self, estado, origem, ler_banco):
+        """Registra a diferença entre o último estado conhecido e `estado` (gravação completa)"""
+        self.garantir_checkpoint(ler_banco)
+        with self._lock_estado:
+            anterior = self._estado
+            self._estado = estado
+        if anterior is None:
+            return 0
+        operacoes = diferencas(anterior, estado)
+        self.registrar(operacoes, origem)
+        return len(operacoes)
+
+    def registrar_edicao(self, ler_banco, op, pergunta=None, id_pergunta=None, origem='admin'):
+        """Registra uma edição individual (incluir/substituir/remover uma pergunta)"""
+        self.garantir_checkpoint(ler_banco)
+        id_pergunta = id_pergunta or (pergunta or {}).get('id')
+        local = None
+        with self._lock_estado:
+            if self._estado is not None:
+                antes = self._estado.get(id_pergunta)
+                if self.banco == BANCO_RECUPERACAO:
+                    local = antes[1] if antes else (pergunta.get('disciplina'), pergunta.get('topico'))
+                if op == 'remover':
+                    self._estado.pop(id_pergunta, None)
+                else:
+                    self._estado[id_pergunta] = (pergunta, local)
+        self.registrar([operacao(op, pergunta, id_pergunta, local)], origem)
+
+    # Checkpoints
+
+    def checkpoints(self):
+        """Lista de (nome, metadados) dos checkpoints, do mais antigo para o mais recente"""
+        return sorted(self.armazem.listar(PREFIXO_CHECKPOINT), key=lambda item: item[1].get('em', ''))
+
+    def checkpoint(self, dados, origem):
+        """Grava o banco inteiro como checkpoint na posição atual do log"""
+        with self._travado():
+            posicao = self.tamanho_log()
+            em = agora()
+        return self._gravar_checkpoint(dados, origem, posicao, em)
+
+    def _gravar_checkpoint(self, dados, origem, posicao, em):
+        if self.banco == BANCO_PRINCIPAL:
+            total = len(dados)
+        else:
+            total = sum(len(perguntas) for topicos in dados.values() for perguntas in topicos.values())
+        nome = f"{PREFIXO_CHECKPOINT}{em.replace('-', '').replace(':', '').replace('.', '_')}.json"
+        self.armazem.gravar(nome, {
+            'banco': self.banco,
+            'em': em,
+            'posicao': posicao,
+            'origem': origem,
+            'total_perguntas': total,
+        }, dados)
+        self._posicao_checkpoint = posicao
+        return nome
+
+    def checkpoint_devido(self):
+        if self._posicao_checkpoint is None:
+            recentes = self.checkpoints()
+            if not recentes:
+                return True
+            self._posicao_checkpoint = recentes[-1][1].get('posicao', 0)
+        return self.tamanho_log() - self._posicao_checkpoint >= self.intervalo_checkpoint
+
+    def checkpoint_se_devido(self, ler_banco, origem='periodico'):
+        """Tira um checkpoint se o log cresceu mais que o intervalo desde o último"""
+        if not self.checkpoint_devido():
+            return None
+        return self.checkpoint_do_banco(ler_banco, origem)
+
+    def checkpoint_do_banco(self, ler_banco, origem):
+        """Checkpoint do banco como está em disco, e não como o processo o conhece.
+
+        `ler_banco` lê o banco atual (JSON base com o diário reaplicado, ou o
+        SQLite): outros workers gravam no mesmo log. Uma alteração registrada
+        no log e ainda não gravada no banco ficaria fora do checkpoint e antes
+        da posição dele, então as operações do log desde o último checkpoint
+        são reaplicadas sobre o que foi lido; as que já estão no banco não
+        mudam nada.
+        """
+        recentes = self.checkpoints()
+        inicio = recentes[-1][1].get('posicao', 0) if recentes else 0
+        dados = ler_banco()
+        with self._travado():
+            posicao = self.tamanho_log()
+            em = agora()
+        registro = RegistroPerguntas()
+        dados = self._aplicar(dados, self._operacoes_para_reaplicar(registro, inicio, fim=posicao))
+        return self._gravar_checkpoint(dados, origem, posicao, em)
+
+    # Recuperação pontual
+
+    def restaurar(self, ate):
+        """Reconstrói o banco como estava no instante `ate` (ISO 8601).
+
+        Retorna (dados, informações do replay). Dispara ValueError se não há
+        checkpoint anterior ao instante.
+        """
+        ate = normalizar_instante(ate)
+        anteriores = [(nome, meta) for nome, meta in self.checkpoints() if meta.get('em', '') <= ate]
+        if not anteriores:
+            raise ValueError(f'Nenhum checkpoint do banco {self.banco} anterior a {ate}')
+        nome, meta = anteriores[-1]
+        base = self.armazem.ler(nome)['data']
+
+        prefixo = PREFIXOS_ID[self.banco]
+        registro = RegistroPerguntas()
+        if self.banco == BANCO_PRINCIPAL:
+            dados = registro.congelar_lista(base, prefixo)
+        else:
+            usados = set()
+            dados = {
+                disciplina: {
+                    topico: [registro.congelar(p, prefixo, usados) for p in perguntas]
+                    for topico, perguntas in topicos.items()
+                }
+                for disciplina, topicos in base.items()
+            }
+        operacoes = self._operacoes_para_reaplicar(registro, meta.get('posicao', 0), ate=ate)
+        dados = self._aplicar(dados, operacoes)
+        return dados, {'checkpoint': nome, 'checkpoint_em': meta.get('em'), 'operacoes': len(operacoes), 'ate': ate}
+
+    def _operacoes_para_reaplicar(self, registro, a_partir_de, ate=None, fim=None):
+        prefixo = PREFIXOS_ID[self.banco]
+        operacoes = []
+        for op in self.operacoes(a_partir_de, ate, fim):
+            if op.get('op') == 'adicionar' and not op.get('id'):
+                # Perguntas acrescentadas pela sincronização ainda sem id: o
+                # app gera o mesmo id determinístico ao carregá-las
+                pergunta = registro.congelar(op['pergunta'], prefixo)
+                op = dict(op, id=pergunta['id'], pergunta=pergunta)
+            operacoes.append(op)
+        return operacoes
+
+    def _aplicar(self, dados, operacoes):
+        if self.banco == BANCO_PRINCIPAL:
+            return aplicar_operacoes_lista(dados, operacoes)
+        return aplicar_operacoes_recuperacao(dados, operacoes)
+
+
+def motivo_para_nao_aplicar(banco, saida):
+    """Por que a restauração não pode ser gravada sobre o banco em uso (None se pode)"""
+    if os.environ.get('BANCO_PERGUNTAS_BACKEND', 'json').strip().lower() == 'sqlite':
+        return ('os bancos estão no SQLite (BANCO_PERGUNTAS_BACKEND=sqlite); grave em outro arquivo com --saida '
+                'e importe com python banco_sqlite.py importar')
+    if banco == BANCO_RECUPERACAO:
+        # O app mescla todos estes arquivos no banco de recuperação
+        arquivos = glob.glob(os.path.join('data', 'perguntas_recuperacao*.json')) + glob.glob(os.path.join('data', 'RECUP_*.json'))
+        outros = [a for a in arquivos if os.path.abspath(a) != os.path.abspath(saida)]
+        if outros:
+            return (f"o banco de recuperação também é lido de {', '.join(sorted(outros))}; "
+                    f"grave em outro arquivo com --saida e substitua os arquivos manualmente")
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Histórico de alterações e recuperação pontual dos bancos de perguntas.')
+    parser.add_argument('--dir', default=os.environ.get('HISTORICO_DIR', os.path.join('data', 'historico')),
+                        help='Diretório do histórico (padrão: HISTORICO_DIR ou data/historico)')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    listar = comandos.add_parser('listar', help='Lista os checkpoints e o tamanho do log')
+    listar.add_argument('banco', choices=sorted(PREFIXOS_ID))
+
+    restaurar = comandos.add_parser('restaurar', help='Reconstrói o banco como estava em um instante')
+    restaurar.add_argument('banco', choices=sorted(PREFIXOS_ID))
+    restaurar.add_argument('--as-of', '--ate', dest='ate', required=True,
+                           help='Instante em ISO 8601, no horário local do servidor (ex.: "2026-10-18 14:30")')
+    restaurar.add_argument('--saida', required=True, help='Arquivo em que o banco reconstruído é gravado')
+    restaurar.add_argument('--aplicar', action='store_true',
+                           help=('A saída é o próprio banco em uso: descarta o diário de edições e registra a '
+                                 'restauração no histórico (checkpoint). Não disponível com o SQLite nem com '
+                                 'vários arquivos de recuperação'))
+    args = parser.parse_args()
+
+    historico = HistoricoBanco(os.path.join(args.dir, args.banco), args.banco)
+
+    if args.comando == 'listar':
+        for nome, meta in historico.checkpoints():
+            print(f"{meta.get('em')}  {meta.get('total_perguntas', 0):>7} perguntas  "
+                  f"posição {meta.get('posicao', 0):>10}  {meta.get('origem', '')}  {nome}")
+        print(f"Log: {historico.caminho_log} ({historico.tamanho_log()} bytes)")
+        return
+
+    if args.aplicar:
+        motivo = motivo_para_nao_aplicar(args.banco, args.saida)
+        if motivo:
+            raise SystemExit(f"Erro: --aplicar não é possível: {motivo}")
+
+    try:
+        dados, info = historico.restaurar(args.ate)
+    except ValueError as exc:
+        raise SystemExit(f"Erro: {exc}")
+    if args.aplicar:
+        # O diário guarda edições posteriores ao instante restaurado, que
+        # seriam reaplicadas na próxima carga: é descartado junto com a gravação
+        with DiarioEdicoes(args.saida).regravacao_completa():
+            gravar_perguntas(args.saida, dados)
+            historico.checkpoint(dados, f"restauracao {info['ate']}")
+    else:
+        gravar_perguntas(args.saida, dados)
+    print(f"Banco {args.banco} em {info['ate']}: checkpoint {info['checkpoint_em']} "
+          f"+ {info['operacoes']} operações reaplicadas -> {args.saida}")
+    if args.aplicar:
+        print('Diário de edições descartado e restauração registrada no histórico.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Índice em memória do banco principal de perguntas.
+
+Agrupa as perguntas por (período, disciplina normalizada) e já separa cada
+grupo em perguntas do material do professor e perguntas oficiais, para que
+o início de um quiz não precise varrer o banco inteiro.
+
+O índice também atende a listagem do painel admin: contadores por período e
+por disciplina mantidos a cada alteração e paginação por cursor (keyset)
+sobre visões ordenadas, calculadas uma vez e atualizadas com bisect a cada
+inclusão ou exclusão (só uma recarga completa as descarta).
+
+Para as edições por id ele guarda a posição de cada pergunta na lista do
+banco. Uma exclusão desloca todas as posições seguintes; em vez de
+reescrevê-las, as posições gravadas ficam na numeração antiga e as excluídas
+vão para uma lista ordenada: a posição atual é a gravada menos as excluídas
+antes dela. A numeração é refeita de tempos em tempos.
+"""
+
+import bisect
+import random
+import threading
+from collections import Counter
+
+# Exclusões acumuladas antes de renumerar as posições das perguntas
+LIMITE_EXCLUSOES_POSICOES = 1024
+
+
+def normalizar_disciplina(disciplina):
+    """Normaliza o nome da disciplina para uso como chave do índice"""
+    return ' '.join((disciplina or '').split()).lower()
+
+
+def normalizar_periodo(periodo):
+    """Converte o período para inteiro quando possível"""
+    try:
+        return int(periodo)
+    except (TypeError, ValueError):
+        return periodo
+
+
+def chave_pergunta(pergunta):
+    """Retorna a chave (período, disciplina) de uma pergunta"""
+    return (normalizar_periodo(pergunta.get('periodo')), normalizar_disciplina(pergunta.get('disciplina', '')))
+
+
+def fonte_pergunta(pergunta):
+    """Classifica a pergunta como 'professor' ou 'oficial'"""
+    return 'professor' if pergunta.get('fonte_material') == 'professor' else 'oficial'
+
+
+def _texto_ordenacao(valor):
+    return ' '.join(str(valor or '').split()).lower()
+
+
+def _numero_ordenacao(valor):
+    periodo = normalizar_periodo(valor)
+    return periodo if isinstance(periodo, int) else -1
+
+
+# Chaves de ordenação da listagem; o id no final torna cada chave única
+ORDENACOES = {
+    'id': lambda p: (str(p.get('id') or ''),),
+    'pergunta': lambda p: (_texto_ordenacao(p.get('pergunta')), str(p.get('id') or '')),
+    'disciplina': lambda p: (_texto_ordenacao(p.get('disciplina')), str(p.get('id') or '')),
+    'periodo': lambda p: (_numero_ordenacao(p.get('periodo')), str(p.get('id') or '')),
+    'dificuldade': lambda p: (_texto_ordenacao(p.get('dificuldade')), str(p.get('id') or '')),
+}
+
+
+class IndicePerguntas:
+    """Índice (período, disciplina) -> {'professor': [...], 'oficial': [...]}"""
+
+    def __init__(self, perguntas=None):
+        self._lock = threading.Lock()
+        self._grupos = {}
+        self._por_periodo = Counter()
+        self._por_disciplina = Counter()
+        self._total = 0
+        self._visoes = {}
+        self._posicoes = {}
+        self._excluidas = []
+        if perguntas is not None:
+            self.reconstruir(perguntas)
+
+    def reconstruir(self, perguntas):
+        """Reconstrói o índice completo a partir de uma lista de perguntas (na ordem do banco)"""
+        grupos = {}
+        por_periodo = Counter()
+        por_disciplina = Counter()
+        posicoes = {}
+        total = 0
+        for pergunta in perguntas:
+            posicoes[pergunta.get('id')] = total
+            chave = chave_pergunta(pergunta)
+            grupo = grupos.setdefault(chave, {'professor': [], 'oficial': []})
+            grupo[fonte_pergunta(pergunta)].append(pergunta)
+            por_periodo[chave[0]] += 1
+            por_disciplina[chave[1]] += 1
+            total += 1
+        with self._lock:
+            self._grupos = grupos
+            self._por_periodo = por_periodo
+            self._por_disciplina = por_disciplina
+            self._total = total
+            self._visoes = {}
+            self._posicoes = posicoes
+            self._excluidas = []
+
+    def _contabilizar(self, chave, quantidade):
+        # Chamado com o lock adquirido
+        self._por_periodo[chave[0]] += quantidade
+        self._por_disciplina[chave[1]] += quantidade
+        self._total += quantidade
+
+    # Posições na lista do banco (chamados com o lock adquirido)
+
+    def _anexar_posicao(self, pergunta):
+        # A pergunta vai para o fim da lista: na numeração antiga, depois de todas as excluídas
+        self._posicoes[pergunta.get('id')] = self._total + len(self._excluidas)
+
+    def _excluir_posicao(self, pergunta):
+        gravada = self._posicoes.pop(pergunta.get('id'), None)
+        if gravada is None:
+            return
+        bisect.insort(self._excluidas, gravada)
+        if len(self._excluidas) > LIMITE_EXCLUSOES_POSICOES:
+            ordem = sorted(self._posicoes, key=self._posicoes.__getitem__)
+            self._posicoes = {id_pergunta: i for i, id_pergunta in enumerate(ordem)}
+            self._excluidas = []
+
+    def posicao(self, id_pergunta):
+        """Posição atual da pergunta na lista do banco (None se o id não está no índice)"""
+        with self._lock:
+            gravada = self._posicoes.get(id_pergunta)
+            if gravada is None:
+                return None
+            return gravada - bisect.bisect_left(self._excluidas, gravada)
+
+    # Visões ordenadas já calculadas (chamados com o lock adquirido)
+
+    def _visoes_afetadas(self, pergunta):
+        periodo, disciplina = chave_pergunta(pergunta)
+        for (periodo_visao, disciplina_visao, ordem), visao in self._visoes.items():
+            if periodo_visao is not None and periodo_visao != periodo:
+                continue
+            if disciplina_visao is not None and disciplina_visao != disciplina:
+                continue
+            yield ordem, visao
+
+    def _incluir_nas_visoes(self, pergunta):
+        for ordem, (chaves, perguntas) in self._visoes_afetadas(pergunta):
+            chave = ORDENACOES[ordem](pergunta)
+            i = bisect.bisect_right(chaves, chave)
+            chaves.insert(i, chave)
+            perguntas.insert(i, pergunta)
+
+    def _excluir_das_visoes(self, pergunta):
+        for ordem, (chaves, perguntas) in self._visoes_afetadas(pergunta):
+            chave = ORDENACOES[ordem](pergunta)
+            i = bisect.bisect_left(chaves, chave)
+            while i < len(chaves) and chaves[i] == chave:
+                if perguntas[i] is pergunta:
+                    del chaves[i]
+                    del perguntas[i]
+                    break
+                i += 1
+
+    def adicionar(self, pergunta):
+        """Adiciona uma pergunta ao índice (no fim da lista do banco)"""
+        with self._lock:
+            self._anexar_posicao(pergunta)
+            self._adicionar(pergunta)
+
+    def remover(self, pergunta):
+        """Remove uma pergunta do índice (comparação por identidade)"""
+        with self._lock:
+            if not self._remover(pergunta):
+                return False
+            self._excluir_posicao(pergunta)
+            return True
+
+    def _adicionar(self, pergunta):
+        chave = chave_pergunta(pergunta)
+        grupo = self._grupos.setdefault(chave, {'professor': [], 'oficial': []})
+        grupo[fonte_pergunta(pergunta)].append(pergunta)
+        self._contabilizar(chave, 1)
+        self._incluir_nas_visoes(pergunta)
+
+    def _remover(self, pergunta):
+        chave = chave_pergunta(pergunta)
+        grupo = self._grupos.get(chave)
+        if not grupo:
+            return False
+        lista = grupo[fonte_pergunta(pergunta)]
+        for i, existente in enumerate(lista):
+            if existente is pergunta:
+                # Troca com o último elemento para remover em O(1)
+                lista[i] = lista[-1]
+                lista.pop()
+                if not grupo['professor'] and not grupo['oficial']:
+                    del self._grupos[chave]
+                self._contabilizar(chave, -1)
+                self._excluir_das_visoes(pergunta)
+                return True
+        return False
+
+    def remover_varios(self, perguntas):
+        """Remove várias perguntas de uma vez, filtrando cada grupo afetado uma única vez"""
+        por_chave = {}
+        for pergunta in perguntas:
+            por_chave.setdefault(chave_pergunta(pergunta), {})[id(pergunta)] = pergunta
+        with self._lock:
+            removidas = set()
+            for chave, por_identidade in por_chave.items():
+                grupo = self._grupos.get(chave)
+                if not grupo:
+                    continue
+                antes = len(grupo['professor']) + len(grupo['oficial'])
+                for fonte in ('professor', 'oficial'):
+                    mantidas = []
+                    for p in grupo[fonte]:
+                        if id(p) in por_identidade:
+                            removidas.add(id(p))
+                            self._excluir_posicao(p)
+                        else:
+                            mantidas.append(p)
+                    grupo[fonte] = mantidas
+                self._contabilizar(chave, len(grupo['professor']) + len(grupo['oficial']) - antes)
+                if not grupo['professor'] and not grupo['oficial']:
+                    del self._grupos[chave]
+            if removidas:
+                # Uma passada por visão, sem reordenar
+                for chaves, lista in self._visoes.values():
+                    itens = [(c, p) for c, p in zip(chaves, lista) if id(p) not in removidas]
+                    if len(itens) != len(lista):
+                        chaves[:] = [c for c, _ in itens]
+                        lista[:] = [p for _, p in itens]
+
+    def substituir(self, antiga, nova):
+        """Substitui uma pergunta editada, movendo-a de grupo se necessário (a posição no banco é mantida)"""
+        with self._lock:
+            self._remover(antiga)
+            self._adicionar(nova)
+            gravada = self._posicoes.pop(antiga.get('id'), None)
+            if gravada is not None:
+                self._posicoes[nova.get('id')] = gravada
+
+    def _grupo(self, periodo, disciplina):
+        return self._grupos.get((normalizar_periodo(periodo), normalizar_disciplina(disciplina)))
+
+    def contagens(self, periodo, disciplina):
+        """Retorna (total_professor, total_oficial) de um período/disciplina"""
+        with self._lock:
+            return self._contagens(periodo, disciplina)
+
+    def _contagens(self, periodo, disciplina):
+        grupo = self._grupo(periodo, disciplina)
+        if not grupo:
+            return 0, 0
+        return len(grupo['professor']), len(grupo['oficial'])
+
+    def sortear(self, periodo, disciplina, qtd_professor, qtd_oficial):
+        """Sorteia perguntas do grupo sem varrer o banco (custo proporcional ao sorteio)"""
+        with self._lock:
+            grupo = self._grupo(periodo, disciplina)
+            if not grupo:
+                return []
+            professor = grupo['professor']
+            oficiais = grupo['oficial']
+            selecionadas = random.sample(professor, min(qtd_professor, len(professor)))
+            selecionadas.extend(random.sample(oficiais, min(qtd_oficial, len(oficiais))))
+        return selecionadas
+
+    def total(self, periodo=None, disciplina=None):
+        """Total de perguntas do filtro, a partir dos contadores mantidos pelo índice"""
+        with self._lock:
+            return self._total_filtro(periodo, disciplina)
+
+    def _total_filtro(self, periodo, disciplina):
+        if periodo not in (None, '') and disciplina:
+            return sum(self._contagens(periodo, disciplina))
+        if periodo not in (None, ''):
+            return self._por_periodo.get(normalizar_periodo(periodo), 0)
+        if disciplina:
+            return self._por_disciplina.get(normalizar_disciplina(disciplina), 0)
+        return self._total
+
+    def _visao(self, periodo, disciplina, ordem):
+        """Lista ordenada (chaves, perguntas) do filtro; calculada uma vez e mantida a cada alteração"""
+        periodo = normalizar_periodo(periodo) if periodo not in (None, '') else None
+        disciplina = normalizar_disciplina(disciplina) if disciplina else None
+        chave_visao = (periodo, disciplina, ordem)
+        visao = self._visoes.get(chave_visao)
+        if visao is None:
+            perguntas = []
+            for (periodo_grupo, disciplina_grupo), grupo in self._grupos.items():
+                if periodo is not None and periodo_grupo != periodo:
+                    continue
+                if disciplina is not None and disciplina_grupo != disciplina:
+                    continue
+                perguntas.extend(grupo['professor'])
+                perguntas.extend(grupo['oficial'])
+            chave_ordenacao = ORDENACOES[ordem]
+            itens = sorted(((chave_ordenacao(p), p) for p in perguntas), key=lambda item: item[0])
+            visao = ([chave for chave, _ in itens], [p for _, p in itens])
+            self._visoes[chave_visao] = visao
+        return visao
+
+    def pagina(self, periodo=None, disciplina=None, ordem='id', descendente=False, apos=None, limite=20):
+        """Página por cursor (keyset): até `limite` perguntas depois da chave `apos`.
+
+        Retorna (perguntas, total, chave_da_ultima) — a chave da última
+        pergunta é o cursor da próxima página (None quando não há mais).
+        """
+        if ordem not in ORDENACOES:
+            raise ValueError(f'Ordenação inválida: {ordem}')
+        with self._lock:
+            # As visões são atualizadas no lugar: o recorte é feito sob o lock
+            chaves, perguntas = self._visao(periodo, disciplina, ordem)
+            total = self._total_filtro(periodo, disciplina)
+            if apos is not None and chaves and (
+                len(apos) != len(chaves[0]) or any(type(a) is not type(b) for a, b in zip(apos, chaves[0]))
+            ):
+                raise ValueError('Cursor não corresponde à ordenação')
+            if descendente:
+                fim = len(chaves) if apos is None else bisect.bisect_left(chaves, apos)
+                inicio = max(fim - limite, 0)
+                selecionadas = perguntas[inicio:fim][::-1]
+                ultima = chaves[inicio] if inicio > 0 and selecionadas else None
+            else:
+                inicio = 0 if apos is None else bisect.bisect_right(chaves, apos)
+                fim = min(inicio + limite, len(chaves))
+                selecionadas = perguntas[inicio:fim]
+                ultima = chaves[fim - 1] if fim < len(chaves) and selecionadas else None
+        return selecionadas, total, ultima
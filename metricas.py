@@ -0,0 +1,208 @@
+"""
+Métricas do processo no formato de texto do Prometheus (rota /metrics).
+
+Contadores e histogramas simples em memória, sem dependências externas. O
+custo de uma observação é uma busca binária nos limites dos buckets e um
+incremento sob um lock, então o registro pode ficar no caminho de toda
+requisição (inclusive /responder).
+
+As métricas são do processo: com vários workers do gunicorn cada coleta
+mostra os valores do worker que atendeu a requisição (process_start_time_seconds
+identifica o worker).
+"""
+
+import bisect
+import gc
+import math
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Limites (segundos) dos buckets de latência das rotas
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_inicio_processo = time.time()
+
+
+def _reiniciar_inicio_processo():
+    global _inicio_processo
+    _inicio_processo = time.time()
+
+
+# Com o preload do gunicorn o módulo é importado no mestre: cada worker marca o próprio início
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_inicio_processo)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_numero(valor):
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return '+Inf' if valor > 0 else '-Inf'
+        return repr(valor)
+    return str(valor)
+
+
+def _linha(nome, rotulos, valor):
+    if rotulos:
+        texto = ','.join(f'{chave}="{_escapar(v)}"' for chave, v in rotulos)
+        return f'{nome}{{{texto}}} {_formatar_numero(valor)}'
+    return f'{nome} {_formatar_numero(valor)}'
+
+
+class Contador:
+    """Contador monotônico, opcionalmente com rótulos"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, quantidade=1):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + quantidade
+
+    def linhas(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        if not valores and not self.rotulos:
+            valores = [((), 0)]
+        for valores_rotulos, valor in valores:
+            yield _linha(self.nome, list(zip(self.rotulos, valores_rotulos)), valor)
+
+
+class Histograma:
+    """Histograma com buckets fixos, opcionalmente com rótulos"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: [contagens por bucket (não acumuladas, a última é +Inf), soma]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+
+    def linhas(self):
+        with self._lock:
+            series = sorted((rotulos, list(contagens), soma) for rotulos, (contagens, soma) in self._series.items())
+        for valores_rotulos, contagens, soma in series:
+            rotulos = list(zip(self.rotulos, valores_rotulos))
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (math.inf,), contagens):
+                acumulado += contagem
+                yield _linha(f'{self.nome}_bucket', rotulos + [('le', _formatar_numero(float(limite)))], acumulado)
+            yield _linha(f'{self.nome}_sum', rotulos, soma)
+            yield _linha(f'{self.nome}_count', rotulos, acumulado)
+
+
+class RegistroMetricas:
+    """Conjunto das métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def contador(self, nome, descricao, rotulos=()):
+        metrica = Contador(nome, descricao, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome, descricao, rotulos=(), buckets=BUCKETS_LATENCIA):
+        metrica = Histograma(nome, descricao, rotulos, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        """Registra uma função chamada a cada coleta.
+
+        Ela devolve uma lista de (nome, tipo, descrição, [(rótulos, valor)]),
+        com os rótulos como lista de pares (nome, valor).
+        """
+        self._coletores.append(funcao)
+        return funcao
+
+    def exposicao(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f'# HELP {metrica.nome} {metrica.descricao}')
+            linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+            linhas.extend(metrica.linhas())
+        for coletor in self._coletores:
+            for nome, tipo, descricao, amostras in coletor():
+                linhas.append(f'# HELP {nome} {descricao}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                linhas.extend(_linha(nome, rotulos, valor) for rotulos, valor in amostras)
+        return '\n'.join(linhas) + '\n'
+
+
+def _memoria_residente():
+    """RSS atual em bytes (Linux); nos demais sistemas, o pico informado pelo getrusage"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return pico if os.uname().sysname == 'Darwin' else pico * 1024
+
+
+def metricas_processo():
+    """Memória, CPU, arquivos abertos e coletor de lixo do processo"""
+    metricas = []
+    rss = _memoria_residente()
+    if rss is not None:
+        metricas.append(('process_resident_memory_bytes', 'gauge', 'Memória residente do processo em bytes.', [([], rss)]))
+    if resource is not None:
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+        metricas.append(('process_cpu_seconds_total', 'counter', 'Tempo de CPU (usuário + sistema) do processo em segundos.',
+                         [([], uso.ru_utime + uso.ru_stime)]))
+    try:
+        metricas.append(('process_open_fds', 'gauge', 'Descritores de arquivo abertos.', [([], len(os.listdir('/proc/self/fd')))]))
+    except OSError:
+        pass
+    metricas.append(('process_start_time_seconds', 'gauge', 'Início do processo (segundos desde a época Unix).',
+                     [([], _inicio_processo)]))
+    metricas.append(('python_threads', 'gauge', 'Threads ativas no processo.', [([], threading.active_count())]))
+
+    estatisticas = gc.get_stats()
+    geracoes = [str(geracao) for geracao in range(len(estatisticas))]
+    metricas.append(('python_gc_collections_total', 'counter', 'Coletas do coletor de lixo por geração.',
+                     [([('generation', g)], e['collections']) for g, e in zip(geracoes, estatisticas)]))
+    metricas.append(('python_gc_objects_collected_total', 'counter', 'Objetos coletados pelo coletor de lixo por geração.',
+                     [([('generation', g)], e['collected']) for g, e in zip(geracoes, estatisticas)]))
+    metricas.append(('python_gc_objects_uncollectable_total', 'counter', 'Objetos não coletáveis encontrados por geração.',
+                     [([('generation', g)], e['uncollectable']) for g, e in zip(geracoes, estatisticas)]))
+    metricas.append(('python_gc_objects_tracked', 'gauge', 'Objetos rastreados aguardando coleta por geração.',
+                     [([('generation', g)], contagem) for g, contagem in zip(geracoes, gc.get_count())]))
+    if hasattr(gc, 'get_freeze_count'):
+        metricas.append(('python_gc_objects_frozen', 'gauge', 'Objetos na geração permanente (gc.freeze).',
+                         [([], gc.get_freeze_count())]))
+    return metricas
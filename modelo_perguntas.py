@@ -0,0 +1,225 @@
+"""
+Registros imutáveis de perguntas e apresentação embaralhada por sessão.
+
+As perguntas carregadas nos bancos são compartilhadas por todas as sessões
+de quiz, então nunca devem ser alteradas no lugar. Cada sessão guarda apenas
+uma ApresentacaoPergunta: a referência ao registro original e a permutação
+dos índices das opções.
+
+Cada pergunta recebe um identificador estável (campo 'id'). Quando o JSON
+não traz o campo, o id é derivado do conteúdo, de modo que todos os workers
+calculam o mesmo id para a mesma pergunta e as sessões podem guardar apenas
+(id, permutação).
+"""
+
+import hashlib
+import json
+import random
+import threading
+import weakref
+from collections import deque
+
+# Registros mantidos vivos pelo registro mesmo depois de saírem dos bancos
+# (os mais recentes), para sessões de quiz em andamento
+LIMITE_RETIDOS = 50_000
+
+
+class PerguntaCongelada(dict):
+    """Dicionário somente leitura usado como registro de pergunta nos bancos"""
+
+    # Só a referência fraca: o RegistroPerguntas não prende registros antigos
+    __slots__ = ('__weakref__',)
+
+    def __init__(self, dados=(), **kwargs):
+        super().__init__(dados, **kwargs)
+        opcoes = dict.get(self, 'opcoes')
+        if isinstance(opcoes, list):
+            dict.__setitem__(self, 'opcoes', tuple(opcoes))
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError('Registros de pergunta são imutáveis; crie um novo registro')
+
+    __setitem__ = _somente_leitura
+    __delitem__ = _somente_leitura
+    __ior__ = _somente_leitura
+    clear = _somente_leitura
+    pop = _somente_leitura
+    popitem = _somente_leitura
+    setdefault = _somente_leitura
+    update = _somente_leitura
+
+    def __reduce__(self):
+        return (PerguntaCongelada, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def congelar(pergunta):
+    """Retorna a pergunta como registro imutável (sem copiar se já for)"""
+    if isinstance(pergunta, PerguntaCongelada):
+        return pergunta
+    return PerguntaCongelada(pergunta)
+
+
+def congelar_lista(perguntas):
+    """Congela todas as perguntas de uma lista"""
+    return [congelar(p) for p in perguntas]
+
+
+def gerar_id_pergunta(pergunta, prefixo):
+    """Id determinístico derivado do conteúdo da pergunta"""
+    conteudo = json.dumps([
+        pergunta.get('periodo'),
+        pergunta.get('disciplina'),
+        pergunta.get('topico'),
+        pergunta.get('pergunta'),
+        list(pergunta.get('opcoes') or []),
+    ], ensure_ascii=False)
+    return prefixo + hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:12]
+
+
+class RegistroPerguntas:
+    """Mapa id -> registro das perguntas carregadas nos bancos.
+
+    O mapa guarda referências fracas: um registro vive enquanto algum banco
+    (ou requisição) o usa, mais os LIMITE_RETIDOS registrados por último, que
+    continuam resolvíveis por id para as sessões de quiz em andamento mesmo
+    depois de removidos ou editados. Recarregar um banco sem mudanças
+    reaproveita os registros já existentes, então recargas não acumulam cópias.
+    """
+
+    def __init__(self, limite_retidos=LIMITE_RETIDOS):
+        self._lock = threading.Lock()
+        self._por_id = weakref.WeakValueDictionary()
+        self._retidos = deque(maxlen=limite_retidos)
+
+    def congelar(self, pergunta, prefixo, usados=None):
+        """Congela a pergunta, garante um id único e a registra.
+
+        usados: ids já atribuídos no mesmo lote de carga; sem ele, a unicidade
+        é verificada contra todo o registro (inclusão de pergunta nova).
+        """
+        registro = congelar(pergunta)
+        id_pergunta = registro.get('id')
+        with self._lock:
+            # Um id explícito repetido no mesmo lote (pergunta copiada com o
+            # campo 'id') também recebe sufixo: o id precisa ser único no banco
+            if not id_pergunta or (usados is not None and id_pergunta in usados):
+                base = id_pergunta or gerar_id_pergunta(registro, prefixo)
+                existentes = self._por_id if usados is None else usados
+                id_pergunta = base
+                sufixo = 2
+                while id_pergunta in existentes:
+                    id_pergunta = f'{base}-{sufixo}'
+                    sufixo += 1
+                registro = PerguntaCongelada(registro, id=id_pergunta)
+            if usados is not None:
+                usados.add(id_pergunta)
+            existente = self._por_id.get(id_pergunta)
+            if existente is not None and existente == registro:
+                return existente
+            self._por_id[id_pergunta] = registro
+            self._retidos.append(registro)
+        return registro
+
+    def congelar_lista(self, perguntas, prefixo):
+        """Congela e registra um lote de perguntas (ids únicos dentro do lote)"""
+        usados = set()
+        return [self.congelar(p, prefixo, usados) for p in perguntas]
+
+    def congelar_edicao(self, dados, antiga, prefixo):
+        """Congela a versão editada de uma pergunta mantendo o id da original"""
+        if antiga is not None and antiga.get('id'):
+            dados = dict(dados, id=antiga['id'])
+        return self.congelar(dados, prefixo)
+
+    def obter(self, id_pergunta):
+        return self._por_id.get(id_pergunta)
+
+
+class ApresentacaoPergunta:
+    """Pergunta como vista por uma sessão: registro compartilhado + permutação das opções"""
+
+    __slots__ = ('registro', 'permutacao')
+
+    def __init__(self, registro, permutacao):
+        self.registro = registro
+        self.permutacao = tuple(permutacao)
+
+    @classmethod
+    def embaralhada(cls, registro):
+        """Cria uma apresentação com as opções em ordem aleatória"""
+        permutacao = list(range(len(registro.get('opcoes') or ())))
+        random.shuffle(permutacao)
+        return cls(registro, permutacao)
+
+    @classmethod
+    def da_sessao(cls, item, registro_perguntas):
+        """Reconstrói a apresentação a partir do formato gravado na sessão.
+
+        Sessões antigas guardavam a pergunta completa (dict); nesse caso o
+        dict é devolvido como está.
+        """
+        if isinstance(item, (cls, dict)):
+            return item
+        id_pergunta, permutacao = item
+        registro = registro_perguntas.obter(id_pergunta)
+        if registro is None:
+            registro = PerguntaCongelada({
+                'id': id_pergunta,
+                'pergunta': 'Esta pergunta foi removida do banco.',
+                'opcoes': [],
+                'resposta_correta': ''
+            })
+        total_opcoes = len(registro.get('opcoes') or ())
+        if sorted(permutacao) != list(range(total_opcoes)):
+            # As opções mudaram desde o início do quiz: usa a ordem original
+            permutacao = range(total_opcoes)
+        return cls(registro, permutacao)
+
+    def para_sessao(self):
+        """Formato compacto gravado na sessão: [id, permutação]"""
+        return [self.registro.get('id'), list(self.permutacao)]
+
+    @property
+    def opcoes(self):
+        opcoes = self.registro.get('opcoes') or ()
+        return [opcoes[i] for i in self.permutacao]
+
+    @property
+    def resposta_correta(self):
+        return self.registro.get('resposta_correta')
+
+    @property
+    def indice_resposta_correta(self):
+        try:
+            return self.opcoes.index(self.resposta_correta)
+        except ValueError:
+            return None
+
+    def __getitem__(self, chave):
+        if chave == 'opcoes':
+            return self.opcoes
+        if chave == 'indice_resposta_correta':
+            return self.indice_resposta_correta
+        return self.registro[chave]
+
+    def __contains__(self, chave):
+        return chave == 'indice_resposta_correta' or chave in self.registro
+
+    def get(self, chave, padrao=None):
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def para_dict(self):
+        """Materializa a pergunta como vista na sessão (para serialização)"""
+        dados = dict(self.registro)
+        dados['opcoes'] = self.opcoes
+        dados['indice_resposta_correta'] = self.indice_resposta_correta
+        return dados
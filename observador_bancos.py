@@ -0,0 +1,87 @@
+"""
+Recarga automática dos bancos de perguntas alterados fora do processo.
+
+O sincronizar_perguntas.py e os outros workers (via painel admin) regravam os
+arquivos JSON dos bancos. O observador verifica periodicamente o mtime e o
+tamanho desses arquivos e, quando algum muda, chama a função de recarga na
+própria thread do observador. A recarga monta os novos bancos e índices por
+completo antes de trocá-los, então as requisições nunca esperam pela leitura
+do JSON nem veem um banco pela metade.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from threads_processo import ThreadPorProcesso
+
+logger = logging.getLogger(__name__)
+
+
+def estado_arquivo(caminho):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existir"""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+
+class ObservadorBancos:
+    """Thread em segundo plano que detecta alterações nos arquivos dos bancos.
+
+    listar_arquivos: função que retorna os caminhos observados (chamada a cada
+    verificação, para perceber arquivos novos ou removidos).
+    ao_mudar: função chamada com o conjunto de caminhos alterados.
+
+    Cada worker do gunicorn verifica os arquivos por conta própria.
+    """
+
+    def __init__(self, listar_arquivos, ao_mudar, intervalo=5):
+        self.listar_arquivos = listar_arquivos
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self._estados = {}
+        self._estados_lock = threading.Lock()
+        self._thread = ThreadPorProcesso(self._executar, 'observador-bancos')
+
+    def marcar_atual(self, caminho=None):
+        """Registra o estado atual dos arquivos como já carregado.
+
+        Chamado na carga inicial e depois que o próprio processo grava um
+        banco, para que a gravação não dispare uma recarga desnecessária.
+        """
+        with self._estados_lock:
+            if caminho is None:
+                self._estados = {c: estado_arquivo(c) for c in self.listar_arquivos()}
+            else:
+                self._estados[caminho] = estado_arquivo(caminho)
+
+    def verificar(self):
+        """Compara o estado dos arquivos com o último carregado e recarrega se preciso"""
+        atuais = {c: estado_arquivo(c) for c in self.listar_arquivos()}
+        with self._estados_lock:
+            alterados = {
+                c for c in set(atuais) | set(self._estados)
+                if atuais.get(c) != self._estados.get(c)
+            }
+            if not alterados:
+                return set()
+            self._estados = atuais
+        logger.info(f"Bancos alterados em disco, recarregando: {sorted(alterados)}")
+        self.ao_mudar(alterados)
+        return alterados
+
+    def iniciar(self):
+        if not self.intervalo:
+            return
+        self._thread.iniciar()
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.verificar()
+            except Exception as e:
+                logger.error(f"Erro ao recarregar bancos alterados: {e}")
@@ -0,0 +1,132 @@
+"""
+Restauração em lote dos backups do banco principal.
+
+Restaurar backup por backup removia a disciplina/período do banco inteiro e
+acrescentava as perguntas do backup, uma varredura completa por backup
+(O(backups x perguntas)). Aqui os backups são agrupados por (disciplina,
+período) e só o mais recente de cada grupo é usado; o resultado final é
+calculado em uma única passada pelo banco e pelas perguntas dos backups.
+
+Um backup da disciplina inteira (sem período) e um de um período da mesma
+disciplina se sobrepõem: vale o mais recente para as perguntas em comum,
+como se tivessem sido restaurados em ordem cronológica.
+"""
+
+import hashlib
+from collections import Counter
+
+
+def chave_backup(backup):
+    """(disciplina, período ou None) restaurados pelo backup"""
+    periodo = backup.get('periodo')
+    return backup.get('disciplina'), (int(periodo) if periodo else None)
+
+
+def descrever_chave(chave):
+    disciplina, periodo = chave
+    return f"{disciplina}{' - Período ' + str(periodo) if periodo else ''}"
+
+
+def selecionar_backups(backups):
+    """Mantém só o backup mais recente de cada (disciplina, período).
+
+    `backups` são os dicts da listagem (filename, disciplina, periodo,
+    timestamp). Retorna (selecionados do mais antigo para o mais recente,
+    nomes dos backups ignorados: inválidos ou com um mais novo da mesma chave).
+    """
+    mais_recentes = {}
+    ignorados = []
+    for backup in backups:
+        try:
+            chave = chave_backup(backup)
+        except ValueError:
+            chave = (None, None)
+        if not chave[0]:
+            ignorados.append(backup['filename'])
+            continue
+        atual = mais_recentes.get(chave)
+        ordem = (backup.get('timestamp', ''), backup['filename'])
+        if atual is None or ordem > (atual.get('timestamp', ''), atual['filename']):
+            if atual is not None:
+                ignorados.append(atual['filename'])
+            mais_recentes[chave] = backup
+        else:
+            ignorados.append(backup['filename'])
+    selecionados = sorted(mais_recentes.values(), key=lambda b: (b.get('timestamp', ''), b['filename']))
+    return selecionados, ignorados
+
+
+def _assinatura(pergunta):
+    texto = ' '.join(str(pergunta.get('pergunta') or '').split()).lower()
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest()
+
+
+class PlanoRestauracao:
+    """Resultado de restaurar `restauracoes` sobre `perguntas`, calculado em uma passada.
+
+    `restauracoes` é uma lista de (backup, perguntas do backup) em ordem
+    cronológica, como devolvida por selecionar_backups. Após a construção:
+      mantidas    perguntas atuais que nenhum backup substitui (na ordem atual)
+      removidas   perguntas atuais substituídas por algum backup
+      adicionadas perguntas dos backups que entram no banco
+    """
+
+    def __init__(self, perguntas, restauracoes):
+        self.restauracoes = restauracoes
+        self._disciplinas = {}
+        self._periodos = {}
+        for ordem, (backup, _) in enumerate(restauracoes):
+            disciplina, periodo = chave_backup(backup)
+            if periodo is None:
+                self._disciplinas[disciplina] = ordem
+            else:
+                self._periodos[(disciplina, periodo)] = ordem
+
+        self.mantidas, self.removidas, self.adicionadas = [], [], []
+        self._removidas_por_backup = [[] for _ in restauracoes]
+        self._adicionadas_por_backup = [[] for _ in restauracoes]
+        for pergunta in perguntas:
+            ordem = self._cobertura(pergunta)
+            if ordem < 0:
+                self.mantidas.append(pergunta)
+            else:
+                self.removidas.append(pergunta)
+                self._removidas_por_backup[ordem].append(pergunta)
+        for ordem, (_, dados) in enumerate(restauracoes):
+            for pergunta in dados:
+                # Um backup mais novo que cubra a pergunta a substitui
+                if self._cobertura(pergunta) <= ordem:
+                    self.adicionadas.append(pergunta)
+                    self._adicionadas_por_backup[ordem].append(pergunta)
+
+    def _cobertura(self, pergunta):
+        """Posição do último backup que restaura a disciplina/período da pergunta (-1 se nenhum)"""
+        disciplina = pergunta.get('disciplina')
+        return max(
+            self._disciplinas.get(disciplina, -1),
+            self._periodos.get((disciplina, pergunta.get('periodo')), -1),
+        )
+
+    def resultado(self):
+        """Banco após a restauração: perguntas mantidas seguidas das restauradas"""
+        return self.mantidas + self.adicionadas
+
+    def resumo(self):
+        """Diferença por backup aplicado: perguntas atuais x do backup, comparadas pelo enunciado"""
+        resumo = []
+        for ordem, (backup, _) in enumerate(self.restauracoes):
+            # Contagens por enunciado: o banco pode ter enunciados repetidos
+            atuais = Counter(_assinatura(p) for p in self._removidas_por_backup[ordem])
+            restauradas = Counter(_assinatura(p) for p in self._adicionadas_por_backup[ordem])
+            resumo.append({
+                'filename': backup['filename'],
+                'disciplina': backup.get('disciplina'),
+                'periodo': backup.get('periodo'),
+                'timestamp': backup.get('timestamp'),
+                'perguntas_atuais': len(self._removidas_por_backup[ordem]),
+                'perguntas_backup': len(self._adicionadas_por_backup[ordem]),
+                'novas': sum((restauradas - atuais).values()),
+                'excluidas': sum((atuais - restauradas).values()),
+                'inalteradas': sum((atuais & restauradas).values()),
+            })
+        return resumo
@@ -0,0 +1,594 @@
+"""
+Armazenamento das sessões de quiz.
+
+As rotas do quiz não guardam mais o estado em variáveis globais do processo:
+tudo passa por um SessionStore, o que permite rodar vários workers do
+gunicorn (ou várias instâncias) sem sticky sessions, desde que o backend
+escolhido seja compartilhado entre eles.
+
+Backends disponíveis (QUIZ_SESSION_STORE):
+- 'memoria': dicionário LRU em memória (apenas um processo)
+- 'arquivo': um JSON por sessão em data/sessoes (padrão)
+- 'sqlite':  tabela em um arquivo SQLite em modo WAL
+
+Cada sessão é um snapshot (gravado no início do quiz) mais um log de eventos
+somente-acréscimo (resposta enviada, quiz finalizado). Responder uma pergunta
+custa um único append pequeno; a leitura reaplica os eventos sobre o
+snapshot, e o log é compactado de tempos em tempos.
+
+Sessões sem atividade há mais de QUIZ_SESSION_TTL segundos expiram: a leitura
+já as ignora e o ColetorSessoes as apaga periodicamente em segundo plano.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from modelo_perguntas import ApresentacaoPergunta
+from threads_processo import ThreadPorProcesso
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def session_id_valido(session_id):
+    """Evita que o identificador da sessão seja usado para acessar outros arquivos"""
+    return bool(session_id) and bool(_SESSION_ID_VALIDO.match(session_id))
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, ApresentacaoPergunta):
+        return valor.para_sessao()
+    return str(valor)
+
+
+def serializar_sessao(dados):
+    """Converte os dados da sessão em JSON (datas viram texto ISO)"""
+    return json.dumps(dados, ensure_ascii=False, default=_serializar_valor)
+
+
+def desserializar_sessao(texto):
+    return json.loads(texto)
+
+
+def criar_evento(tipo, definir=None, acrescentar=None, compactar=False):
+    """Cria um evento de sessão.
+
+    definir: campos substituídos no estado da sessão
+    acrescentar: listas do estado que recebem novos itens ao final
+    compactar: pede a compactação do log logo após gravar o evento
+    """
+    evento = {'tipo': tipo, 'em': time.time()}
+    if definir:
+        evento['definir'] = definir
+    if acrescentar:
+        evento['acrescentar'] = acrescentar
+    if compactar:
+        evento['compactar'] = True
+    return evento
+
+
+def aplicar_evento(dados, evento):
+    """Aplica um evento ao estado da sessão (no lugar) e o retorna"""
+    for campo, valor in (evento.get('definir') or {}).items():
+        dados[campo] = valor
+    for campo, itens in (evento.get('acrescentar') or {}).items():
+        dados.setdefault(campo, []).extend(itens)
+    return dados
+
+
+class SessionStore(ABC):
+    """Interface comum dos backends de sessão"""
+
+    backend = 'base'
+
+    def __init__(self, ttl=None):
+        # ttl em segundos desde a última atividade; None/0 desativa a expiração
+        self.ttl = ttl or None
+        self._lock_metricas = threading.Lock()
+        self._metricas = {'expiradas': 0, 'despejadas': 0, 'ultima_coleta': None}
+
+    def _contar(self, metrica, quantidade=1):
+        if quantidade:
+            with self._lock_metricas:
+                self._metricas[metrica] += quantidade
+
+    def _expirada(self, ultima_atividade, agora=None):
+        if not self.ttl:
+            return False
+        return ultima_atividade < (agora or time.time()) - self.ttl
+
+    @abstractmethod
+    def get(self, session_id):
+        """Retorna os dados da sessão ou None"""
+
+    @abstractmethod
+    def save(self, session_id, dados):
+        """Grava (cria ou substitui) os dados da sessão"""
+
+    @abstractmethod
+    def delete(self, session_id):
+        """Remove a sessão, se existir"""
+
+    def append_event(self, session_id, dados, evento):
+        """Aplica o evento aos dados já carregados da sessão e o persiste.
+
+        A implementação padrão regrava a sessão inteira; os backends
+        persistentes gravam apenas o evento.
+        """
+        aplicar_evento(dados, evento)
+        self.save(session_id, dados)
+        return dados
+
+    @abstractmethod
+    def expirar(self):
+        """Apaga as sessões expiradas e retorna quantas foram removidas"""
+
+    @abstractmethod
+    def contar_ativas(self):
+        """Número de sessões ativas"""
+
+    def coletar(self):
+        """Executa uma coleta de sessões expiradas registrando as métricas"""
+        removidas = self.expirar() if self.ttl else 0
+        self._contar('expiradas', removidas)
+        with self._lock_metricas:
+            self._metricas['ultima_coleta'] = time.time()
+        return removidas
+
+    def estatisticas(self):
+        """Métricas das sessões (ativas, expiradas e despejadas por capacidade)"""
+        with self._lock_metricas:
+            metricas = dict(self._metricas)
+        metricas['backend'] = self.backend
+        metricas['ttl_segundos'] = self.ttl
+        metricas['ativas'] = self.contar_ativas()
+        return metricas
+
+
+class MemorySessionStore(SessionStore):
+    """Sessões em memória com descarte das menos usadas (LRU)"""
+
+    backend = 'memoria'
+
+    def __init__(self, capacidade=10000, ttl=None):
+        super().__init__(ttl)
+        self.capacidade = capacidade
+        # session_id -> (dados, última atividade), em ordem de uso
+        self._sessoes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            item = self._sessoes.get(session_id)
+            if item is None:
+                return None
+            if self._expirada(item[1]):
+                del self._sessoes[session_id]
+                self._contar('expiradas')
+                return None
+            self._sessoes[session_id] = (item[0], time.time())
+            self._sessoes.move_to_end(session_id)
+            return item[0]
+
+    def save(self, session_id, dados):
+        with self._lock:
+            self._sessoes[session_id] = (dados, time.time())
+            self._sessoes.move_to_end(session_id)
+            despejadas = 0
+            while len(self._sessoes) > self.capacidade:
+                self._sessoes.popitem(last=False)
+                despejadas += 1
+        self._contar('despejadas', despejadas)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessoes.pop(session_id, None)
+
+    def expirar(self):
+        # A ordem LRU coincide com a ordem de última atividade: basta olhar o início
+        removidas = 0
+        agora = time.time()
+        with self._lock:
+            while self._sessoes:
+                session_id, (_, ultima_atividade) = next(iter(self._sessoes.items()))
+                if not self._expirada(ultima_atividade, agora):
+                    break
+                del self._sessoes[session_id]
+                removidas += 1
+        return removidas
+
+    def contar_ativas(self):
+        return len(self._sessoes)
+
+    def __len__(self):
+        return len(self._sessoes)
+
+
+class FileSessionStore(SessionStore):
+    """Um snapshot JSON + um log NDJSON por sessão (compartilhado por workers do mesmo host).
+
+    Leituras e acréscimos ao log seguram um flock compartilhado em
+    <sessão>.lock; a compactação e a gravação do snapshot seguram o flock
+    exclusivo, então um evento acrescentado por outro worker nunca cai entre
+    a leitura do log e a sua remoção.
+    """
+
+    backend = 'arquivo'
+
+    def __init__(self, diretorio, log_max_bytes=32 * 1024, ttl=None):
+        super().__init__(ttl)
+        self._ativas = None
+        self.diretorio = diretorio
+        self.log_max_bytes = log_max_bytes
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, session_id):
+        return os.path.join(self.diretorio, f'{session_id}.json')
+
+    def _caminho_log(self, session_id):
+        return os.path.join(self.diretorio, f'{session_id}.log')
+
+    def _caminho_lock(self, session_id):
+        return os.path.join(self.diretorio, f'{session_id}.lock')
+
+    @contextmanager
+    def _travado(self, session_id, exclusivo):
+        """flock da sessão, entre threads e processos (cada uso abre o seu descritor).
+
+        O coletor apaga o .lock de uma sessão expirada com o lock exclusivo
+        na mão; quem estava esperando por ele fica com o arquivo apagado, então
+        confere se o arquivo travado ainda é o do caminho e, se não, tenta de novo.
+        """
+        if fcntl is None:
+            yield
+            return
+        caminho = self._caminho_lock(session_id)
+        while True:
+            f = open(caminho, 'a')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+                try:
+                    atual = os.stat(caminho).st_ino == os.fstat(f.fileno()).st_ino
+                except FileNotFoundError:
+                    atual = False
+                if atual:
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    return
+            finally:
+                f.close()
+
+    def _ler_eventos(self, session_id):
+        eventos = []
+        try:
+            with open(self._caminho_log(session_id), 'r', encoding='utf-8') as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        eventos.append(json.loads(linha))
+                    except ValueError:
+                        # Linha parcial de uma escrita interrompida: ignora
+                        logger.warning(f"Evento corrompido ignorado na sessão {session_id}")
+        except FileNotFoundError:
+            pass
+        return eventos
+
+    def _gravar_snapshot(self, session_id, dados):
+        caminho = self._caminho(session_id)
+        tmp_path = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(serializar_sessao(dados))
+        os.replace(tmp_path, caminho)
+
+    def _ultima_atividade(self, session_id):
+        ultima = None
+        for caminho in (self._caminho(session_id), self._caminho_log(session_id)):
+            try:
+                mtime = os.stat(caminho).st_mtime
+            except FileNotFoundError:
+                continue
+            ultima = mtime if ultima is None else max(ultima, mtime)
+        return ultima
+
+    def get(self, session_id):
+        if not session_id_valido(session_id):
+            return None
+        if self.ttl:
+            ultima = self._ultima_atividade(session_id)
+            if ultima is None:
+                return None
+            if self._expirada(ultima):
+                self.delete(session_id)
+                self._contar('expiradas')
+                return None
+        if not os.path.exists(self._caminho(session_id)):
+            return None
+        with self._travado(session_id, exclusivo=False):
+            return self._ler(session_id)
+
+    def _ler(self, session_id):
+        try:
+            with open(self._caminho(session_id), 'r', encoding='utf-8') as f:
+                dados = desserializar_sessao(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao ler sessão {session_id}: {e}")
+            return None
+        for evento in self._ler_eventos(session_id):
+            aplicar_evento(dados, evento)
+        return dados
+
+    def _substituir(self, session_id, dados):
+        self._gravar_snapshot(session_id, dados)
+        # O snapshot já contém todo o estado: descarta eventos antigos
+        try:
+            os.remove(self._caminho_log(session_id))
+        except FileNotFoundError:
+            pass
+
+    def save(self, session_id, dados):
+        if not session_id_valido(session_id):
+            raise ValueError('Identificador de sessão inválido')
+        with self._travado(session_id, exclusivo=True):
+            self._substituir(session_id, dados)
+
+    def append_event(self, session_id, dados, evento):
+        if not session_id_valido(session_id):
+            raise ValueError('Identificador de sessão inválido')
+        aplicar_evento(dados, evento)
+        linha = (serializar_sessao(evento) + '\n').encode('utf-8')
+        with self._travado(session_id, exclusivo=False):
+            fd = os.open(self._caminho_log(session_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, linha)
+                tamanho_log = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+        if evento.get('compactar') or tamanho_log > self.log_max_bytes:
+            self.compactar(session_id)
+        return dados
+
+    def compactar(self, session_id):
+        """Incorpora o log ao snapshot e remove o log"""
+        with self._travado(session_id, exclusivo=True):
+            dados = self._ler(session_id)
+            if dados is not None:
+                self._substituir(session_id, dados)
+
+    def delete(self, session_id):
+        if not session_id_valido(session_id):
+            return
+        # O .lock fica: outro worker pode estar esperando por ele (o coletor o apaga depois)
+        with self._travado(session_id, exclusivo=True):
+            self._remover_arquivos(session_id)
+
+    def _remover_arquivos(self, session_id, lock=False):
+        caminhos = [self._caminho(session_id), self._caminho_log(session_id)]
+        if lock:
+            caminhos.append(self._caminho_lock(session_id))
+        for caminho in caminhos:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+    def expirar(self):
+        # Agrupa snapshot, log e temporários por sessão e usa o mais recente
+        ultima_por_sessao = {}
+        arquivos_por_sessao = {}
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file():
+                    continue
+                session_id = entrada.name.split('.', 1)[0]
+                try:
+                    mtime = entrada.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                ultima_por_sessao[session_id] = max(mtime, ultima_por_sessao.get(session_id, mtime))
+                arquivos_por_sessao.setdefault(session_id, []).append(entrada.path)
+        agora = time.time()
+        removidas = 0
+        for session_id, ultima in ultima_por_sessao.items():
+            if not self._expirada(ultima, agora) or not session_id_valido(session_id):
+                continue
+            with self._travado(session_id, exclusivo=True):
+                # A sessão pode ter sido usada entre a varredura e o lock
+                ultima = self._ultima_atividade(session_id)
+                if ultima is not None and not self._expirada(ultima):
+                    continue
+                for caminho in arquivos_por_sessao[session_id]:
+                    if caminho.endswith('.tmp'):
+                        try:
+                            os.remove(caminho)
+                        except FileNotFoundError:
+                            pass
+                self._remover_arquivos(session_id, lock=True)
+            removidas += 1
+        self._ativas = len(ultima_por_sessao) - removidas
+        return removidas
+
+    def contar_ativas(self):
+        # Contagem da última coleta (evita varrer o diretório a cada consulta)
+        if self._ativas is None:
+            self._ativas = sum(1 for nome in os.listdir(self.diretorio) if nome.endswith('.json'))
+        return self._ativas
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessões em uma tabela SQLite (WAL permite leitores e escritor concorrentes)"""
+
+    backend = 'sqlite'
+
+    def __init__(self, caminho, max_eventos=50, ttl=None):
+        super().__init__(ttl)
+        self.caminho = caminho
+        self.max_eventos = max_eventos
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conexao()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessoes ('
+            ' id TEXT PRIMARY KEY,'
+            ' dados TEXT NOT NULL,'
+            ' atualizado_em REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessao_eventos ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' session_id TEXT NOT NULL,'
+            ' evento TEXT NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessao_eventos_sessao ON sessao_eventos (session_id, seq)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_atualizado_em ON sessoes (atualizado_em)')
+        conn.commit()
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (não reutilizar após fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        conn = self._conexao()
+        linha = conn.execute('SELECT dados, atualizado_em FROM sessoes WHERE id = ?', (session_id,)).fetchone()
+        if linha is None:
+            return None
+        if self._expirada(linha[1]):
+            self.delete(session_id)
+            self._contar('expiradas')
+            return None
+        dados = desserializar_sessao(linha[0])
+        eventos = conn.execute(
+            'SELECT evento FROM sessao_eventos WHERE session_id = ? ORDER BY seq', (session_id,)
+        ).fetchall()
+        for (evento,) in eventos:
+            aplicar_evento(dados, json.loads(evento))
+        return dados
+
+    def _gravar(self, conn, session_id, dados):
+        conn.execute(
+            'INSERT INTO sessoes (id, dados, atualizado_em) VALUES (?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET dados = excluded.dados, atualizado_em = excluded.atualizado_em',
+            (session_id, serializar_sessao(dados), time.time())
+        )
+        conn.execute('DELETE FROM sessao_eventos WHERE session_id = ?', (session_id,))
+
+    def save(self, session_id, dados):
+        conn = self._conexao()
+        with conn:
+            self._gravar(conn, session_id, dados)
+
+    def append_event(self, session_id, dados, evento):
+        aplicar_evento(dados, evento)
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                'INSERT INTO sessao_eventos (session_id, evento) VALUES (?, ?)',
+                (session_id, serializar_sessao(evento))
+            )
+            conn.execute('UPDATE sessoes SET atualizado_em = ? WHERE id = ?', (time.time(), session_id))
+            total_eventos = conn.execute(
+                'SELECT COUNT(*) FROM sessao_eventos WHERE session_id = ?', (session_id,)
+            ).fetchone()[0]
+        if evento.get('compactar') or total_eventos >= self.max_eventos:
+            self.compactar(session_id)
+        return dados
+
+    def compactar(self, session_id):
+        """Incorpora os eventos ao snapshot em uma única transação"""
+        conn = self._conexao()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Leitura na própria transação: get() poderia apagar uma sessão
+            # expirada com outro `with conn` e encerrar esta transação antes da hora
+            linha = conn.execute('SELECT dados FROM sessoes WHERE id = ?', (session_id,)).fetchone()
+            if linha is None:
+                return
+            dados = desserializar_sessao(linha[0])
+            for (evento,) in conn.execute(
+                'SELECT evento FROM sessao_eventos WHERE session_id = ? ORDER BY seq', (session_id,)
+            ):
+                aplicar_evento(dados, json.loads(evento))
+            self._gravar(conn, session_id, dados)
+
+    def delete(self, session_id):
+        conn = self._conexao()
+        with conn:
+            conn.execute('DELETE FROM sessao_eventos WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM sessoes WHERE id = ?', (session_id,))
+
+    def expirar(self):
+        conn = self._conexao()
+        with conn:
+            removidas = conn.execute(
+                'DELETE FROM sessoes WHERE atualizado_em < ?', (time.time() - self.ttl,)
+            ).rowcount
+            conn.execute('DELETE FROM sessao_eventos WHERE session_id NOT IN (SELECT id FROM sessoes)')
+        return removidas
+
+    def contar_ativas(self):
+        return self._conexao().execute('SELECT COUNT(*) FROM sessoes').fetchone()[0]
+
+
+class ColetorSessoes:
+    """Thread em segundo plano que apaga periodicamente as sessões expiradas
+    (uma por worker do gunicorn, ver threads_processo)"""
+
+    def __init__(self, store, intervalo=600):
+        self.store = store
+        self.intervalo = intervalo
+        self._thread = ThreadPorProcesso(self._executar, 'coletor-sessoes')
+
+    def iniciar(self):
+        if not self.store.ttl or not self.intervalo:
+            return
+        self._thread.iniciar()
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                removidas = self.store.coletar()
+                if removidas:
+                    logger.info(f"Coletor de sessões: {removidas} sessões expiradas removidas")
+            except Exception as e:
+                logger.error(f"Erro ao coletar sessões expiradas: {e}")
+
+
+def criar_session_store(tipo, diretorio, caminho_sqlite, capacidade=10000, log_max_bytes=32 * 1024, ttl=None):
+    """Cria o backend de sessões configurado ('memoria', 'arquivo' ou 'sqlite')"""
+    tipo = (tipo or 'arquivo').strip().lower()
+    if tipo == 'memoria':
+        return MemorySessionStore(capacidade=capacidade, ttl=ttl)
+    if tipo == 'sqlite':
+        return SQLiteSessionStore(caminho_sqlite, ttl=ttl)
+    if tipo != 'arquivo':
+        logger.warning(f"Backend de sessão desconhecido '{tipo}'. Usando 'arquivo'.")
+    return FileSessionStore(diretorio, log_max_bytes=log_max_bytes, ttl=ttl)
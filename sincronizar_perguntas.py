@@ -1,10 +1,18 @@
 import argparse
+import contextlib
+import hashlib
 import json
 import os
 import re
 import shutil
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from arquivos_perguntas import EXTENSOES_NDJSON, FORMATO_NDJSON, acrescentar_ndjson, formato_arquivo, gravar_perguntas, iterar_ndjson
+from diario_edicoes import DiarioEdicoes
+
 try:
     from dotenv import load_dotenv  # type: ignore
 except Exception:
@@ -20,6 +28,9 @@ def load_env_variables() -> None:
 
 
 def read_json(path: str):
+    """Conteúdo de um arquivo JSON; arquivos NDJSON viram a lista de perguntas"""
+    if formato_arquivo(path) == FORMATO_NDJSON:
+        return list(iterar_ndjson(path))
     with open(path, 'r', encoding='utf-8') as file_handle:
         return json.load(file_handle)
 
@@ -50,7 +61,73 @@ def extract_questions(data) -> list:
         return data
     if isinstance(data, dict) and 'perguntas' in data and isinstance(data['perguntas'], list):
         return data['perguntas']
-    raise ValueError('Formato não reconhecido. Use uma lista de perguntas ou um objeto {"perguntas": [...]}')
+    raise ValueError('Formato não reconhecido. Use uma lista de perguntas, um objeto {"perguntas": [...]} ou NDJSON')
+
+
+STREAM_CHUNK_SIZE = 1 << 16
+_WHITESPACE_OR_COMMA = re.compile(r'[\s,]*')
+
+
+def iter_json_array(handle, buffer: str = '', position: int = 0, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Itera os itens de uma lista JSON lendo o arquivo aos poucos.
+
+    `handle` deve estar logo depois do '[' de abertura (ou o '[' já ter sido
+    consumido de `buffer`, que contém o que foi lido além dele).
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+    while True:
+        position = _WHITESPACE_OR_COMMA.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError('JSON truncado: lista de perguntas não terminada')
+        # Item incompleto no buffer: descarta o que já foi consumido e lê mais
+        chunk = handle.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_questions_from_file(path: str):
+    """Itera as perguntas de um arquivo sem carregá-lo inteiro.
+
+    Aceita lista JSON, objeto {"perguntas": [...]} e NDJSON (uma pergunta por linha).
+    """
+    if formato_arquivo(path) == FORMATO_NDJSON:
+        yield from iterar_ndjson(path)
+        return
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as handle:
+        buffer = handle.read(STREAM_CHUNK_SIZE)
+        position = len(buffer) - len(buffer.lstrip())
+        if buffer[position:position + 1] == '[':
+            yield from iter_json_array(handle, buffer, position + 1)
+            return
+        if buffer[position:position + 1] != '{':
+            if not buffer.strip():
+                return
+            raise ValueError('Formato não reconhecido. Use uma lista de perguntas, {"perguntas": [...]} ou NDJSON')
+        match = re.search(r'"perguntas"\s*:\s*\[', buffer)
+        while match is None:
+            chunk = handle.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            match = re.search(r'"perguntas"\s*:\s*\[', buffer)
+        if match is None:
+            # Objeto pequeno sem a chave esperada: o erro padrão de extract_questions
+            yield from extract_questions(decoder.decode(buffer))
+            return
+        yield from iter_json_array(handle, buffer, match.end())
 
 
 def normalize_text(value: str) -> str:
@@ -65,12 +142,144 @@ def question_key(question: dict) -> tuple:
     return (pergunta_text, opcoes, disciplina, periodo)
 
 
-def merge_questions(existing_questions: list, new_questions: list) -> tuple:
+def question_key_hash(question: dict) -> bytes:
+    """Hash compacto (16 bytes) de question_key, para o índice em disco"""
+    encoded = json.dumps(question_key(question), ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class MainBankKeyIndex:
+    """Índice em disco (SQLite) das chaves de deduplicação do banco principal.
+
+    Fica ao lado do banco (<banco>.keys.sqlite3) e guarda o mtime/tamanho do
+    arquivo indexado; se o banco mudar por fora, o índice é reconstruído
+    percorrendo o banco em modo streaming. Permite deduplicar staging de
+    qualquer tamanho sem manter as chaves em memória.
+    """
+
+    def __init__(self, bank_path: str):
+        self.bank_path = bank_path
+        self.path = f"{bank_path}.keys.sqlite3"
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS keys (hash BLOB PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+
+    def _bank_state(self) -> str:
+        stat = os.stat(self.bank_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def is_current(self) -> bool:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'bank_state'").fetchone()
+        return row is not None and row[0] == self._bank_state()
+
+    def rebuild(self, questions) -> int:
+        self.conn.execute('BEGIN')
+        self.conn.execute('DELETE FROM keys')
+        count = 0
+        batch = []
+        for question in questions:
+            batch.append((question_key_hash(question),))
+            count += 1
+            if len(batch) >= 5000:
+                self.conn.executemany('INSERT OR IGNORE INTO keys (hash) VALUES (?)', batch)
+                batch = []
+        self.conn.executemany('INSERT OR IGNORE INTO keys (hash) VALUES (?)', batch)
+        self.conn.execute('COMMIT')
+        self.mark_current(count)
+        return count
+
+    def question_count(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'questions'").fetchone()
+        return int(row[0]) if row else 0
+
+    def begin(self) -> None:
+        self.conn.execute('BEGIN')
+
+    def add_if_new(self, question: dict) -> bool:
+        """Registra a chave da pergunta; False se ela já existia (duplicada)"""
+        cursor = self.conn.execute('INSERT OR IGNORE INTO keys (hash) VALUES (?)', (question_key_hash(question),))
+        return cursor.rowcount == 1
+
+    def commit(self) -> None:
+        self.conn.execute('COMMIT')
+
+    def rollback(self) -> None:
+        self.conn.execute('ROLLBACK')
+
+    def mark_current(self, question_count: int) -> None:
+        """Registra o estado atual do arquivo do banco como indexado"""
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)',
+            [('bank_state', self._bank_state()), ('questions', str(question_count))]
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class JsonBankAppender:
+    """Acrescenta perguntas ao final de um banco JSON sem reserializá-lo.
+
+    As perguntas são escritas em uma cópia do arquivo, no lugar do fechamento
+    da lista (']' ou ']\n}'), seguidas do mesmo fechamento; close() troca o
+    banco pela cópia com os.replace. Uma queda no meio deixa apenas a cópia
+    temporária para trás, e o banco nunca é lido pela metade.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(path, self.tmp_path)
+        self.handle = open(self.tmp_path, 'r+b')
+        try:
+            start = self.handle.read(64).lstrip()
+            self.indent = '    ' if start.startswith(b'{') else '  '
+            size = self.handle.seek(0, os.SEEK_END)
+            tail_start = max(0, size - 4096)
+            self.handle.seek(tail_start)
+            tail = self.handle.read()
+            closing = tail.rfind(b']')
+            if closing < 0:
+                raise ValueError(f'Não foi possível localizar o fim da lista de perguntas em {path}')
+            before = tail[:closing].rstrip()
+            self.empty = before.endswith(b'[')
+            self.closing = tail[closing:]
+            self.handle.seek(tail_start + len(before))
+            self.handle.truncate()
+        except Exception:
+            self.abort()
+            raise
+        self.count = 0
+
+    def append(self, question: dict) -> None:
+        text = json.dumps(question, ensure_ascii=False, indent=2).replace('\n', '\n' + self.indent)
+        separator = '\n' if self.empty and self.count == 0 else ',\n'
+        self.handle.write((separator + self.indent + text).encode('utf-8'))
+        self.count += 1
+
+    def close(self) -> None:
+        self.handle.write(b'\n' + self.closing)
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+        self.handle.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        """Descarta a cópia sem alterar o banco"""
+        self.handle.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def merge_questions(existing_questions: list, new_questions: list, new_keys: list | None = None) -> tuple:
+    """new_keys: question_key de cada pergunta nova, se já calculadas (ex.: pelos workers de --jobs)"""
     existing_keys = {question_key(q) for q in existing_questions}
     unique_new_questions = []
     duplicated = 0
-    for q in new_questions:
-        if question_key(q) in existing_keys:
+    if new_keys is None:
+        new_keys = map(question_key, new_questions)
+    for q, key in zip(new_questions, new_keys):
+        if key in existing_keys:
             duplicated += 1
             continue
         unique_new_questions.append(q)
@@ -78,6 +287,48 @@ def merge_questions(existing_questions: list, new_questions: list) -> tuple:
     return merged, len(unique_new_questions), duplicated
 
 
+def find_near_duplicates(existing_questions: list, new_questions: list, threshold: float) -> tuple:
+    """Quase duplicadas (MinHash/LSH) das perguntas novas contra o banco e entre si.
+
+    Retorna ({posição em new_questions: [(chave, similaridade), ...]}, grupos),
+    com chaves 'principal#<i>' e 'staging#<i>'.
+    """
+    from duplicatas_proximas import DetectorDuplicatas
+
+    detector = DetectorDuplicatas(threshold)
+    for index, question in enumerate(existing_questions):
+        detector.adicionar(f'principal#{index}', question)
+    near_duplicates = {}
+    for index, question in enumerate(new_questions):
+        similar = detector.adicionar(f'staging#{index}', question)
+        if similar:
+            near_duplicates[index] = similar
+    groups = [
+        group for group in detector.grupos()
+        if any(key.startswith('staging#') for key in group['chaves'])
+    ]
+    return near_duplicates, groups
+
+
+def write_near_duplicates_report(path: str, groups: list, existing_questions: list, new_questions: list) -> None:
+    sources = {'principal': existing_questions, 'staging': new_questions}
+    report = []
+    for group in groups:
+        questions = []
+        for key in group['chaves']:
+            source, index = key.split('#')
+            question = sources[source][int(index)]
+            questions.append({
+                'chave': key,
+                'pergunta': question.get('pergunta'),
+                'disciplina': question.get('disciplina'),
+                'periodo': question.get('periodo'),
+            })
+        report.append({'similaridade_minima': group['similaridade_minima'], 'perguntas': questions})
+    ensure_directory_exists(path)
+    safe_write_json(path, report)
+
+
 def detect_default_staging_file() -> str:
     candidates = [
         'perguntas_staging.json',
@@ -100,16 +351,65 @@ def get_main_bank_path(args_main: str | None) -> str:
     return os.path.join('data', 'perguntas.json')
 
 
+def get_sqlite_bank_path(args_sqlite: str | None) -> str | None:
+    """Caminho do banco SQLite de destino: --sqlite ou BANCO_PERGUNTAS_BACKEND=sqlite"""
+    if args_sqlite:
+        return args_sqlite
+    load_env_variables()
+    if os.environ.get('BANCO_PERGUNTAS_BACKEND', 'json').strip().lower() == 'sqlite':
+        return os.environ.get('BANCO_SQLITE_PATH', os.path.join('data', 'perguntas.sqlite3'))
+    return None
+
+
+def backup_sqlite(path: str) -> str:
+    from banco_sqlite import BancoSQLite
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backup_path = f"{path}.backup_{timestamp}"
+    return BancoSQLite(path).copiar_para(backup_path)
+
+
+def open_history(args):
+    """Histórico do banco principal (historico_bancos.py), ou None com --no-history"""
+    if args.no_history:
+        return None
+    from historico_bancos import BANCO_PRINCIPAL, HistoricoBanco
+
+    return HistoricoBanco(args.history_dir, BANCO_PRINCIPAL)
+
+
+def record_history(history, load_main_questions, new_questions) -> None:
+    """Registra as perguntas novas no histórico antes de gravá-las no banco.
+
+    Sem nenhum checkpoint ainda, o banco atual (antes do merge) vira o
+    checkpoint inicial, senão o log não teria de onde ser reaplicado.
+    """
+    from historico_bancos import operacao
+
+    history.garantir_checkpoint(load_main_questions)
+    batch = []
+    for question in new_questions:
+        batch.append(operacao('adicionar', question))
+        if len(batch) >= 1000:
+            history.registrar(batch, 'sincronizacao')
+            batch = []
+    history.registrar(batch, 'sincronizacao')
+
+
 def mirror_local_copy(merged_questions: list, destination: str) -> None:
     ensure_directory_exists(destination)
-    safe_write_json(destination, merged_questions)
+    gravar_perguntas(destination, merged_questions)
+
 
+STAGING_EXTENSIONS = ('.json',) + EXTENSOES_NDJSON
 
-def list_json_files_recursively(root_directory: str, glob_extension: str = '.json') -> list:
+
+def list_json_files_recursively(root_directory: str, glob_extension: str | tuple = '.json') -> list:
+    extensions = tuple(ext.lower() for ext in ((glob_extension,) if isinstance(glob_extension, str) else glob_extension))
     collected_paths = []
     for current_directory, _subdirs, files in os.walk(root_directory):
         for filename in files:
-            if filename.lower().endswith(glob_extension.lower()):
+            if filename.lower().endswith(extensions):
                 collected_paths.append(os.path.join(current_directory, filename))
     return sorted(collected_paths)
 
@@ -135,17 +435,16 @@ def infer_discipline_from_filename(path: str) -> str | None:
     return cleaned.title()
 
 
-def load_questions_from_staging_files(
+def iter_questions_from_staging_files(
     file_paths: list,
     default_period: int | None,
     default_discipline: str | None,
     enable_period_inference: bool,
     enable_discipline_inference: bool,
-) -> list:
-    aggregated_questions: list = []
+    streaming: bool = False,
+):
     for file_path in file_paths:
-        data = read_json(file_path)
-        questions = extract_questions(data)
+        questions = iter_questions_from_file(file_path) if streaming else extract_questions(read_json(file_path))
 
         inferred_period = infer_period_from_directory(os.path.dirname(file_path)) if enable_period_inference else None
         inferred_discipline = infer_discipline_from_filename(file_path) if enable_discipline_inference else None
@@ -161,9 +460,209 @@ def load_questions_from_staging_files(
                 if discipline_value:
                     question['disciplina'] = discipline_value
 
-            aggregated_questions.append(question)
+            yield question
+
+
+def load_questions_from_staging_files(
+    file_paths: list,
+    default_period: int | None,
+    default_discipline: str | None,
+    enable_period_inference: bool,
+    enable_discipline_inference: bool,
+) -> list:
+    return list(iter_questions_from_staging_files(
+        file_paths, default_period, default_discipline, enable_period_inference, enable_discipline_inference
+    ))
+
+
+def run_streaming_sync(args, staging_dir_files: list, staging_file: str | None, main_bank_path: str, sqlite_path: str | None, mirror_dest: str | None) -> None:
+    """Sincronização em memória limitada (--stream).
+
+    O staging é lido pergunta a pergunta, a deduplicação consulta o índice de
+    chaves em disco e as perguntas novas vão primeiro para um arquivo NDJSON
+    temporário; só depois de ler todo o staging sem erros elas são
+    acrescentadas ao final do banco, sem reescrevê-lo.
+    """
+    index = MainBankKeyIndex(main_bank_path)
+    spool_path = f"{main_bank_path}.novas.tmp"
+    try:
+        if sqlite_path:
+            from banco_sqlite import BANCO_PRINCIPAL, BancoSQLite
+
+            sqlite_bank = BancoSQLite(sqlite_path)
+            # As edições no SQLite (WAL) nem sempre mudam o mtime do arquivo: reindexa sempre
+            main_count = index.rebuild(sqlite_bank.iterar(BANCO_PRINCIPAL))
+        elif index.is_current():
+            main_count = index.question_count()
+        else:
+            print(f"Indexando chaves do banco principal em {index.path}...")
+            main_count = index.rebuild(iter_questions_from_file(main_bank_path))
+
+        staged_count = added_count = duplicated_count = 0
+        index.begin()
+        try:
+            with open(spool_path, 'w', encoding='utf-8') as spool:
+                staging_sources = [
+                    iter_questions_from_staging_files(
+                        file_paths=staging_dir_files,
+                        default_period=args.periodo,
+                        default_discipline=args.disciplina,
+                        enable_period_inference=bool(args.infer_period_from_dir),
+                        enable_discipline_inference=bool(args.infer_discipline_from_filename),
+                        streaming=True,
+                    )
+                ]
+                if staging_file:
+                    staging_sources.append(iter_questions_from_file(staging_file))
+                for source in staging_sources:
+                    for question in source:
+                        staged_count += 1
+                        if not index.add_if_new(question):
+                            duplicated_count += 1
+                            continue
+                        added_count += 1
+                        spool.write(json.dumps(question, ensure_ascii=False) + '\n')
+        except Exception as exc:
+            index.rollback()
+            raise SystemExit(f"Erro ao ler staging: {exc}")
+
+        print('Resumo da sincronização (streaming):')
+        print(f"- Banco principal atual: {main_count} perguntas")
+        print(f"- Novas no staging:     {staged_count} perguntas")
+        print(f"- Adicionadas:           {added_count}")
+        print(f"- Duplicadas/ignoradas:  {duplicated_count}")
+        print(f"- Total após merge:      {main_count + added_count}")
+
+        if args.dry_run:
+            index.rollback()
+            print('\nExecução em modo dry-run. Nenhum arquivo foi modificado.')
+            return
+
+        if not added_count:
+            index.rollback()
+            print('\nNenhuma pergunta nova; banco principal inalterado.')
+            return
+
+        try:
+            backup_path = backup_sqlite(main_bank_path) if sqlite_path else backup_file(main_bank_path)
+            print(f"Backup criado do banco principal: {backup_path}")
+        except Exception as exc:
+            index.rollback()
+            raise SystemExit(f"Falha ao criar backup do banco principal: {exc}")
 
-    return aggregated_questions
+        history = open_history(args)
+        if history is not None:
+            def load_main_questions():
+                if sqlite_path:
+                    return sqlite_bank.carregar_lista(BANCO_PRINCIPAL)
+                return list(iter_questions_from_file(main_bank_path))
+
+            try:
+                with open(spool_path, 'r', encoding='utf-8') as spool:
+                    record_history(history, load_main_questions, (json.loads(line) for line in spool))
+            except Exception as exc:
+                index.rollback()
+                raise SystemExit(f"Falha ao registrar histórico de alterações: {exc}")
+
+        try:
+            with open(spool_path, 'r', encoding='utf-8') as spool:
+                new_questions = (json.loads(line) for line in spool)
+                if sqlite_path:
+                    batch = []
+                    for question in new_questions:
+                        batch.append(question)
+                        if len(batch) >= 1000:
+                            sqlite_bank.acrescentar(BANCO_PRINCIPAL, batch)
+                            batch = []
+                    if batch:
+                        sqlite_bank.acrescentar(BANCO_PRINCIPAL, batch)
+                elif formato_arquivo(main_bank_path) == FORMATO_NDJSON:
+                    acrescentar_ndjson(main_bank_path, new_questions)
+                else:
+                    appender = JsonBankAppender(main_bank_path)
+                    try:
+                        for question in new_questions:
+                            appender.append(question)
+                    except BaseException:
+                        appender.abort()
+                        raise
+                    appender.close()
+        except Exception as exc:
+            index.rollback()
+            raise SystemExit(f"Falha ao salvar banco principal: {exc}")
+        index.commit()
+        index.mark_current(main_count + added_count)
+        print(f"Banco principal atualizado: {main_bank_path}")
+
+        if mirror_dest and os.path.abspath(mirror_dest) != os.path.abspath(main_bank_path):
+            if sqlite_path:
+                print('Aviso: espelhamento local não é feito em --stream com --sqlite')
+            else:
+                try:
+                    ensure_directory_exists(mirror_dest)
+                    shutil.copyfile(main_bank_path, mirror_dest)
+                    print(f"Cópia local espelhada: {mirror_dest}")
+                except Exception as exc:
+                    print(f"Aviso: falha ao espelhar cópia local ({mirror_dest}): {exc}")
+
+        print('\nSincronização concluída com sucesso.')
+    finally:
+        index.close()
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+def _parse_staging_file(task: tuple) -> tuple:
+    """Worker de --jobs: lê, normaliza e calcula as chaves de um arquivo de staging"""
+    file_path, default_period, default_discipline, enable_period_inference, enable_discipline_inference = task
+    questions = list(iter_questions_from_staging_files(
+        [file_path], default_period, default_discipline, enable_period_inference, enable_discipline_inference
+    ))
+    return questions, [question_key(q) for q in questions]
+
+
+def load_questions_from_staging_files_parallel(
+    file_paths: list,
+    default_period: int | None,
+    default_discipline: str | None,
+    enable_period_inference: bool,
+    enable_discipline_inference: bool,
+    jobs: int,
+    progress: bool = True,
+) -> tuple:
+    """Como load_questions_from_staging_files, com os arquivos processados em `jobs` processos.
+
+    Retorna (perguntas, chaves) na mesma ordem da versão sequencial; as
+    chaves de deduplicação já vêm calculadas pelos workers.
+    """
+    tasks = [
+        (path, default_period, default_discipline, enable_period_inference, enable_discipline_inference)
+        for path in file_paths
+    ]
+    questions: list = []
+    keys: list = []
+    if not tasks:
+        return questions, keys
+    # Lotes de arquivos por worker: poucos o bastante para balancear a carga,
+    # grandes o bastante para diluir o custo de comunicação entre processos
+    chunksize = max(1, len(tasks) // (jobs * 16))
+    step = max(1, len(tasks) // 20)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for done, (file_questions, file_keys) in enumerate(executor.map(_parse_staging_file, tasks, chunksize=chunksize), 1):
+            questions.extend(file_questions)
+            keys.extend(file_keys)
+            if progress and (done % step == 0 or done == len(tasks)):
+                print(f"\rArquivos de staging: {done}/{len(tasks)} ({len(questions)} perguntas)", end='', file=sys.stderr)
+    if progress:
+        print(file=sys.stderr)
+    return questions, keys
+
+
+def lock_main_bank(main_bank_path: str, sqlite_path: str | None):
+    """Impede que o app compacte o diário do banco JSON enquanto a sincronização o altera"""
+    if sqlite_path:
+        return contextlib.nullcontext()
+    return DiarioEdicoes(main_bank_path).alteracao_externa()
 
 
 def main() -> None:
@@ -183,7 +682,7 @@ def main() -> None:
         '--staging-dir',
         type=str,
         default=None,
-        help='Diretório contendo arquivos de staging organizados (ex.: periodo_2/Disciplina.json)'
+        help='Diretório contendo arquivos de staging organizados (ex.: periodo_2/Disciplina.json ou .ndjson/.jsonl)'
     )
     parser.add_argument(
         '--main',
@@ -191,6 +690,17 @@ def main() -> None:
         default=None,
         help='Caminho do banco principal. Se ausente, usa PERGUNTAS_JSON_PATH ou data/perguntas.json'
     )
+    parser.add_argument(
+        '--sqlite',
+        type=str,
+        nargs='?',
+        const=os.environ.get('BANCO_SQLITE_PATH', os.path.join('data', 'perguntas.sqlite3')),
+        default=None,
+        help=(
+            'Sincroniza com o banco SQLite (BANCO_PERGUNTAS_BACKEND=sqlite) em vez do JSON. '
+            'Padrão: BANCO_SQLITE_PATH ou data/perguntas.sqlite3; usado automaticamente com BANCO_PERGUNTAS_BACKEND=sqlite'
+        )
+    )
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -229,11 +739,58 @@ def main() -> None:
         default=None,
         help='Disciplina padrão para atribuir às perguntas sem disciplina quando não for possível inferir'
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Processos usados para ler e normalizar os arquivos de --staging-dir (padrão: 1, sequencial)'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help=(
+            'Modo streaming para arquivos grandes: lê o staging (lista JSON ou NDJSON) aos poucos, '
+            'deduplica contra um índice de chaves em disco (<banco>.keys.sqlite3) e apenas acrescenta '
+            'as perguntas novas ao final do banco'
+        )
+    )
+    parser.add_argument(
+        '--history-dir',
+        type=str,
+        default=os.path.join(os.environ.get('HISTORICO_DIR', os.path.join('data', 'historico')), 'principal'),
+        help='Histórico de alterações do banco principal (padrão: $HISTORICO_DIR/principal ou data/historico/principal)'
+    )
+    parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help='Não registra as perguntas adicionadas no histórico de alterações (historico_bancos.py)'
+    )
+    parser.add_argument(
+        '--near-duplicates',
+        type=float,
+        nargs='?',
+        const=0.8,
+        default=None,
+        metavar='LIMIAR',
+        help='Detecta perguntas novas quase duplicadas (MinHash/LSH) com similaridade >= LIMIAR (padrão: 0.8)'
+    )
+    parser.add_argument(
+        '--skip-near-duplicates',
+        action='store_true',
+        help='Não adiciona as perguntas quase duplicadas (implica --near-duplicates)'
+    )
+    parser.add_argument(
+        '--near-duplicates-report',
+        type=str,
+        default=None,
+        help='Grava em JSON os grupos de quase duplicadas encontrados (implica --near-duplicates)'
+    )
 
     args = parser.parse_args()
 
     staging_path = args.staging
-    main_bank_path = get_main_bank_path(args.main)
+    sqlite_path = None if args.main else get_sqlite_bank_path(args.sqlite)
+    main_bank_path = sqlite_path or get_main_bank_path(args.main)
     mirror_dest = None if args.no_mirror_local else args.mirror_local_dest
 
     if not os.path.exists(staging_path) and not args.staging_dir:
@@ -242,56 +799,147 @@ def main() -> None:
     if not os.path.exists(main_bank_path):
         raise SystemExit(f"Banco principal não encontrado: {main_bank_path}")
 
+    if args.jobs < 1:
+        raise SystemExit('--jobs deve ser pelo menos 1')
+
+    if args.stream:
+        if args.jobs > 1:
+            raise SystemExit('--jobs não é suportado com --stream')
+        if args.near_duplicates is not None or args.skip_near_duplicates or args.near_duplicates_report:
+            raise SystemExit('--near-duplicates não é suportado com --stream')
+        staging_dir_files = []
+        if args.staging_dir and os.path.exists(args.staging_dir):
+            staging_dir_files = list_json_files_recursively(args.staging_dir, STAGING_EXTENSIONS)
+            if not staging_dir_files:
+                print(f"Aviso: nenhum JSON/NDJSON encontrado em {args.staging_dir}")
+        staging_file = staging_path if os.path.exists(staging_path) else None
+
+    # As edições do painel admin ficam no diário do banco; a compactação
+    # regravaria o JSON base por cima das perguntas acrescentadas aqui
+    with lock_main_bank(main_bank_path, sqlite_path):
+        if args.stream:
+            run_streaming_sync(args, staging_dir_files, staging_file, main_bank_path, sqlite_path, mirror_dest)
+        else:
+            run_sync(args, staging_path, main_bank_path, sqlite_path, mirror_dest)
+
+
+def run_sync(args, staging_path: str, main_bank_path: str, sqlite_path: str | None, mirror_dest: str | None) -> None:
+    """Sincronização em memória: lê o banco e o staging inteiros e grava o merge"""
     try:
-        main_data = read_json(main_bank_path)
-        main_questions = extract_questions(main_data)
+        if sqlite_path:
+            from banco_sqlite import BANCO_PRINCIPAL, BancoSQLite
+
+            sqlite_bank = BancoSQLite(sqlite_path)
+            main_questions = sqlite_bank.carregar_lista(BANCO_PRINCIPAL)
+        else:
+            main_data = read_json(main_bank_path)
+            main_questions = extract_questions(main_data)
 
         staging_questions: list = []
+        staging_keys: list | None = None
 
         if args.staging_dir and os.path.exists(args.staging_dir):
-            files = list_json_files_recursively(args.staging_dir, '.json')
+            files = list_json_files_recursively(args.staging_dir, STAGING_EXTENSIONS)
             if not files:
-                print(f"Aviso: nenhum JSON encontrado em {args.staging_dir}")
-            staged_from_dir = load_questions_from_staging_files(
-                file_paths=files,
-                default_period=args.periodo,
-                default_discipline=args.disciplina,
-                enable_period_inference=bool(args.infer_period_from_dir),
-                enable_discipline_inference=bool(args.infer_discipline_from_filename),
-            )
+                print(f"Aviso: nenhum JSON/NDJSON encontrado em {args.staging_dir}")
+            if args.jobs > 1:
+                staged_from_dir, staging_keys = load_questions_from_staging_files_parallel(
+                    file_paths=files,
+                    default_period=args.periodo,
+                    default_discipline=args.disciplina,
+                    enable_period_inference=bool(args.infer_period_from_dir),
+                    enable_discipline_inference=bool(args.infer_discipline_from_filename),
+                    jobs=args.jobs,
+                )
+            else:
+                staged_from_dir = load_questions_from_staging_files(
+                    file_paths=files,
+                    default_period=args.periodo,
+                    default_discipline=args.disciplina,
+                    enable_period_inference=bool(args.infer_period_from_dir),
+                    enable_discipline_inference=bool(args.infer_discipline_from_filename),
+                )
             staging_questions.extend(staged_from_dir)
 
         if os.path.exists(staging_path):
             staging_data = read_json(staging_path)
             staged_from_file = extract_questions(staging_data)
             staging_questions.extend(staged_from_file)
+            if staging_keys is not None:
+                staging_keys.extend(question_key(q) for q in staged_from_file)
     except Exception as exc:
         raise SystemExit(f"Erro ao carregar JSON: {exc}")
 
-    merged_questions, added_count, duplicated_count = merge_questions(main_questions, staging_questions)
+    merged_questions, added_count, duplicated_count = merge_questions(main_questions, staging_questions, staging_keys)
+
+    near_threshold = args.near_duplicates
+    if near_threshold is None and (args.skip_near_duplicates or args.near_duplicates_report):
+        near_threshold = 0.8
+    new_questions = merged_questions[len(main_questions):]
+    near_duplicates, near_groups = {}, []
+    if near_threshold is not None:
+        try:
+            near_duplicates, near_groups = find_near_duplicates(main_questions, new_questions, near_threshold)
+        except ValueError as exc:
+            raise SystemExit(f"Erro na detecção de quase duplicadas: {exc}")
+        if args.skip_near_duplicates and near_duplicates:
+            kept = [q for index, q in enumerate(new_questions) if index not in near_duplicates]
+            merged_questions = main_questions + kept
+            added_count = len(kept)
 
     print('Resumo da sincronização:')
     print(f"- Banco principal atual: {len(main_questions)} perguntas")
     print(f"- Novas no staging:     {len(staging_questions)} perguntas")
     print(f"- Adicionadas:           {added_count}")
     print(f"- Duplicadas/ignoradas:  {duplicated_count}")
+    if near_threshold is not None:
+        action = 'ignoradas' if args.skip_near_duplicates else 'adicionadas mesmo assim'
+        print(f"- Quase duplicadas:      {len(near_duplicates)} ({action}; limiar {near_threshold}, {len(near_groups)} grupos)")
     print(f"- Total após merge:      {len(merged_questions)}")
 
+    if near_groups:
+        print('\nGrupos de quase duplicadas (até 10):')
+        for group in near_groups[:10]:
+            print(f"  similaridade >= {group['similaridade_minima']}: {', '.join(group['chaves'])}")
+    if args.near_duplicates_report:
+        try:
+            write_near_duplicates_report(
+                args.near_duplicates_report, near_groups, main_questions, new_questions
+            )
+            print(f"Relatório de quase duplicadas: {args.near_duplicates_report}")
+        except Exception as exc:
+            print(f"Aviso: falha ao gravar relatório de quase duplicadas: {exc}")
+
     if args.dry_run:
         print('\nExecução em modo dry-run. Nenhum arquivo foi modificado.')
         return
 
     # Backup do banco principal
     try:
-        backup_path = backup_file(main_bank_path)
+        backup_path = backup_sqlite(main_bank_path) if sqlite_path else backup_file(main_bank_path)
         print(f"Backup criado do banco principal: {backup_path}")
     except Exception as exc:
         raise SystemExit(f"Falha ao criar backup do banco principal: {exc}")
 
+    # Registra as novas no histórico de alterações antes de gravar o banco
+    history = open_history(args)
+    if history is not None and added_count:
+        try:
+            record_history(history, lambda: main_questions, merged_questions[len(main_questions):])
+        except Exception as exc:
+            raise SystemExit(f"Falha ao registrar histórico de alterações: {exc}")
+
     # Salva o merge no banco principal
     try:
-        ensure_directory_exists(main_bank_path)
-        safe_write_json(main_bank_path, merged_questions)
+        if sqlite_path:
+            # No SQLite apenas as perguntas novas são inseridas
+            sqlite_bank.acrescentar(BANCO_PRINCIPAL, merged_questions[len(main_questions):])
+        elif formato_arquivo(main_bank_path) == FORMATO_NDJSON:
+            # NDJSON: apenas acrescenta as novas ao fim do arquivo
+            acrescentar_ndjson(main_bank_path, merged_questions[len(main_questions):])
+        else:
+            ensure_directory_exists(main_bank_path)
+            safe_write_json(main_bank_path, merged_questions)
         print(f"Banco principal atualizado: {main_bank_path}")
     except Exception as exc:
         raise SystemExit(f"Falha ao salvar banco principal: {exc}")
@@ -1525,10 +1525,45 @@ function excluirBackupPrincipal(filename) {
 }
 
 function restaurarTodosBackupsPrincipal() {
-    if (!confirm(`Tem certeza que deseja restaurar TODOS os backups do quiz principal?\n\n⚠️ ATENÇÃO:\n- Esta ação criará um backup do estado atual\n- Todas as disciplinas/períodos em backup serão restaurados\n- Disciplinas/períodos existentes serão substituídos\n- Esta ação pode demorar alguns segundos\n\nDeseja continuar?`)) {
-        return;
-    }
-    
+    // Prévia (dry run) das diferenças antes de confirmar
+    fetch('/admin/restaurar-todos-backups-principal', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ dry_run: true })
+    })
+    .then(response => response.json())
+    .then(previa => {
+        if (!previa.sucesso) {
+            mostrarAlerta('Erro: ' + (previa.erro || 'Erro desconhecido'), 'error');
+            return;
+        }
+        
+        let resumo = '';
+        previa.backups.slice(0, 15).forEach(b => {
+            resumo += `- ${b.disciplina}${b.periodo ? ' - Período ' + b.periodo : ''}: +${b.novas} / -${b.excluidas} / =${b.inalteradas}\n`;
+        });
+        if (previa.backups.length > 15) {
+            resumo += `... e mais ${previa.backups.length - 15}\n`;
+        }
+        if (previa.backups_ignorados.length > 0) {
+            resumo += `(${previa.backups_ignorados.length} backups antigos ignorados: existe um mais recente da mesma disciplina/período)\n`;
+        }
+        
+        if (!confirm(`Tem certeza que deseja restaurar TODOS os backups do quiz principal?\n\n${resumo}\nPerguntas no banco: ${previa.total_perguntas_atual} → ${previa.total_perguntas_apos}\n\n⚠️ ATENÇÃO:\n- Esta ação criará um backup do estado atual\n- O backup mais recente de cada disciplina/período será restaurado\n- Disciplinas/períodos existentes serão substituídos\n\nDeseja continuar?`)) {
+            return;
+        }
+        
+        executarRestauracaoTodosBackupsPrincipal();
+    })
+    .catch(error => {
+        console.error('Erro:', error);
+        mostrarAlerta('Erro ao calcular a prévia da restauração.', 'error');
+    });
+}
+
+function executarRestauracaoTodosBackupsPrincipal() {
     // Mostra loading
     const btnRestaurar = document.getElementById('btn-restaurar-todos-principal');
     const textoOriginal = btnRestaurar.innerHTML;
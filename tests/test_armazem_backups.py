@@ -0,0 +1,26 @@
+import os
+import threading
+
+from armazem_backups import ArmazemBackups
+
+
+def test_gravacoes_simultaneas_do_mesmo_manifesto(tmp_path):
+    armazem = ArmazemBackups(str(tmp_path), compressao='nenhuma')
+    erros = []
+
+    def gravar(n):
+        try:
+            for _ in range(20):
+                armazem.gravar('checkpoint.json', {'n': n}, [{'id': f'p{n}', 'pergunta': f'{n}?'}])
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=gravar, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    lido = armazem.ler('checkpoint.json')
+    assert lido['data'] == [{'id': f"p{lido['n']}", 'pergunta': f"{lido['n']}?"}]
+    assert not [nome for nome in os.listdir(tmp_path) if nome.endswith('.tmp')]
@@ -0,0 +1,59 @@
+import json
+import threading
+
+from arquivos_perguntas import FORMATO_JSON, FORMATO_NDJSON, acrescentar_ndjson, formato_arquivo, gravar_perguntas, ler_perguntas
+
+PERGUNTAS = [{'pergunta': f'Pergunta {i}?', 'opcoes': ['a', 'b'], 'resposta_correta': 'a'} for i in range(20)]
+
+
+def test_formato_mantido_ao_regravar(tmp_path):
+    ndjson = tmp_path / 'banco.json'
+    ndjson.write_text(''.join(json.dumps(p) + '\n' for p in PERGUNTAS[:2]), encoding='utf-8')
+    assert formato_arquivo(str(ndjson)) == FORMATO_NDJSON
+    gravar_perguntas(str(ndjson), PERGUNTAS[:3])
+    assert formato_arquivo(str(ndjson)) == FORMATO_NDJSON
+    assert ler_perguntas(str(ndjson)) == PERGUNTAS[:3]
+
+    lista = tmp_path / 'lista.json'
+    lista.write_text(json.dumps({'perguntas': PERGUNTAS[:2]}, indent=2), encoding='utf-8')
+    assert formato_arquivo(str(lista)) == FORMATO_JSON
+    gravar_perguntas(str(lista), PERGUNTAS[:3])
+    assert ler_perguntas(str(lista)) == PERGUNTAS[:3]
+
+
+def test_banco_de_recuperacao_gravado_como_json(tmp_path):
+    caminho = tmp_path / 'perguntas_recuperacao.json'
+    # Uma linha só com um objeto seria detectada como NDJSON
+    caminho.write_text(json.dumps({'Bio': {}}), encoding='utf-8')
+    banco = {'Bio': {'Células': PERGUNTAS[:2]}}
+    gravar_perguntas(str(caminho), banco)
+    assert json.loads(caminho.read_text(encoding='utf-8')) == banco
+    assert [p.name for p in tmp_path.iterdir()] == ['perguntas_recuperacao.json']
+
+
+def test_acrescentar_ndjson_completa_linha_sem_quebra(tmp_path):
+    caminho = tmp_path / 'banco.ndjson'
+    caminho.write_text(json.dumps(PERGUNTAS[0]), encoding='utf-8')
+    acrescentar_ndjson(str(caminho), PERGUNTAS[1:3])
+    assert ler_perguntas(str(caminho)) == PERGUNTAS[:3]
+
+
+def test_gravacoes_concorrentes_nao_disputam_o_temporario(tmp_path):
+    caminho = str(tmp_path / 'banco.json')
+    erros = []
+
+    def gravar(n):
+        try:
+            for _ in range(20):
+                gravar_perguntas(caminho, PERGUNTAS[:n], FORMATO_JSON)
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=gravar, args=(n,)) for n in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not erros
+    assert len(ler_perguntas(caminho)) in range(1, 9)
+    assert [p.name for p in tmp_path.iterdir()] == ['banco.json']
@@ -0,0 +1,47 @@
+import json
+import os
+
+from banco_compilado import BancoCompilado, abrir_se_atualizado, compilar
+
+PERGUNTAS = [
+    {'pergunta': 'Qual?', 'opcoes': ['a', 'b', 'c', 'd'], 'resposta_correta': 'a', 'periodo': 1,
+     'disciplina': 'Bio', 'categoria': 'x', 'id': 'p1'},
+    {'pergunta': 'Outra?', 'opcoes': ['a', 'b'], 'resposta_correta': 'b', 'periodo': '2',
+     'disciplina': 'Bio', 'dificuldade': 3, 'tags': ['t']},
+    {'pergunta': 'Sem opções'},
+]
+
+
+def test_lista_ida_e_volta(tmp_path):
+    origem = tmp_path / 'perguntas.json'
+    origem.write_text(json.dumps(PERGUNTAS, ensure_ascii=False), encoding='utf-8')
+    banco = BancoCompilado(compilar(str(origem)))
+    try:
+        assert list(banco) == PERGUNTAS
+        # Textos repetidos são decodificados uma vez e compartilhados
+        assert banco[0]['disciplina'] is banco[1]['disciplina']
+    finally:
+        banco.fechar()
+
+
+def test_recuperacao_ida_e_volta(tmp_path):
+    dados = {'Bio': {'Células': PERGUNTAS[:2], 'Tecidos': PERGUNTAS[2:]}, 'Quím': {'Ácidos': PERGUNTAS[:1]}}
+    origem = tmp_path / 'perguntas_recuperacao.json'
+    origem.write_text(json.dumps(dados, ensure_ascii=False), encoding='utf-8')
+    banco = BancoCompilado(compilar(str(origem), recuperacao=True))
+    try:
+        assert banco.como_recuperacao() == dados
+    finally:
+        banco.fechar()
+
+
+def test_desatualizado_quando_json_muda(tmp_path):
+    origem = tmp_path / 'perguntas.json'
+    origem.write_text(json.dumps(PERGUNTAS), encoding='utf-8')
+    compilar(str(origem))
+    banco = abrir_se_atualizado(str(origem))
+    assert banco is not None
+    banco.fechar()
+    origem.write_text(json.dumps(PERGUNTAS[:1]), encoding='utf-8')
+    os.utime(origem, ns=(1, 1))
+    assert abrir_se_atualizado(str(origem)) is None
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from diario_edicoes import DiarioEdicoes, aplicar_operacoes_lista, aplicar_operacoes_recuperacao
+
+
+def _p(id_pergunta, texto=None, **campos):
+    return dict({'id': id_pergunta, 'pergunta': texto or f'{id_pergunta}?'}, **campos)
+
+
+def test_lista_adicionar_substituir_remover():
+    base = [_p('a'), _p('b'), _p('c')]
+    resultado = aplicar_operacoes_lista(base, [
+        {'op': 'substituir', 'id': 'b', 'pergunta': _p('b', 'B editada')},
+        {'op': 'remover', 'id': 'a'},
+        {'op': 'adicionar', 'id': 'd', 'pergunta': _p('d')},
+        # substituir de id inexistente não cria a pergunta
+        {'op': 'substituir', 'id': 'x', 'pergunta': _p('x')},
+    ])
+    assert [p['id'] for p in resultado] == ['b', 'c', 'd']
+    assert resultado[0]['pergunta'] == 'B editada'
+    assert [p['id'] for p in base] == ['a', 'b', 'c']
+
+
+def test_lista_reaplicar_e_idempotente():
+    operacoes = [
+        {'op': 'adicionar', 'id': 'd', 'pergunta': _p('d')},
+        {'op': 'substituir', 'id': 'a', 'pergunta': _p('a', 'A2')},
+        {'op': 'remover', 'id': 'b'},
+    ]
+    uma_vez = aplicar_operacoes_lista([_p('a'), _p('b')], operacoes)
+    assert aplicar_operacoes_lista(uma_vez, operacoes) == uma_vez
+
+
+def test_recuperacao_local_da_operacao_e_limpeza_de_vazios():
+    banco = {'Bio': {'Células': [_p('r1'), _p('r2')]}, 'Quím': {'Ácidos': [_p('r3')]}}
+    aplicar_operacoes_recuperacao(banco, [
+        {'op': 'remover', 'id': 'r3'},
+        {'op': 'substituir', 'id': 'r1', 'pergunta': _p('r1', 'R1 editada')},
+        {'op': 'adicionar', 'id': 'r4', 'pergunta': _p('r4', disciplina='Bio', topico='Tecidos')},
+        # o local informado na operação (histórico) prevalece sobre o da pergunta
+        {'op': 'adicionar', 'id': 'r5', 'pergunta': _p('r5'), 'disciplina': 'Física', 'topico': 'Ondas'},
+    ])
+    assert banco == {
+        'Bio': {'Células': [_p('r1', 'R1 editada'), _p('r2')], 'Tecidos': [_p('r4', disciplina='Bio', topico='Tecidos')]},
+        'Física': {'Ondas': [_p('r5')]},
+    }
+
+
+@pytest.fixture
+def diario(tmp_path):
+    return DiarioEdicoes(str(tmp_path / 'perguntas.json'))
+
+
+def test_registrar_e_ler(diario):
+    diario.registrar('adicionar', _p('a'))
+    diario.registrar('remover', id_pergunta='a')
+    with pytest.raises(ValueError):
+        diario.registrar('mover', _p('a'))
+    assert [(op['op'], op['id']) for op in diario.operacoes()] == [('adicionar', 'a'), ('remover', 'a')]
+    assert diario.pendente()
+
+
+def test_linha_parcial_ignorada(diario):
+    diario.registrar('adicionar', _p('a'))
+    with open(diario.caminho, 'a', encoding='utf-8') as f:
+        f.write('{"op": "remo')
+    assert [op['id'] for op in diario.operacoes()] == ['a']
+
+
+def test_compactar_incorpora_e_mantem_edicoes_novas(diario):
+    diario.registrar('adicionar', _p('a'))
+    incorporadas = []
+
+    def incorporar(operacoes):
+        incorporadas.extend(operacoes)
+        # Edição feita durante a compactação vai para um diário novo
+        diario.registrar('adicionar', _p('b'))
+
+    assert diario.compactar(incorporar) == 1
+    assert [op['id'] for op in incorporadas] == ['a']
+    assert not os.path.exists(diario.caminho_compactando)
+    assert [op['id'] for op in diario.operacoes()] == ['b']
+
+
+def test_compactando_de_falha_anterior_e_reaplicado(diario):
+    diario.registrar('adicionar', _p('a'))
+    os.replace(diario.caminho, diario.caminho_compactando)
+    diario.registrar('adicionar', _p('b'))
+    assert [op['id'] for op in diario.operacoes()] == ['a', 'b']
+    incorporadas = []
+    diario.compactar(incorporadas.extend)
+    assert [op['id'] for op in incorporadas] == ['a']
+    assert [op['id'] for op in diario.operacoes()] == ['b']
+
+
+def test_regravacao_completa_descarta_diario(diario):
+    diario.registrar('adicionar', _p('a'))
+    with diario.regravacao_completa():
+        pass
+    assert not diario.pendente()
+    assert diario.operacoes() == []
@@ -0,0 +1,30 @@
+import json
+
+from duplicatas_proximas import DetectorDuplicatas, ler_perguntas
+
+PERGUNTA = {'pergunta': 'Qual organela é responsável pela respiração celular nas células eucariontes?',
+            'opcoes': ['Mitocôndria', 'Ribossomo', 'Lisossomo', 'Complexo de Golgi'], 'resposta_correta': 'Mitocôndria'}
+QUASE_IGUAL = dict(PERGUNTA, pergunta='Qual organela é responsável pela respiração celular nas células eucariotas?')
+OUTRA = {'pergunta': 'Quantos cromossomos tem uma célula somática humana?', 'opcoes': ['23', '46', '44', '92'],
+         'resposta_correta': '46'}
+
+
+def test_ler_perguntas_nos_formatos_aceitos(tmp_path):
+    lista = tmp_path / 'lista.json'
+    lista.write_text(json.dumps([PERGUNTA, OUTRA]), encoding='utf-8')
+    objeto = tmp_path / 'objeto.json'
+    objeto.write_text(json.dumps({'perguntas': [PERGUNTA, OUTRA]}), encoding='utf-8')
+    recuperacao = tmp_path / 'recuperacao.json'
+    recuperacao.write_text(json.dumps({'Bio': {'Células': [PERGUNTA], 'Genética': [OUTRA]}}, indent=2), encoding='utf-8')
+    ndjson = tmp_path / 'staging.ndjson'
+    ndjson.write_text(''.join(json.dumps(p) + '\n' for p in (PERGUNTA, OUTRA)), encoding='utf-8')
+
+    for caminho in (lista, objeto, recuperacao, ndjson):
+        assert ler_perguntas(str(caminho)) == [PERGUNTA, OUTRA], caminho
+
+
+def test_detector_aponta_quase_duplicadas():
+    detector = DetectorDuplicatas(0.5)
+    detector.adicionar('a', PERGUNTA)
+    detector.adicionar('b', OUTRA)
+    assert [chave for chave, _ in detector.similares(QUASE_IGUAL)] == ['a']
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from historico_bancos import (
+    BANCO_PRINCIPAL, BANCO_RECUPERACAO, HistoricoBanco, agora, diferencas, estado_lista, estado_recuperacao,
+    operacao,
+)
+
+
+def pergunta(id_pergunta, texto, **extra):
+    return dict({'id': id_pergunta, 'pergunta': texto, 'opcoes': ['a', 'b'], 'resposta_correta': 'a'}, **extra)
+
+
+def instante():
+    time.sleep(0.002)
+    valor = agora()
+    time.sleep(0.002)
+    return valor
+
+
+def test_diferencas_lista():
+    a, b, c = pergunta('p1', 'A?'), pergunta('p2', 'B?'), pergunta('p3', 'C?')
+    b2 = pergunta('p2', 'B editada?')
+    ops = diferencas(estado_lista([a, b]), estado_lista([a, b2, c]))
+    assert [(op['op'], op['id']) for op in ops] == [('substituir', 'p2'), ('adicionar', 'p3')]
+    ops = diferencas(estado_lista([a, b]), estado_lista([b]))
+    assert [(op['op'], op['id']) for op in ops] == [('remover', 'p1')]
+    assert diferencas(estado_lista([a, b]), estado_lista([dict(a), b])) == []
+
+
+def test_diferencas_recuperacao_move_de_topico():
+    a = pergunta('r1', 'A?')
+    ops = diferencas(estado_recuperacao({'Bio': {'Células': [a]}}), estado_recuperacao({'Bio': {'Tecidos': [a]}}))
+    assert [(op['op'], op.get('topico')) for op in ops] == [('remover', None), ('adicionar', 'Tecidos')]
+
+
+def test_restaurar_reaplica_o_log_ate_o_instante(tmp_path):
+    historico = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL)
+    a, b = pergunta('p1', 'A?'), pergunta('p2', 'B?')
+    historico.definir_estado(estado_lista([a, b]))
+    historico.registrar_edicao(lambda: [a, b], 'substituir', pergunta('p1', 'A editada?'))
+    t1 = instante()
+    historico.registrar_estado(
+        estado_lista([pergunta('p1', 'A editada?'), pergunta('p3', 'C?')]), 'upload',
+        lambda: pytest.fail('o checkpoint inicial já existe'),
+    )
+    t2 = instante()
+    historico.registrar([operacao('adicionar', {'pergunta': 'Sem id?', 'opcoes': ['a']})], 'sincronizacao')
+
+    dados, info = historico.restaurar(t1)
+    assert [(p['id'], p['pergunta']) for p in dados] == [('p1', 'A editada?'), ('p2', 'B?')]
+    assert info['operacoes'] == 1
+    dados, _ = historico.restaurar(t2)
+    assert [p['id'] for p in dados] == ['p1', 'p3']
+    dados, _ = historico.restaurar(agora())
+    assert [p['pergunta'] for p in dados] == ['A editada?', 'C?', 'Sem id?']
+    assert dados[-1]['id'].startswith('p')
+
+
+def test_restaurar_sem_checkpoint_anterior(tmp_path):
+    historico = HistoricoBanco(str(tmp_path), BANCO_RECUPERACAO)
+    antes = instante()
+    historico.checkpoint({'Bio': {'Células': [pergunta('r1', 'A?')]}}, 'inicial')
+    with pytest.raises(ValueError):
+        historico.restaurar(antes)
+
+
+def test_checkpoint_parte_do_banco_em_disco(tmp_path):
+    historico = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL, intervalo_checkpoint=1)
+    a, b = pergunta('p1', 'A?'), pergunta('p2', 'B?')
+    historico.definir_estado(estado_lista([a, b]))
+    historico.registrar_edicao(lambda: [a, b], 'substituir', pergunta('p1', 'A editada?'))
+    # Outro worker grava no mesmo log e no banco; este processo não recarregou
+    outro = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL)
+    outro.registrar([operacao('adicionar', pergunta('p3', 'C?'))], 'admin')
+    # Alteração já no log, mas ainda não gravada no banco
+    outro.registrar([operacao('remover', id_pergunta='p2')], 'admin')
+    em_disco = [pergunta('p1', 'A editada?'), b, pergunta('p3', 'C?')]
+
+    nome = historico.checkpoint_se_devido(lambda: list(em_disco))
+    assert nome is not None
+    gravado = historico.armazem.ler(nome)['data']
+    assert [(p['id'], p['pergunta']) for p in gravado] == [('p1', 'A editada?'), ('p3', 'C?')]
+    dados, info = historico.restaurar(agora())
+    assert info['checkpoint'] == nome and info['operacoes'] == 0
+    assert [(p['id'], p['pergunta']) for p in dados] == [(p['id'], p['pergunta']) for p in gravado]
+
+
+def test_checkpoint_inicial_gravado_uma_vez_a_partir_do_disco(tmp_path):
+    historico = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL)
+    outro = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL)
+    historico.definir_estado(estado_lista([pergunta('p1', 'Estado antigo do processo?')]))
+    em_disco = [pergunta('p1', 'A?'), pergunta('p2', 'B?')]
+
+    def ler_banco():
+        # Outro worker grava o checkpoint inicial enquanto este lê o banco
+        outro.garantir_checkpoint(lambda: list(em_disco))
+        return list(em_disco)
+
+    historico.registrar_edicao(ler_banco, 'remover', id_pergunta='p2')
+    checkpoints = historico.checkpoints()
+    assert len(checkpoints) == 1
+    gravado = historico.armazem.ler(checkpoints[0][0])['data']
+    assert [(p['id'], p['pergunta']) for p in gravado] == [('p1', 'A?'), ('p2', 'B?')]
+    dados, _ = historico.restaurar(agora())
+    assert [p['id'] for p in dados] == ['p1']
+
+
+def test_checkpoint_so_quando_devido(tmp_path):
+    historico = HistoricoBanco(str(tmp_path), BANCO_PRINCIPAL, intervalo_checkpoint=1 << 20)
+    historico.checkpoint([pergunta('p1', 'A?')], 'inicial')
+    historico.registrar([operacao('remover', id_pergunta='p1')], 'admin')
+    assert historico.checkpoint_se_devido(lambda: pytest.fail('não deveria ler o banco')) is None
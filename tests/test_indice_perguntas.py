@@ -0,0 +1,64 @@
+import random
+
+import indice_perguntas
+from indice_perguntas import IndicePerguntas
+
+
+def pergunta(n, periodo=1, disciplina='Bio', professor=False):
+    p = {'id': f'p{n:05d}', 'pergunta': f'Pergunta {random.random()}?', 'periodo': periodo, 'disciplina': disciplina}
+    if professor:
+        p['fonte_material'] = 'professor'
+    return p
+
+
+def paginar_tudo(indice, **filtro):
+    perguntas, apos = [], None
+    while True:
+        pagina, _, apos = indice.pagina(apos=apos, limite=7, **filtro)
+        perguntas.extend(pagina)
+        if apos is None:
+            return perguntas
+
+
+def test_posicoes_e_visoes_acompanham_as_alteracoes(monkeypatch):
+    monkeypatch.setattr(indice_perguntas, 'LIMITE_EXCLUSOES_POSICOES', 16)
+    random.seed(3)
+    contador = iter(range(100000))
+    novo = lambda: pergunta(next(contador), random.choice([1, 2]), random.choice(['Bio', 'Quim']), random.random() < 0.3)
+    banco = [novo() for _ in range(200)]
+    indice = IndicePerguntas(banco)
+    filtros = [{}, {'periodo': 1}, {'disciplina': 'bio', 'ordem': 'pergunta'}, {'periodo': 2, 'ordem': 'periodo', 'descendente': True}]
+    for filtro in filtros:
+        paginar_tudo(indice, **filtro)
+    visoes = dict(indice._visoes)
+
+    for passo in range(400):
+        acao = random.random()
+        if acao < 0.35:
+            p = novo()
+            banco.append(p)
+            indice.adicionar(p)
+        elif acao < 0.65 and banco:
+            p = banco.pop(random.randrange(len(banco)))
+            assert indice.remover(p)
+        elif acao < 0.9 and banco:
+            i = random.randrange(len(banco))
+            antiga = banco[i]
+            banco[i] = dict(antiga, pergunta='Editada?', periodo=random.choice([1, 2]))
+            indice.substituir(antiga, banco[i])
+        else:
+            removidas = random.sample(banco, min(5, len(banco)))
+            banco = [p for p in banco if not any(p is r for r in removidas)]
+            indice.remover_varios(removidas)
+
+        for p in random.sample(banco, min(10, len(banco))):
+            assert banco[indice.posicao(p['id'])] is p
+        if passo % 50 == 0:
+            for filtro in filtros:
+                esperado = IndicePerguntas(banco)
+                assert paginar_tudo(indice, **filtro) == paginar_tudo(esperado, **filtro), filtro
+
+    # As visões calculadas antes foram mantidas, e não recalculadas
+    assert all(indice._visoes[chave] is visao for chave, visao in visoes.items())
+    assert indice.total() == len(banco)
+    assert indice.posicao('inexistente') is None
@@ -0,0 +1,64 @@
+import gc
+
+import pytest
+
+from armazem_backups import ArmazemBackups
+from modelo_perguntas import ApresentacaoPergunta, PerguntaCongelada, RegistroPerguntas
+
+
+def _perguntas(n, sufixo=''):
+    return [
+        {'periodo': 1, 'disciplina': 'D', 'pergunta': f'P{i}{sufixo}?', 'opcoes': ['a', 'b'], 'resposta_correta': 'a'}
+        for i in range(n)
+    ]
+
+
+def test_registro_imutavel():
+    registro = RegistroPerguntas().congelar(_perguntas(1)[0], 'p')
+    assert isinstance(registro, PerguntaCongelada)
+    assert registro['opcoes'] == ('a', 'b')
+    with pytest.raises(TypeError):
+        registro['pergunta'] = 'x'
+
+
+def test_ids_deterministicos_e_unicos_no_lote():
+    perguntas = _perguntas(3) + _perguntas(1)
+    a = RegistroPerguntas().congelar_lista(perguntas, 'p')
+    b = RegistroPerguntas().congelar_lista(perguntas, 'p')
+    assert [p['id'] for p in a] == [p['id'] for p in b]
+    assert a[3]['id'] == a[0]['id'] + '-2'
+
+
+def test_recarga_sem_mudancas_reaproveita_registros():
+    registro = RegistroPerguntas()
+    primeira = registro.congelar_lista(_perguntas(5), 'p')
+    segunda = registro.congelar_lista(_perguntas(5), 'p')
+    assert all(a is b for a, b in zip(primeira, segunda))
+
+
+def test_registros_fora_dos_bancos_sao_liberados():
+    registro = RegistroPerguntas(limite_retidos=10)
+    banco = registro.congelar_lista(_perguntas(10), 'p')
+    ids = [p['id'] for p in banco]
+    # Ainda retidos: sessões em andamento resolvem perguntas removidas
+    del banco
+    gc.collect()
+    assert all(registro.obter(i) is not None for i in ids)
+    # Novos registros empurram os antigos para fora da retenção
+    outro_banco = registro.congelar_lista(_perguntas(10, sufixo='-novo'), 'p')
+    gc.collect()
+    assert all(registro.obter(i) is None for i in ids)
+    assert all(registro.obter(p['id']) is p for p in outro_banco)
+    item = ApresentacaoPergunta.da_sessao([ids[0], [0, 1]], registro)
+    assert item['pergunta'] == 'Esta pergunta foi removida do banco.'
+
+
+def test_cache_de_hashes_nao_prende_registros(tmp_path):
+    armazem = ArmazemBackups(str(tmp_path), compressao='nenhuma')
+    perguntas = RegistroPerguntas(limite_retidos=0).congelar_lista(_perguntas(20), 'p')
+    armazem.gravar('backup_x.json', {}, perguntas)
+    assert len(armazem._hashes) == 20
+    assert [p['pergunta'] for p in armazem.ler('backup_x.json')['data']] == [p['pergunta'] for p in perguntas]
+    del perguntas
+    gc.collect()
+    assert not armazem._hashes
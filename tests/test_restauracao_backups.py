@@ -0,0 +1,66 @@
+from restauracao_backups import PlanoRestauracao, chave_backup, selecionar_backups
+
+
+def pergunta(texto, disciplina, periodo):
+    return {'pergunta': texto, 'disciplina': disciplina, 'periodo': periodo}
+
+
+def backup(nome, disciplina, periodo=None, timestamp='20260101_000000'):
+    return {'filename': nome, 'disciplina': disciplina, 'periodo': periodo, 'timestamp': timestamp}
+
+
+def restaurar_um_por_um(perguntas, restauracoes):
+    """Restauração original: remove a disciplina/período e acrescenta o backup, backup por backup"""
+    for b, dados in restauracoes:
+        disciplina, periodo = chave_backup(b)
+        perguntas = [p for p in perguntas
+                     if not (p['disciplina'] == disciplina and (periodo is None or p['periodo'] == periodo))]
+        perguntas = perguntas + list(dados)
+    return perguntas
+
+
+BANCO = [
+    pergunta('Bio 1', 'Bio', 1), pergunta('Bio 2', 'Bio', 2), pergunta('Quim 1', 'Quim', 1),
+    pergunta('Fis 1', 'Fis', 1), pergunta('Bio 1b', 'Bio', 1),
+]
+
+
+def test_selecionar_mantem_o_mais_recente_por_chave():
+    backups = [
+        backup('b1', 'Bio', 1, '20260101_000000'),
+        backup('b2', 'Bio', 1, '20260201_000000'),
+        backup('b3', 'Bio', None, '20260115_000000'),
+        backup('b4', 'Quim', '1', '20260110_000000'),
+        backup('invalido', None),
+        backup('periodo_ruim', 'Fis', 'x'),
+    ]
+    selecionados, ignorados = selecionar_backups(backups)
+    assert [b['filename'] for b in selecionados] == ['b4', 'b3', 'b2']
+    assert sorted(ignorados) == ['b1', 'invalido', 'periodo_ruim']
+
+
+def test_plano_equivale_a_restaurar_em_ordem():
+    restauracoes = [
+        (backup('bio1', 'Bio', 1), [pergunta('Bio 1 antiga', 'Bio', 1)]),
+        (backup('bio', 'Bio'), [pergunta('Bio 1', 'Bio', 1), pergunta('Bio 3', 'Bio', 3)]),
+        (backup('quim1', 'Quim', 1), []),
+        (backup('bio3', 'Bio', 3), [pergunta('Bio 3 nova', 'Bio', 3)]),
+    ]
+    plano = PlanoRestauracao(BANCO, restauracoes)
+    esperado = restaurar_um_por_um(BANCO, restauracoes)
+    assert sorted(p['pergunta'] for p in plano.resultado()) == sorted(p['pergunta'] for p in esperado)
+    assert plano.mantidas == [pergunta('Fis 1', 'Fis', 1)]
+    assert len(plano.removidas) == 4
+
+
+def test_resumo_por_backup():
+    restauracoes = [
+        (backup('bio1', 'Bio', 1), [pergunta('Bio 1', 'Bio', 1), pergunta('Bio nova', 'Bio', 1)]),
+        (backup('fis1', 'Fis', 1), []),
+    ]
+    resumo = PlanoRestauracao(BANCO, restauracoes).resumo()
+    assert [r['filename'] for r in resumo] == ['bio1', 'fis1']
+    bio, fis = resumo
+    assert (bio['perguntas_atuais'], bio['perguntas_backup']) == (2, 2)
+    assert (bio['novas'], bio['excluidas'], bio['inalteradas']) == (1, 1, 1)
+    assert (fis['perguntas_atuais'], fis['perguntas_backup'], fis['excluidas']) == (1, 0, 1)
@@ -0,0 +1,126 @@
+import pytest
+
+from sessoes_store import FileSessionStore, MemorySessionStore, SessionStore, SQLiteSessionStore, criar_evento
+
+
+def test_backend_incompleto_falha_na_construcao():
+    class SemExpiracao(SessionStore):
+        def get(self, session_id):
+            return None
+
+        def save(self, session_id, dados):
+            pass
+
+        def delete(self, session_id):
+            pass
+
+        def contar_ativas(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        SemExpiracao()
+
+
+@pytest.fixture(params=['memoria', 'arquivo', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memoria':
+        return MemorySessionStore()
+    if request.param == 'arquivo':
+        return FileSessionStore(str(tmp_path / 'sessoes'), log_max_bytes=200)
+    return SQLiteSessionStore(str(tmp_path / 'sessoes.sqlite3'), max_eventos=3)
+
+
+def test_eventos_aplicados_e_compactados(store):
+    store.save('s1', {'pergunta_atual': 0, 'respostas': []})
+    dados = store.get('s1')
+    for posicao in range(10):
+        store.append_event('s1', dados, criar_evento(
+            'resposta', definir={'pergunta_atual': posicao + 1}, acrescentar={'respostas': [posicao]}
+        ))
+    store.append_event('s1', dados, criar_evento('fim', definir={'fim': 'x'}, compactar=True))
+    lida = store.get('s1')
+    assert lida['pergunta_atual'] == 10
+    assert lida['respostas'] == list(range(10))
+    assert lida['fim'] == 'x'
+    assert store.contar_ativas() == 1
+
+
+def _responder(diretorio, inicio, quantidade):
+    store = FileSessionStore(diretorio, log_max_bytes=300)
+    for posicao in range(inicio, inicio + quantidade):
+        dados = store.get('s1')
+        store.append_event('s1', dados, criar_evento('resposta', acrescentar={'respostas': [posicao]}))
+
+
+def test_compactacao_entre_processos_nao_perde_eventos(tmp_path):
+    import multiprocessing
+
+    diretorio = str(tmp_path / 'sessoes')
+    FileSessionStore(diretorio).save('s1', {'respostas': []})
+    contexto = multiprocessing.get_context('fork')
+    processos = [contexto.Process(target=_responder, args=(diretorio, i * 100, 100)) for i in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+    respostas = FileSessionStore(diretorio).get('s1')['respostas']
+    assert sorted(respostas) == list(range(400))
+
+
+def test_remocao_espera_o_lock_e_coletor_apaga_o_lock(tmp_path):
+    import os
+    import threading
+
+    diretorio = str(tmp_path / 'sessoes')
+    store = FileSessionStore(diretorio, ttl=60)
+    store.save('s1', {'respostas': [1]})
+    removida = threading.Event()
+    with store._travado('s1', exclusivo=True):
+        thread = threading.Thread(target=lambda: (store.delete('s1'), removida.set()))
+        thread.start()
+        assert not removida.wait(0.2)
+        assert store._ler('s1') == {'respostas': [1]}
+    thread.join()
+    assert store.get('s1') is None
+    assert os.listdir(diretorio) == ['s1.lock']
+
+    antigo = os.path.getmtime(os.path.join(diretorio, 's1.lock')) - 120
+    os.utime(os.path.join(diretorio, 's1.lock'), (antigo, antigo))
+    assert store.expirar() == 1
+    assert os.listdir(diretorio) == []
+
+
+def test_lock_apagado_pelo_coletor_e_recriado(tmp_path):
+    import os
+    import threading
+
+    diretorio = str(tmp_path / 'sessoes')
+    store = FileSessionStore(diretorio, ttl=60)
+    store.save('s1', {'respostas': []})
+    antigo = os.path.getmtime(os.path.join(diretorio, 's1.json')) - 120
+    gravada = threading.Event()
+    with store._travado('s1', exclusivo=True):
+        for nome in os.listdir(diretorio):
+            os.utime(os.path.join(diretorio, nome), (antigo, antigo))
+        # A gravação espera o lock que o coletor vai apagar e precisa trocar de arquivo
+        thread = threading.Thread(target=lambda: (store.save('s1', {'respostas': [2]}), gravada.set()))
+        thread.start()
+        assert not gravada.wait(0.2)
+        store._remover_arquivos('s1', lock=True)
+    thread.join()
+    assert store.get('s1') == {'respostas': [2]}
+    assert os.path.exists(os.path.join(diretorio, 's1.lock'))
+
+
+def test_compactacao_sqlite_de_sessao_expirada_fica_na_transacao(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / 'sessoes.sqlite3'), ttl=60)
+    store.save('s1', {'respostas': []})
+    store.append_event('s1', {'respostas': []}, criar_evento('resposta', acrescentar={'respostas': [1]}))
+    conn = store._conexao()
+    with conn:
+        conn.execute('UPDATE sessoes SET atualizado_em = atualizado_em - 120')
+    # delete() tem o próprio `with conn` e confirmaria a transação da compactação
+    monkeypatch.setattr(store, 'delete', lambda session_id: pytest.fail('compactar chamou delete'))
+    store.compactar('s1')
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM sessao_eventos').fetchone()[0] == 0
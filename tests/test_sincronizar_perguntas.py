@@ -0,0 +1,87 @@
+import io
+import json
+import os
+
+import pytest
+
+from diario_edicoes import DiarioEdicoes
+from sincronizar_perguntas import (
+    STAGING_EXTENSIONS, JsonBankAppender, iter_json_array, iter_questions_from_file, list_json_files_recursively,
+)
+
+PERGUNTAS = [{'pergunta': f'Pergunta {i}?', 'opcoes': ['a', 'b'], 'resposta_correta': 'a', 'texto': 'x' * i}
+             for i in range(50)]
+
+
+def test_iter_json_array_com_itens_cortados_entre_leituras():
+    texto = json.dumps(PERGUNTAS, indent=2)
+    handle = io.StringIO(texto[1:])
+    assert list(iter_json_array(handle, chunk_size=7)) == PERGUNTAS
+
+
+def test_iter_json_array_truncado():
+    handle = io.StringIO(json.dumps(PERGUNTAS)[1:-20])
+    with pytest.raises(ValueError):
+        list(iter_json_array(handle, chunk_size=64))
+
+
+@pytest.mark.parametrize('conteudo', [PERGUNTAS[:3], {'perguntas': PERGUNTAS[:3]}, []])
+def test_iter_questions_from_file(tmp_path, conteudo):
+    caminho = tmp_path / 'banco.json'
+    caminho.write_text(json.dumps(conteudo, indent=2), encoding='utf-8')
+    esperado = conteudo['perguntas'] if isinstance(conteudo, dict) else conteudo
+    assert list(iter_questions_from_file(str(caminho))) == esperado
+
+
+@pytest.mark.parametrize('objeto', [False, True])
+@pytest.mark.parametrize('existentes', [0, 3])
+def test_appender_acrescenta_mantendo_o_json_valido(tmp_path, objeto, existentes):
+    caminho = tmp_path / 'perguntas.json'
+    dados = {'perguntas': PERGUNTAS[:existentes]} if objeto else PERGUNTAS[:existentes]
+    caminho.write_text(json.dumps(dados, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    appender = JsonBankAppender(str(caminho))
+    for pergunta in PERGUNTAS[existentes:existentes + 4]:
+        appender.append(pergunta)
+    # Até o close() o banco não muda
+    assert json.loads(caminho.read_text(encoding='utf-8')) == dados
+    appender.close()
+
+    gravado = json.loads(caminho.read_text(encoding='utf-8'))
+    esperado = PERGUNTAS[:existentes + 4]
+    assert gravado == ({'perguntas': esperado} if objeto else esperado)
+    assert os.listdir(tmp_path) == ['perguntas.json']
+
+
+def test_appender_abort_preserva_o_banco(tmp_path):
+    caminho = tmp_path / 'perguntas.json'
+    original = json.dumps(PERGUNTAS[:2], indent=2)
+    caminho.write_text(original, encoding='utf-8')
+    appender = JsonBankAppender(str(caminho))
+    appender.append(PERGUNTAS[2])
+    appender.abort()
+    assert caminho.read_text(encoding='utf-8') == original
+    assert os.listdir(tmp_path) == ['perguntas.json']
+
+
+def test_alteracao_externa_bloqueia_a_compactacao(tmp_path):
+    caminho = str(tmp_path / 'perguntas.json')
+    diario = DiarioEdicoes(caminho)
+    diario.registrar('adicionar', {'id': 'p1', 'pergunta': 'Nova?'})
+    with diario.alteracao_externa():
+        # Compactação em andamento em outro processo/thread desiste
+        assert diario.compactar(lambda operacoes: None) is None
+        # Edições continuam indo para o diário
+        diario.registrar('remover', id_pergunta='p1')
+    assert [op['op'] for op in diario.operacoes()] == ['adicionar', 'remover']
+
+
+def test_staging_dir_inclui_ndjson(tmp_path):
+    for nome in ('periodo_1/Bio.json', 'periodo_1/Quim.ndjson', 'periodo_2/Fis.JSONL', 'periodo_2/notas.txt'):
+        caminho = tmp_path / nome
+        caminho.parent.mkdir(exist_ok=True)
+        caminho.write_text('[]', encoding='utf-8')
+    encontrados = list_json_files_recursively(str(tmp_path), STAGING_EXTENSIONS)
+    assert [os.path.relpath(c, tmp_path) for c in encontrados] == [
+        os.path.join('periodo_1', 'Bio.json'), os.path.join('periodo_1', 'Quim.ndjson'), os.path.join('periodo_2', 'Fis.JSONL'),
+    ]
@@ -0,0 +1,26 @@
+import os
+import threading
+
+from threads_processo import ThreadPorProcesso
+
+
+def test_uma_thread_por_processo_recriada_apos_fork():
+    parar = threading.Event()
+    thread = ThreadPorProcesso(parar.wait, 'teste')
+    thread.iniciar()
+    primeira = thread._thread
+    thread.iniciar()
+    assert thread._thread is primeira
+
+    pid = os.fork()
+    if pid == 0:
+        thread.iniciar()
+        os._exit(0 if thread._thread is not primeira and thread._thread.is_alive() else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    parar.set()
+    primeira.join()
+    parar.clear()
+    thread.iniciar()
+    assert thread._thread is not primeira and thread._thread.is_alive()
+    parar.set()
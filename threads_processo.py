@@ -0,0 +1,36 @@
+"""
+Threads de segundo plano que pertencem a um processo.
+
+O gunicorn importa o app no master e depois faz fork dos workers; threads não
+sobrevivem ao fork. Por isso o coletor de sessões, o observador dos bancos e o
+compactador dos diários não criam a thread na construção: ela é criada sob
+demanda na primeira chamada a iniciar() de cada processo e recriada se o
+processo mudou (fork) ou se a thread anterior morreu.
+"""
+
+import os
+import threading
+
+
+class ThreadPorProcesso:
+    """Thread daemon única por processo, criada sob demanda"""
+
+    def __init__(self, alvo, nome):
+        self.alvo = alvo
+        self.nome = nome
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ativa(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        if self._ativa():
+            return
+        with self._lock:
+            if self._ativa():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.alvo, name=self.nome, daemon=True)
+            self._thread.start()